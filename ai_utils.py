@@ -1,79 +1,395 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import random
+import re
 import textwrap
 import json
 import requests
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 import pandas as pd
 BacktestResult = Dict[str, Any]
 from strategies import StrategyTemplate
+from result_cache import ResultCache
+from data_manager import DATA_FOLDER
+from pine_validator import check_pine, format_issues, is_valid
+
+if TYPE_CHECKING:
+    import aiohttp
+
+DEFAULT_API_URL = "http://192.168.1.91:1234"
+DEFAULT_MODEL = "qwen3-8b"
+
+SUGGEST_PROMPT = (
+    "You are an AI trading strategy expert. Analyze the dataset summary "
+    "and suggest optimal parameter sets as JSON."
+)
+GENERATE_PROMPT = "Generate Pine Script v5 strategy code based on the user's prompt."
+VALIDATE_PROMPT = "Validate Pine Script v5 syntax: respond 'Valid' or list errors."
+
+# Responses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Default location and limits of the LLM completion cache
+COMPLETION_CACHE_PATH = os.path.join(DATA_FOLDER, 'completions_cache.sqlite')
+COMPLETION_CACHE_TTL = 7 * 24 * 3600
+COMPLETION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def completion_key(model: str, sys_prompt: str, user_prompt: str, sampling: Dict[str, Any]) -> str:
+    """
+    Content address of one completion request.
+    """
+    payload = json.dumps([model, sys_prompt, user_prompt, sampling], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CompletionCache(ResultCache):
+    """
+    ResultCache of model responses keyed by completion_key. Entries expire
+    after ttl seconds; the least recently used go first once the file
+    exceeds max_bytes. Hit rates are reported by stats().
+    """
+
+    def __init__(
+        self,
+        path: str = COMPLETION_CACHE_PATH,
+        max_bytes: int = COMPLETION_CACHE_MAX_BYTES,
+        ttl: Optional[float] = COMPLETION_CACHE_TTL
+    ):
+        super().__init__(path, max_bytes, ttl)
+
+
+def _payload(model: str, sys_prompt: str, user_prompt: str, sampling: Dict[str, Any] = None) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        **(sampling or {})
+    }
+
+
+def _suggest_user_prompt(prompt_data: Dict[str, Any], n: int) -> str:
+    return json.dumps({**prompt_data, "n_suggestions": n})
+
+
+def _validate_user_prompt(script: str) -> str:
+    return f"```pine\n{script}\n```"
+
+
+def _parse_suggestions(resp: str) -> List[Dict[str, Any]]:
+    try:
+        return json.loads(resp)
+    except json.JSONDecodeError:
+        return []
+
+
+def _is_valid(resp: str) -> bool:
+    # The model is asked to answer 'Valid' or list errors; a reply such as
+    # 'Invalid: ...' contains the word too, so only a leading 'Valid' counts
+    return re.match(r"^\W*valid\b", resp.strip().lower()) is not None
 
 
 class AIAdvisor:
-    def __init__(self, api_url: str = "http://192.168.1.91:1234", model: str = "qwen3-8b"):
+    """
+    Chat client for an OpenAI-compatible server. sampling (e.g.
+    {'temperature': 0.2}) is sent with every request. Responses are looked
+    up in / added to cache when one is given; pass cache=None to bypass.
+    """
+    def __init__(
+        self,
+        api_url: str = DEFAULT_API_URL,
+        model: str = DEFAULT_MODEL,
+        timeout: float = 120.0,
+        sampling: Dict[str, Any] = None,
+        cache: Optional[CompletionCache] = None
+    ):
         self.api_url = api_url.rstrip('/')
         self.model = model
+        self.timeout = timeout
+        self.sampling = dict(sampling or {})
+        self.cache = cache
+        # Keeps the connection to the server open between calls
+        self.session = requests.Session()
 
     def _print_wrapped(self, label: str, msg: str):
         print(f"[{label}]")
         for line in textwrap.wrap(msg, width=80):
             print(line)
 
-    def suggest_parameters(self, prompt_data: Dict[str, Any], n: int = 3) -> List[Dict[str, Any]]:
-        sys_prompt = (
-            "You are an AI trading strategy expert. Analyze the dataset summary "
-            "and suggest optimal parameter sets as JSON."
+    def _chat(self, sys_prompt: str, user_prompt: str) -> str:
+        key = None
+        if self.cache is not None:
+            key = completion_key(self.model, sys_prompt, user_prompt, self.sampling)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        r = self.session.post(
+            f"{self.api_url}/v1/chat/completions",
+            json=_payload(self.model, sys_prompt, user_prompt, self.sampling),
+            timeout=self.timeout
         )
-        user_prompt = json.dumps({**prompt_data, "n_suggestions": n})
+        r.raise_for_status()
+        content = r.json()["choices"][0]["message"]["content"]
+        if key is not None:
+            self.cache.put(key, content)
+        return content
+
+    def suggest_parameters(self, prompt_data: Dict[str, Any], n: int = 3) -> List[Dict[str, Any]]:
+        sys_prompt = SUGGEST_PROMPT
+        user_prompt = _suggest_user_prompt(prompt_data, n)
         self._print_wrapped("AI System", sys_prompt)
         self._print_wrapped("AI User", user_prompt)
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        }
-        r = requests.post(f"{self.api_url}/v1/chat/completions", json=payload)
-        r.raise_for_status()
-        resp = r.json()["choices"][0]["message"]["content"]
+        resp = self._chat(sys_prompt, user_prompt)
         self._print_wrapped("AI Response", resp)
-        try:
-            return json.loads(resp)
-        except json.JSONDecodeError:
-            return []
+        return _parse_suggestions(resp)
 
     def generate_pine_script(self, prompt: str) -> str:
-        sys_prompt = "Generate Pine Script v5 strategy code based on the user's prompt."
+        sys_prompt = GENERATE_PROMPT
         self._print_wrapped("AI System", sys_prompt)
         self._print_wrapped("AI User", prompt)
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": prompt}
-            ]
-        }
-        r = requests.post(f"{self.api_url}/v1/chat/completions", json=payload)
-        r.raise_for_status()
-        script = r.json()["choices"][0]["message"]["content"]
+        script = self._chat(sys_prompt, prompt)
         self._print_wrapped("AI Script", script)
         return script
 
-    def validate_pine(self, script: str) -> bool:
-        sys_prompt = "Validate Pine Script v5 syntax: respond 'Valid' or list errors."
+    def validate_pine(self, script: str, second_opinion: bool = False) -> bool:
+        """
+        Checks the script locally with check_pine. The model is only asked,
+        as a second opinion, when requested and the local checks pass.
+        """
+        issues = check_pine(script)
+        if issues:
+            self._print_wrapped("Pine Validation", format_issues(issues))
+        if not second_opinion or not is_valid(issues):
+            return is_valid(issues)
+        sys_prompt = VALIDATE_PROMPT
         self._print_wrapped("AI System", sys_prompt)
         self._print_wrapped("AI User", script)
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": f"```pine\n{script}\n```"}
-            ]
-        }
-        r = requests.post(f"{self.api_url}/v1/chat/completions", json=payload)
-        r.raise_for_status()
-        res = r.json()["choices"][0]["message"]["content"]
+        res = self._chat(sys_prompt, _validate_user_prompt(script))
         self._print_wrapped("AI Validation", res)
-        return "valid" in res.lower()
+        return _is_valid(res)
+
+
+class AsyncAIAdvisor:
+    """
+    asyncio client for the same /v1/chat/completions endpoint as AIAdvisor.
+    One pooled aiohttp session is shared by all requests; at most
+    `concurrency` are in flight at once. Each request has a total timeout
+    and is retried with exponential backoff (plus jitter) on connection
+    errors, timeouts and 408/429/5xx responses.
+
+    Use as an async context manager:
+
+        async with AsyncAIAdvisor() as advisor:
+            scripts = await advisor.generate_pine_scripts({'AAPL': '...', 'MSFT': '...'})
+
+    The *_many/batch methods take {key: prompt} and return {key: result};
+    with return_exceptions=True a failed key maps to its exception instead
+    of failing the whole batch. sampling and cache work as in AIAdvisor;
+    cache lookups and writes run on a background thread so they do not
+    block the event loop.
+    """
+
+    def __init__(
+        self,
+        api_url: str = DEFAULT_API_URL,
+        model: str = DEFAULT_MODEL,
+        timeout: float = 120.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        concurrency: int = 8,
+        verbose: bool = False,
+        sampling: Dict[str, Any] = None,
+        cache: Optional[CompletionCache] = None
+    ):
+        self.api_url = api_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.sampling = dict(sampling or {})
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.verbose = verbose
+        self._session: Optional['aiohttp.ClientSession'] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # SQLite cache calls block, so they run on one thread of their own
+        self._cache_thread: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    async def __aenter__(self) -> 'AsyncAIAdvisor':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        # aiohttp is only needed by the async client; imported on first use
+        import aiohttp
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._cache_thread is not None:
+            self._cache_thread.shutdown(wait=True)
+            self._cache_thread = None
+
+    async def _cache_call(self, fn, *args):
+        """Runs a blocking cache method off the event loop."""
+        if self._cache_thread is None:
+            self._cache_thread = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='completion-cache'
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._cache_thread, fn, *args)
+
+    def _log(self, label: str, msg: str):
+        if self.verbose:
+            print(f"[{label}]")
+            for line in textwrap.wrap(msg, width=80):
+                print(line)
+
+    async def chat(self, sys_prompt: str, user_prompt: str) -> str:
+        """
+        One chat completion; returns the message content.
+        """
+        key = None
+        if self.cache is not None:
+            key = completion_key(self.model, sys_prompt, user_prompt, self.sampling)
+            cached = await self._cache_call(self.cache.get, key)
+            if cached is not None:
+                return cached
+        import aiohttp
+
+        await self.open()
+        url = f"{self.api_url}/v1/chat/completions"
+        payload = _payload(self.model, sys_prompt, user_prompt, self.sampling)
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    async with self._session.post(url, json=payload) as r:
+                        r.raise_for_status()
+                        body = await r.json(content_type=None)
+                content = body["choices"][0]["message"]["content"]
+                if key is not None:
+                    await self._cache_call(self.cache.put, key, content)
+                return content
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError, aiohttp.ClientResponseError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if not retryable or attempt == self.max_retries:
+                    raise
+                # Back off without holding a concurrency slot
+                delay = self.backoff * 2 ** attempt
+                await asyncio.sleep(delay + random.uniform(0, delay))
+
+    async def chat_many(
+        self,
+        prompts: Dict[Any, Tuple[str, str]],
+        return_exceptions: bool = False
+    ) -> Dict[Any, Any]:
+        """
+        Fans out {key: (system prompt, user prompt)} concurrently.
+        """
+        keys = list(prompts)
+        results = await asyncio.gather(
+            *(self.chat(*prompts[k]) for k in keys),
+            return_exceptions=return_exceptions
+        )
+        return dict(zip(keys, results))
+
+    async def suggest_parameters(self, prompt_data: Dict[str, Any], n: int = 3) -> List[Dict[str, Any]]:
+        user_prompt = _suggest_user_prompt(prompt_data, n)
+        self._log("AI User", user_prompt)
+        resp = await self.chat(SUGGEST_PROMPT, user_prompt)
+        self._log("AI Response", resp)
+        return _parse_suggestions(resp)
+
+    async def generate_pine_script(self, prompt: str) -> str:
+        self._log("AI User", prompt)
+        script = await self.chat(GENERATE_PROMPT, prompt)
+        self._log("AI Script", script)
+        return script
+
+    async def validate_pine(self, script: str, second_opinion: bool = False) -> bool:
+        """Local check_pine; the model is consulted only as in AIAdvisor."""
+        issues = check_pine(script)
+        if issues:
+            self._log("Pine Validation", format_issues(issues))
+        if not second_opinion or not is_valid(issues):
+            return is_valid(issues)
+        res = await self.chat(VALIDATE_PROMPT, _validate_user_prompt(script))
+        self._log("AI Validation", res)
+        return _is_valid(res)
+
+    async def suggest_parameters_many(
+        self,
+        prompt_data: Dict[Any, Dict[str, Any]],
+        n: int = 3,
+        return_exceptions: bool = False
+    ) -> Dict[Any, Any]:
+        """Batch suggest_parameters, e.g. {symbol: dataset summary}."""
+        keys = list(prompt_data)
+        results = await asyncio.gather(
+            *(self.suggest_parameters(prompt_data[k], n) for k in keys),
+            return_exceptions=return_exceptions
+        )
+        return dict(zip(keys, results))
+
+    async def generate_pine_scripts(
+        self,
+        prompts: Dict[Any, str],
+        return_exceptions: bool = False
+    ) -> Dict[Any, Any]:
+        """Batch generate_pine_script, e.g. {symbol: prompt}."""
+        keys = list(prompts)
+        results = await asyncio.gather(
+            *(self.generate_pine_script(prompts[k]) for k in keys),
+            return_exceptions=return_exceptions
+        )
+        return dict(zip(keys, results))
+
+    async def validate_pines(
+        self,
+        scripts: Dict[Any, str],
+        second_opinion: bool = False,
+        return_exceptions: bool = False
+    ) -> Dict[Any, Any]:
+        """Batch validate_pine, e.g. {symbol: script}."""
+        keys = list(scripts)
+        results = await asyncio.gather(
+            *(self.validate_pine(scripts[k], second_opinion) for k in keys),
+            return_exceptions=return_exceptions
+        )
+        return dict(zip(keys, results))
+
+
+def generate_and_validate(
+    prompts: Dict[Any, str],
+    second_opinion: bool = False,
+    **advisor_kwargs
+) -> Dict[Any, Tuple[str, bool]]:
+    """
+    Synchronous entry point: generates a Pine script for every key of
+    prompts (e.g. one per symbol) concurrently and validates them.
+    Returns {key: (script, is_valid)}.
+    """
+    async def _run():
+        async with AsyncAIAdvisor(**advisor_kwargs) as advisor:
+            scripts = await advisor.generate_pine_scripts(prompts)
+            valid = await advisor.validate_pines(scripts, second_opinion)
+        return {k: (scripts[k], valid[k]) for k in prompts}
+
+    return asyncio.run(_run())
 
 
 def create_ai_pine(
@@ -81,10 +397,13 @@ def create_ai_pine(
     df: pd.DataFrame,
     start: str = None,
     end: str = None,
-    verbose: bool = False
+    verbose: bool = False,
+    use_cache: bool = True
 ) -> str:
     """
     Generate a Pine Script strategy using AI inference based on available templates and data.
+    With use_cache, an identical earlier request is answered from the
+    CompletionCache without calling the model.
     """
     # Summarize data
     summary = {
@@ -94,8 +413,10 @@ def create_ai_pine(
         'mean_close': float(df['Close'].mean()),
         'std_close': float(df['Close'].std()),
     }
-    advisor = AIAdvisor()
+    advisor = AIAdvisor(cache=CompletionCache() if use_cache else None)
     suggestions = advisor.suggest_parameters(summary)
+    if verbose and advisor.cache is not None:
+        print(f"Completion cache: {advisor.cache.stats()}")
     # Use first suggestion to instantiate a template
     tmpl = templates[0]
     params = suggestions[0] if suggestions else {k: v['default'] for k, v in tmpl.param_space.items()}
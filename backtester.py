@@ -1,16 +1,92 @@
 #!/usr/bin/env python3
 
 import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from typing import Any, Dict
+
+import profiler
+from metrics import equity_metrics
+from result_cache import ResultCache, result_key
 
 BacktestResult = Dict[str, Any]
 
+ENGINES = ('vectorized', 'loop')
+
+# One row per round trip in BacktestResult['trade_log']
+TRADE_DTYPE = np.dtype([
+    ('entry_bar', np.int64),
+    ('exit_bar', np.int64),
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('size', np.float64),
+    ('pnl', np.float64),
+])
+
+
+def _first_exit(close: np.ndarray, stop_mask: np.ndarray, start: int, tp: float, sl: float) -> int:
+    """
+    First bar >= start where close reaches tp or sl or stop_mask is set;
+    scans in growing chunks so short trades touch few bars. -1 if none.
+    """
+    n = len(close)
+    step = 256
+    while start < n:
+        end = min(n, start + step)
+        seg = close[start:end]
+        hit = np.flatnonzero((seg >= tp) | (seg <= sl) | stop_mask[start:end])
+        if len(hit):
+            return start + int(hit[0])
+        start = end
+        step *= 2
+    return -1
+
+
+def _run_ends(keys: np.ndarray) -> np.ndarray:
+    """
+    For every bar, the index of the first following bar whose key differs
+    (len(keys) for the last run).
+    """
+    n = len(keys)
+    starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    bounds = np.append(starts, n)
+    return bounds[np.searchsorted(starts, np.arange(n), side='right')]
+
+
 class Backtester:
     """
     Simulates long/short strategy performance on OHLC data.
+
+    Two engines are available:
+    - 'vectorized' (default): works on the Close/signal arrays and only
+      steps through signal bars, filling the equity curve with array ops.
+    - 'loop': the original bar-by-bar reference implementation.
+    Both return identical metrics. run_batch evaluates many parameter sets
+    of one strategy against shared price arrays.
+
+    Optional stop rules end a run early: max_drawdown_pct (from the equity
+    peak), min_equity, and max_idle_bars (bars since the last entry or exit).
+    The bar that breaks a rule closes any open position and the metrics
+    cover the bars up to it; such results have pruned=True and say which
+    rule fired in pruned_reason.
+
+    Strategies with exit levels (Strategy.generate_orders, e.g. Pine
+    strategy.exit take-profit/stop-loss) have them set from the close of
+    each entry that fills, so entries rejected by max_day/max_week never
+    place exits.
+
+    equity_curve is a float64 array (one value per bar, plus the final cash
+    when a position is closed at the end) and trade_log a TRADE_DTYPE
+    structured array. For bulk sweeps, keep_curve=False and
+    keep_trades=False leave them out (None), and curve_points downsamples
+    the curve to about that many points (the min and max of equal bar
+    buckets, at the bar positions given in curve_bars). Metrics are always
+    computed from the full curve.
+
+    Risk metrics come from metrics.equity_metrics: max drawdown (value, %
+    and bars, from the running equity peak), annual return, Sharpe,
+    Sortino, Calmar, profit factor and exposure.
     """
 
     def __init__(
@@ -22,7 +98,17 @@ class Backtester:
         margin: float = 100.0,
         max_day: int = 100,
         max_week: int = 500,
+        engine: str = 'vectorized',
+        result_cache: ResultCache = None,
+        max_drawdown_pct: float = None,
+        min_equity: float = None,
+        max_idle_bars: int = None,
+        keep_curve: bool = True,
+        curve_points: int = None,
+        keep_trades: bool = True,
     ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {engine}")
         self.capital = capital
         self.order_size_pct = order_size_pct
         self.tick_verify = tick_verify
@@ -30,6 +116,64 @@ class Backtester:
         self.margin = margin
         self.max_day = max_day
         self.max_week = max_week
+        self.engine = engine
+        self.result_cache = result_cache
+        self.max_drawdown_pct = max_drawdown_pct
+        self.min_equity = min_equity
+        self.max_idle_bars = max_idle_bars
+        self.keep_curve = keep_curve
+        self.curve_points = curve_points
+        self.keep_trades = keep_trades
+
+    def settings(self) -> Dict[str, Any]:
+        """Simulation settings that affect results (part of the cache key)."""
+        settings = {
+            'capital': self.capital,
+            'order_size_pct': self.order_size_pct,
+            'tick_verify': self.tick_verify,
+            'slippage': self.slippage,
+            'margin': self.margin,
+            'max_day': self.max_day,
+            'max_week': self.max_week,
+        }
+        # Stop rules only when set, so keys of runs without them are unchanged
+        for name, value in self.stop_rules().items():
+            if value is not None:
+                settings[name] = value
+        # Likewise for non-default output options
+        for name, value, default in (
+            ('keep_curve', self.keep_curve, True),
+            ('curve_points', self.curve_points, None),
+            ('keep_trades', self.keep_trades, True),
+        ):
+            if value != default:
+                settings[name] = value
+        return settings
+
+    def stop_rules(self) -> Dict[str, Any]:
+        return {
+            'max_drawdown_pct': self.max_drawdown_pct,
+            'min_equity': self.min_equity,
+            'max_idle_bars': self.max_idle_bars,
+        }
+
+    def _has_stops(self) -> bool:
+        return any(v is not None for v in self.stop_rules().values())
+
+    def _stop_reason(self, equity: float, peak: float, idle: int):
+        """
+        Name of the first stop rule broken by one bar's state, or None.
+        """
+        if self.max_drawdown_pct is not None and peak > 0 and (peak - equity) / peak * 100.0 >= self.max_drawdown_pct:
+            return 'max_drawdown'
+        if self.min_equity is not None and equity < self.min_equity:
+            return 'min_equity'
+        if self.max_idle_bars is not None and idle >= self.max_idle_bars:
+            return 'max_idle_bars'
+        return None
+
+    def _cache_key(self, data: pd.DataFrame, strat: Any, params: Dict[str, Any]) -> str:
+        return result_key(data, strat.cache_key(), params, self.settings())
 
     def run(
         self,
@@ -40,13 +184,53 @@ class Backtester:
         """
         Run the backtest:
         - data: DataFrame with at least a 'Close' column and a DateTimeIndex
-        - strat: instance of a Strategy subclass (must implement generate_signals)
+        - strat: instance of a Strategy subclass (see Strategy.generate_orders)
         - params: dict of strategy parameters
         Returns a dict of performance metrics + equity curve.
+        With a result_cache, a previously computed result is returned as is.
+        """
+        key = None
+        if self.result_cache is not None:
+            with profiler.stage('result_cache'):
+                key = self._cache_key(data, strat, params)
+                cached = self.result_cache.get(key)
+            if cached is not None:
+                profiler.count('result_cache_hits')
+                return cached
+            profiler.count('result_cache_misses')
+
+        # Generate entry/exit signals: 1 for enter, -1 for exit, 0 hold,
+        # and take-profit/stop-loss offsets if the strategy has them
+        with profiler.stage('signals'):
+            signals, levels = strat.generate_orders(data, params)
+
+        with profiler.stage('simulate'):
+            if self.engine == 'loop':
+                result = self._run_loop(data, signals, levels)
+            else:
+                result = self._run_vectorized(data, signals, levels)
+        profiler.count('backtests')
+        profiler.count('bars', result['bars_run'])
+        profiler.count('trades', result['total_trades'])
+
+        if key is not None:
+            with profiler.stage('result_cache'):
+                self.result_cache.put(key, result)
+        return result
+
+    def _run_loop(
+        self,
+        data: pd.DataFrame,
+        signals: pd.Series,
+        levels: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """
+        Reference engine: walks every bar in Python.
         """
         cash = self.capital
         pos = 0.0
         entry_price = 0.0
+        take_profit, stop_loss = np.inf, -np.inf
 
         equity_curve: List[float] = []
         total_trades = wins = losses = 0
@@ -55,11 +239,16 @@ class Backtester:
         day_count: Dict[datetime.date, int] = {}
         week_count: Dict[int, int] = {}
 
-        max_equity = min_equity = cash
+        max_equity = cash
         max_pos = 0.0
 
-        # Generate entry/exit signals: 1 for enter, -1 for exit, 0 hold
-        signals = strat.generate_signals(data, params)
+        check_stops = self._has_stops()
+        last_fill = 0
+        pruned_reason = None
+        bars = 0
+
+        trade_log: List[Tuple] = []
+        entry_bar = 0
 
         for ts, price in data['Close'].items():
             date = ts.date()
@@ -90,9 +279,13 @@ class Backtester:
                 total_trades += 1
                 day_count[date] += 1
                 week_count[weeknum] += 1
+                last_fill = entry_bar = bars
+                if levels is not None:
+                    take_profit = price + levels[0][bars]
+                    stop_loss = price - levels[1][bars]
 
-            # EXIT: close long if signal == -1
-            elif sig == -1 and pos > 0:
+            # EXIT: close long if signal == -1 or price reaches an exit level
+            elif pos > 0 and (sig == -1 or price >= take_profit or price <= stop_loss):
                 exit_price = price - self.tick_verify - self.slippage
                 cash += pos * exit_price
 
@@ -103,15 +296,25 @@ class Backtester:
                 else:
                     gross_loss += abs(pnl)
                     losses += 1
+                trade_log.append((entry_bar, bars, entry_price, exit_price, pos, pnl))
 
                 pos = 0.0
+                last_fill = bars
 
             # Track equity and extremes
             equity = cash + pos * price
             equity_curve.append(equity)
             max_equity = max(max_equity, equity)
-            min_equity = min(min_equity, equity)
             max_pos = max(max_pos, pos)
+            bars += 1
+
+            if check_stops:
+                pruned_reason = self._stop_reason(equity, max_equity, bars - 1 - last_fill)
+                if pruned_reason is not None:
+                    break
+
+        if pruned_reason is not None:
+            data = data.iloc[:bars]
 
         # Close any open position at the end
         if pos > 0:
@@ -126,41 +329,384 @@ class Backtester:
             else:
                 gross_loss += abs(pnl)
                 losses += 1
+            trade_log.append((entry_bar, len(data) - 1, entry_price, exit_price, pos, pnl))
 
             equity_curve.append(cash)
             max_equity = max(max_equity, cash)
-            min_equity = min(min_equity, cash)
             pos = 0.0
 
-        # Compute summary metrics
-        net_profit = cash - self.capital
+        return self._summarize(
+            data, cash, np.asarray(equity_curve, dtype=np.float64), max_equity, max_pos,
+            total_trades, wins, losses, gross_profit, gross_loss,
+            max(day_count.values()) if day_count else 0,
+            max(week_count.values()) if week_count else 0,
+            pruned_reason, trade_log,
+        )
 
-        first_price = data['Close'].iloc[0]
-        last_price = data['Close'].iloc[-1]
-        buy_hold_val = (last_price - first_price) / first_price * self.capital
-        buy_hold_pct = (last_price - first_price) / first_price * 100.0
+    def run_batch(
+        self,
+        data: pd.DataFrame,
+        strat: Any,
+        params_list: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Backtest many parameter sets of one strategy in a single data pass.
+        The strategy builds a bars x variants signal matrix and every column is
+        simulated against the same prepared price/calendar arrays.
+        Returns one metrics dict per entry of params_list, in order.
+        """
+        if not params_list:
+            return []
+        # Exit levels are per variant, so such strategies run one at a time
+        if self.engine == 'loop' or strat.has_exit_levels:
+            return [self.run(data, strat, p) for p in params_list]
 
-        runup_val = max_equity - self.capital
-        runup_pct = (runup_val / self.capital) * 100.0
+        results: List[Dict[str, Any]] = [None] * len(params_list)
+        keys: List[str] = [None] * len(params_list)
+        if self.result_cache is not None:
+            with profiler.stage('result_cache'):
+                for j, p in enumerate(params_list):
+                    keys[j] = self._cache_key(data, strat, p)
+                    results[j] = self.result_cache.get(keys[j])
+        todo = [j for j, r in enumerate(results) if r is None]
+        if self.result_cache is not None:
+            profiler.count('result_cache_hits', len(params_list) - len(todo))
+            profiler.count('result_cache_misses', len(todo))
+        if not todo:
+            return results
 
-        drawdown_val = self.capital - min_equity
-        drawdown_pct = (drawdown_val / self.capital) * 100.0
+        with profiler.stage('signals'):
+            sig_matrix = strat.generate_signals_batch(data, [params_list[j] for j in todo])
+        with profiler.stage('simulate'):
+            prepared = self._prepare(data)
+            for col, j in enumerate(todo):
+                results[j] = self._simulate(data, prepared, sig_matrix[:, col])
+                profiler.count('bars', results[j]['bars_run'])
+                profiler.count('trades', results[j]['total_trades'])
+        profiler.count('backtests', len(todo))
+        if self.result_cache is not None:
+            with profiler.stage('result_cache'):
+                for j in todo:
+                    self.result_cache.put(keys[j], results[j])
+        return results
 
+    def _prepare(self, data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Precompute the per-bar arrays the vectorized engine needs; shared by
+        every variant of a batch.
+        """
+        idx = data.index
+        day_key = (idx.year * 10000 + idx.month * 100 + idx.day).to_numpy(dtype=np.int64)
+        week_key = idx.isocalendar().week.to_numpy(dtype=np.int64)
         return {
-            "net_profit": net_profit,
-            "gross_profit": gross_profit,
-            "gross_loss": gross_loss,
-            "buy_hold_val": buy_hold_val,
-            "buy_hold_pct": buy_hold_pct,
-            "max_runup_val": runup_val,
-            "max_runup_pct": runup_pct,
-            "max_drawdown_val": drawdown_val,
-            "max_drawdown_pct": drawdown_pct,
-            "total_trades": total_trades,
-            "win_rate": (wins / total_trades * 100.0) if total_trades > 0 else 0.0,
-            "loss_rate": (losses / total_trades * 100.0) if total_trades > 0 else 0.0,
-            "max_trades_day": max(day_count.values()) if day_count else 0,
-            "max_trades_week": max(week_count.values()) if week_count else 0,
-            "max_contracts_held": max_pos,
-            "equity_curve": equity_curve,
+            'close': data['Close'].to_numpy(dtype=float),
+            'day_key': day_key,
+            'week_key': week_key,
+            'day_end': _run_ends(day_key),
+            'week_end': _run_ends(week_key),
         }
+
+    def _run_vectorized(
+        self,
+        data: pd.DataFrame,
+        signals: pd.Series,
+        levels: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """
+        Array engine for a single signal series.
+        """
+        if signals.index.equals(data.index):
+            sig = signals.to_numpy(dtype=float)
+        else:
+            sig = signals.reindex(data.index).fillna(0).to_numpy(dtype=float)
+        return self._simulate(data, self._prepare(data), sig, levels)
+
+    def _simulate(
+        self,
+        data: pd.DataFrame,
+        prepared: Dict[str, np.ndarray],
+        sig: np.ndarray,
+        levels: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """
+        Jumps between signal bars with searchsorted instead of visiting every
+        bar, then builds the equity curve from the piecewise constant
+        cash/position state in one pass. With exit levels, the exit of each
+        filled entry is the first sell signal or level hit after it.
+        """
+        close = prepared['close']
+        day_key = prepared['day_key']
+        week_key = prepared['week_key']
+        day_end = prepared['day_end']
+        week_end = prepared['week_end']
+        n = len(close)
+
+        buys = np.flatnonzero(sig == 1)
+        sells = np.flatnonzero(sig == -1)
+        sell_mask = sig == -1 if levels is not None else None
+        take_profit, stop_loss = np.inf, -np.inf
+
+        day_count: Dict[int, int] = {}
+        week_count: Dict[int, int] = {}
+
+        leverage = max(self.margin / 100.0, 1.0)
+
+        cash = self.capital
+        pos = 0.0
+        entry_price = 0.0
+        total_trades = wins = losses = 0
+        gross_profit = gross_loss = 0.0
+
+        trade_log: List[Tuple] = []
+        entry_bar = 0
+
+        # State changes: bar index from which (cash, pos) hold
+        points: List[int] = [0]
+        cash_vals: List[float] = [cash]
+        pos_vals: List[float] = [pos]
+
+        # Stop rules are checked one constant-state segment at a time,
+        # from seg_lo up to the next fill
+        check_stops = self._has_stops()
+        peak = self.capital
+        last_fill = seg_lo = 0
+        stop_bar = pruned_reason = None
+
+        i = 0
+        while i < n:
+            if pos == 0:
+                k = np.searchsorted(buys, i)
+                if k == len(buys):
+                    break
+                b = int(buys[k])
+                d, w = int(day_key[b]), int(week_key[b])
+                if day_count.get(d, 0) >= self.max_day:
+                    i = int(day_end[b])
+                    continue
+                if week_count.get(w, 0) >= self.max_week:
+                    i = int(week_end[b])
+                    continue
+                if check_stops:
+                    stop_bar, pruned_reason, peak = self._segment_stop(close, seg_lo, b, cash, pos, peak, last_fill)
+                    if stop_bar is not None:
+                        break
+
+                price = close[b]
+                order_cash = (self.order_size_pct / 100.0) * cash
+                size = order_cash / (price + self.tick_verify + self.slippage)
+                size *= leverage
+
+                entry_price = price + self.tick_verify + self.slippage
+                pos = size
+                cash -= size * entry_price
+
+                total_trades += 1
+                day_count[d] = day_count.get(d, 0) + 1
+                week_count[w] = week_count.get(w, 0) + 1
+                last_fill = seg_lo = entry_bar = b
+                if levels is not None:
+                    take_profit = price + levels[0][b]
+                    stop_loss = price - levels[1][b]
+
+                points.append(b)
+                cash_vals.append(cash)
+                pos_vals.append(pos)
+                i = b + 1
+            elif pos > 0:
+                if levels is None:
+                    k = np.searchsorted(sells, i)
+                    s = int(sells[k]) if k < len(sells) else -1
+                else:
+                    s = _first_exit(close, sell_mask, i, take_profit, stop_loss)
+                if s < 0:
+                    break
+                if check_stops:
+                    stop_bar, pruned_reason, peak = self._segment_stop(close, seg_lo, s, cash, pos, peak, last_fill)
+                    if stop_bar is not None:
+                        break
+                exit_price = close[s] - self.tick_verify - self.slippage
+                cash += pos * exit_price
+
+                pnl = (exit_price - entry_price) * pos
+                if pnl >= 0:
+                    gross_profit += pnl
+                    wins += 1
+                else:
+                    gross_loss += abs(pnl)
+                    losses += 1
+                trade_log.append((entry_bar, s, entry_price, exit_price, pos, pnl))
+
+                pos = 0.0
+                last_fill = seg_lo = s
+                points.append(s)
+                cash_vals.append(cash)
+                pos_vals.append(pos)
+                i = s + 1
+            else:
+                # A negative position can neither enter nor exit again
+                break
+
+        if check_stops and stop_bar is None:
+            stop_bar, pruned_reason, peak = self._segment_stop(close, seg_lo, n, cash, pos, peak, last_fill)
+        if stop_bar is not None:
+            n = stop_bar + 1
+            close = close[:n]
+            data = data.iloc[:n]
+
+        lengths = np.diff(np.append(points, n))
+        cash_arr = np.repeat(cash_vals, lengths)
+        pos_arr = np.repeat(pos_vals, lengths)
+        equity = cash_arr + pos_arr * close
+
+        max_equity = max(self.capital, float(equity.max())) if n else self.capital
+        max_pos = max(0.0, float(pos_arr.max())) if n else 0.0
+
+        # Close any open position at the end
+        if pos > 0:
+            last_price = close[-1]
+            exit_price = last_price - self.tick_verify - self.slippage
+            cash += pos * exit_price
+
+            pnl = (exit_price - entry_price) * pos
+            if pnl >= 0:
+                gross_profit += pnl
+                wins += 1
+            else:
+                gross_loss += abs(pnl)
+                losses += 1
+            trade_log.append((entry_bar, n - 1, entry_price, exit_price, pos, pnl))
+
+            equity = np.append(equity, cash)
+            max_equity = max(max_equity, cash)
+            pos = 0.0
+
+        return self._summarize(
+            data, cash, equity, max_equity, max_pos,
+            total_trades, wins, losses, gross_profit, gross_loss,
+            max(day_count.values()) if day_count else 0,
+            max(week_count.values()) if week_count else 0,
+            pruned_reason, trade_log,
+        )
+
+    def _segment_stop(
+        self,
+        close: np.ndarray,
+        lo: int,
+        hi: int,
+        cash: float,
+        pos: float,
+        peak: float,
+        last_fill: int
+    ):
+        """
+        First bar in [lo, hi) that breaks a stop rule while (cash, pos) is
+        held. Returns (bar or None, rule name or None, equity peak so far).
+        """
+        if hi <= lo:
+            return None, None, peak
+        equity = cash + pos * close[lo:hi]
+        run_peak = np.maximum(np.maximum.accumulate(equity), peak)
+
+        hits = []
+        if self.max_drawdown_pct is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dd = (run_peak - equity) / run_peak * 100.0
+            idx = np.flatnonzero((run_peak > 0) & (dd >= self.max_drawdown_pct))
+            if len(idx):
+                hits.append((int(idx[0]), 'max_drawdown'))
+        if self.min_equity is not None:
+            idx = np.flatnonzero(equity < self.min_equity)
+            if len(idx):
+                hits.append((int(idx[0]), 'min_equity'))
+        if self.max_idle_bars is not None:
+            first = max(last_fill + self.max_idle_bars, lo) - lo
+            if first < hi - lo:
+                hits.append((first, 'max_idle_bars'))
+
+        if not hits:
+            return None, None, float(run_peak[-1])
+        # Same bar: rules rank in the order _stop_reason checks them
+        bar, reason = min(hits, key=lambda h: h[0])
+        return lo + bar, reason, float(run_peak[bar])
+
+    def _output_curve(self, equity: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        The equity curve as returned: None without keep_curve, else the full
+        curve, or with curve_points the min and max of each of
+        curve_points // 2 equal buckets (plus the first and last value)
+        together with their positions.
+        """
+        if not self.keep_curve:
+            return None, None
+        n = len(equity)
+        if self.curve_points is None or n <= self.curve_points:
+            return equity, None
+        k = max(1, self.curve_points // 2)
+        bounds = np.linspace(0, n, k + 1).astype(np.int64)
+        bucket = np.repeat(np.arange(k), np.diff(bounds))
+        # Within each bucket, positions sorted by value: first is the min, last the max
+        order = np.lexsort((equity, bucket))
+        keep = np.unique(np.concatenate((order[bounds[:-1]], order[bounds[1:] - 1], [0, n - 1])))
+        return equity[keep], keep
+
+    def _summarize(
+        self,
+        data: pd.DataFrame,
+        cash: float,
+        equity_curve: np.ndarray,
+        max_equity: float,
+        max_pos: float,
+        total_trades: int,
+        wins: int,
+        losses: int,
+        gross_profit: float,
+        gross_loss: float,
+        max_trades_day: int,
+        max_trades_week: int,
+        pruned_reason: str = None,
+        trade_log: List[Tuple] = None,
+    ) -> Dict[str, Any]:
+        """
+        Compute summary metrics shared by both engines.
+        """
+        with profiler.stage('metrics'):
+            net_profit = cash - self.capital
+
+            first_price = data['Close'].iloc[0]
+            last_price = data['Close'].iloc[-1]
+            buy_hold_val = (last_price - first_price) / first_price * self.capital
+            buy_hold_pct = (last_price - first_price) / first_price * 100.0
+
+            runup_val = max_equity - self.capital
+            runup_pct = (runup_val / self.capital) * 100.0
+
+            trades = np.array(trade_log or [], dtype=TRADE_DTYPE)
+            # Drawdown from the running peak, risk-adjusted returns, exposure
+            risk = equity_metrics(
+                equity_curve, capital=self.capital, index=data.index, trade_logs=trades, n_bars=len(data)
+            )
+
+            curve, curve_bars = self._output_curve(equity_curve)
+
+            return {
+                "net_profit": net_profit,
+                "gross_profit": gross_profit,
+                "gross_loss": gross_loss,
+                "buy_hold_val": buy_hold_val,
+                "buy_hold_pct": buy_hold_pct,
+                "max_runup_val": runup_val,
+                "max_runup_pct": runup_pct,
+                **risk,
+                "total_trades": total_trades,
+                "win_rate": (wins / total_trades * 100.0) if total_trades > 0 else 0.0,
+                "loss_rate": (losses / total_trades * 100.0) if total_trades > 0 else 0.0,
+                "max_trades_day": max_trades_day,
+                "max_trades_week": max_trades_week,
+                "max_contracts_held": max_pos,
+                "pruned": pruned_reason is not None,
+                "pruned_reason": pruned_reason,
+                "bars_run": len(data),
+                "equity_curve": curve,
+                "curve_bars": curve_bars,
+                "trade_log": trades if self.keep_trades else None,
+            }
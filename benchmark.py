@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the backtesting hot paths.
+
+Times CLI startup, Backtester.run, MACDStrategy/RSIStrategy.generate_signals,
+StrategyTemplate.instantiate, TemplateManager loading, DataManager.load_csv
+and the end-to-end scan and optimize flows on deterministic synthetic
+OHLCV data, and reports bars/s and trials/s. Results are written as JSON;
+--compare checks them against an earlier file and exits 1 when a benchmark
+got slower than the threshold allows.
+
+    python benchmark.py --sizes 10000,100000,1000000,5000000 --out bench.json
+    python benchmark.py --compare bench.json --threshold 0.15
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+from backtester import Backtester
+from data_manager import DataManager
+from indicator_cache import IndicatorCache
+from strategies import MACDStrategy, RSIStrategy, StrategyTemplate
+from template_manager import INDEX_FILENAME, TemplateManager
+from tests.helpers import MACD_PARAMS, RSI_PARAMS, synthetic_ohlcv
+
+console = Console()
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000, 5_000_000)
+# A keyword-input template in the Pine subset the compiler runs
+SYNTHETIC_TEMPLATE = """//@version=5
+strategy("Bench EMA/RSI", overlay=true)
+// @tags bench, trend
+fastLen = input.int(title="Fast", defval=12, minval=3, maxval=40, step=1)
+slowLen = input.int(title="Slow", defval=48, minval=41, maxval=200, step=1)
+rsiLen = input.int(title="RSI Length", defval=14, minval=5, maxval=30, step=1)
+rsiMax = input.float(title="RSI Max", defval=70.0, minval=55.0, maxval=90.0, step=0.5)
+emaFast = ta.ema(close, fastLen)
+emaSlow = ta.ema(close, slowLen)
+rsiVal = ta.rsi(close, rsiLen)
+if ta.crossover(emaFast, emaSlow) and rsiVal < rsiMax
+    strategy.entry("Long", strategy.long)
+if ta.crossunder(emaFast, emaSlow)
+    strategy.close("Long")
+"""
+# Seconds `python cli.py --help` may take
+STARTUP_BUDGET = 0.2
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _record(seconds: float, bars: int = 0, trials: int = 0, **extra) -> Dict[str, Any]:
+    rec = {'seconds': seconds, **extra}
+    if bars:
+        rec['bars'] = bars
+        rec['bars_per_sec'] = bars / seconds if seconds > 0 else float('inf')
+    if trials:
+        rec['trials'] = trials
+        rec['trials_per_sec'] = trials / seconds if seconds > 0 else float('inf')
+    return rec
+
+
+def bench_signals_and_run(df: pd.DataFrame, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Strategy signals and Backtester.run, each with a cold indicator cache."""
+    n = len(df)
+    out = {}
+    for name, cls, params in (('macd', MACDStrategy, MACD_PARAMS), ('rsi', RSIStrategy, RSI_PARAMS)):
+        secs = _best_of(lambda: cls(cache=IndicatorCache()).generate_signals(df, params), repeat)
+        out[f'{name}_generate_signals'] = _record(secs, bars=n, trials=1)
+    bt = Backtester()
+    secs = _best_of(lambda: bt.run(df, MACDStrategy(cache=IndicatorCache()), MACD_PARAMS), repeat)
+    out['backtester_run'] = _record(secs, bars=n, trials=1)
+    return out
+
+
+def bench_load_csv(df: pd.DataFrame, workdir: str, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """CSV parsing, first load into the columnar store, and store reloads."""
+    n = len(df)
+    data_dir = os.path.join(workdir, f'csv_{n}')
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'BENCH_{n}_1m.csv')
+    df.to_csv(path)
+
+    def _cold():
+        shutil.rmtree(os.path.join(data_dir, '.store'), ignore_errors=True)
+        DataManager(data_dir).load_csv(path)
+
+    out = {
+        'load_csv_parse': _record(_best_of(lambda: DataManager(data_dir, use_store=False).load_csv(path), repeat), bars=n),
+        'load_csv_store_build': _record(_best_of(_cold, repeat), bars=n),
+    }
+    dm = DataManager(data_dir)
+    out['load_csv_store'] = _record(_best_of(lambda: dm.load_csv(path)['Close'].sum(), repeat), bars=n)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return out
+
+
+def bench_templates(workdir: str, n_templates: int, n_params: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """StrategyTemplate.instantiate and TemplateManager cold/warm loads."""
+    tmpl_dir = os.path.join(workdir, 'templates_bench')
+    os.makedirs(tmpl_dir, exist_ok=True)
+    for i in range(n_templates):
+        with open(os.path.join(tmpl_dir, f'bench_{i:05d}.pine'), 'w') as f:
+            f.write(SYNTHETIC_TEMPLATE.replace('Bench EMA/RSI', f'Bench {i}'))
+
+    def _cold():
+        index = os.path.join(tmpl_dir, INDEX_FILENAME)
+        if os.path.exists(index):
+            os.remove(index)
+        TemplateManager(tmpl_dir)
+
+    out = {
+        'template_manager_cold': _record(_best_of(_cold, repeat), trials=n_templates),
+        'template_manager_warm': _record(_best_of(lambda: TemplateManager(tmpl_dir), repeat), trials=n_templates),
+    }
+
+    tmpl = StrategyTemplate('bench', SYNTHETIC_TEMPLATE, {})
+    rng = np.random.default_rng(1)
+    params = [
+        {'Fast': int(f), 'Slow': int(s), 'RSI Length': int(r), 'RSI Max': float(m)}
+        for f, s, r, m in zip(
+            rng.integers(3, 41, n_params), rng.integers(41, 201, n_params),
+            rng.integers(5, 31, n_params), rng.uniform(55, 90, n_params)
+        )
+    ]
+    out['instantiate'] = _record(_best_of(lambda: [tmpl.instantiate(p) for p in params], repeat), trials=n_params)
+    shutil.rmtree(tmpl_dir, ignore_errors=True)
+    return out
+
+
+def bench_end_to_end(df: pd.DataFrame, workdir: str, workers: int, n_calls: int) -> Dict[str, Dict[str, Any]]:
+    """
+    The scan and optimize commands over a workspace holding df as one
+    symbol, split into four periods, without the result cache.
+    """
+    from cli import scan
+    from optimizer import scan_optimize
+
+    n = len(df)
+    ws = os.path.join(workdir, f'e2e_{n}')
+    os.makedirs(os.path.join(ws, 'data'), exist_ok=True)
+    os.makedirs(os.path.join(ws, 'templates'), exist_ok=True)
+    df.to_csv(os.path.join(ws, 'data', 'BENCH_1Y_1m.csv'))
+    with open(os.path.join(ws, 'templates', 'bench.pine'), 'w') as f:
+        f.write(SYNTHETIC_TEMPLATE)
+    # Periods are whole days (the CLI syntax has no times), up to four of them
+    days = pd.Index(df.index[np.linspace(0, n - 1, 5).astype(int)].strftime('%Y-%m-%d')).unique()
+    if len(days) < 2:
+        days = days.append(days)
+    period_list = list(zip(days[:-1], days[1:]))
+    periods = ','.join(f'{a}:{b}' for a, b in period_list)
+
+    out = {}
+    cwd = os.getcwd()
+    os.chdir(ws)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            # Build the columnar store outside the timed runs
+            DataManager('data').load_csv(os.path.join('data', 'BENCH_1Y_1m.csv'))
+
+            t0 = time.perf_counter()
+            scan.callback('BENCH', periods, 'templates', workers,
+                          no_cache=True, output='scan.csv', fresh=True)
+            out['scan'] = _record(time.perf_counter() - t0, bars=n, trials=len(period_list))
+
+            t0 = time.perf_counter()
+            scan_optimize(['BENCH'], period_list, 'templates', workers, n_initial=min(5, n_calls),
+                          n_calls=n_calls, use_cache=False)
+            out['optimize'] = _record(
+                time.perf_counter() - t0, bars=n * n_calls, trials=len(period_list) * n_calls
+            )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(ws, ignore_errors=True)
+    return out
+
+
+def bench_startup(repeat: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Wall time of fresh interpreters starting the entry points: cli.py --help
+    (target: under STARTUP_BUDGET seconds), optimize --help, and importing
+    run.py's menu.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    commands = {
+        'startup_cli_help': [sys.executable, 'cli.py', '--help'],
+        'startup_optimize_help': [sys.executable, 'cli.py', 'optimize', '--help'],
+        'startup_run_menu': [sys.executable, '-c', 'import run'],
+    }
+    out = {}
+    for name, cmd in commands.items():
+        secs = _best_of(lambda: subprocess.run(cmd, cwd=here, stdout=subprocess.DEVNULL, check=True), repeat)
+        out[name] = _record(secs)
+    out['startup_cli_help']['budget'] = STARTUP_BUDGET
+    return out
+
+
+def _meta() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_benchmarks(
+    sizes: List[int],
+    repeat: int = 3,
+    workers: int = 2,
+    n_calls: int = 10,
+    n_templates: int = 500,
+    n_params: int = 10_000,
+    e2e_max_bars: int = 1_000_000,
+    csv_max_bars: int = 5_000_000,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Runs every benchmark and returns {'meta': ..., 'results': {name: record}}.
+    Per-size results are named 'benchmark[bars]'. The end-to-end flows and
+    CSV loading are skipped above e2e_max_bars / csv_max_bars.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    workdir = tempfile.mkdtemp(prefix='stonks_bench_')
+    try:
+        console.print("startup")
+        results.update(bench_startup(repeat))
+        console.print(f"templates: {n_templates} files, {n_params} parameter sets")
+        results.update(bench_templates(workdir, n_templates, n_params, repeat))
+        for n in sizes:
+            console.print(f"{n:,} bars")
+            df = synthetic_ohlcv(n, seed)
+            per_size = bench_signals_and_run(df, repeat)
+            if n <= csv_max_bars:
+                per_size.update(bench_load_csv(df, workdir, repeat))
+            if n <= e2e_max_bars:
+                per_size.update(bench_end_to_end(df, workdir, workers, n_calls))
+            results.update({f'{name}[{n}]': rec for name, rec in per_size.items()})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'meta': _meta(), 'results': results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Benchmarks present in both runs with their time ratio (current /
+    baseline); regressed is set when the ratio exceeds 1 + threshold.
+    """
+    rows = []
+    for name, rec in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or not base.get('seconds'):
+            continue
+        ratio = rec['seconds'] / base['seconds']
+        rows.append({
+            'name': name,
+            'baseline': base['seconds'],
+            'current': rec['seconds'],
+            'ratio': ratio,
+            'regressed': ratio > 1.0 + threshold,
+        })
+    return rows
+
+
+def _print_results(report: Dict[str, Any]):
+    table = Table(show_header=True, header_style="bold magenta")
+    for col in ('benchmark', 'seconds', 'bars/s', 'trials/s'):
+        table.add_column(col, justify='left' if col == 'benchmark' else 'right')
+    for name, rec in report['results'].items():
+        table.add_row(
+            name,
+            f"{rec['seconds']:.4f}",
+            f"{rec['bars_per_sec']:,.0f}" if 'bars_per_sec' in rec else '',
+            f"{rec['trials_per_sec']:,.1f}" if 'trials_per_sec' in rec else '',
+        )
+    console.print(table)
+
+
+def _print_comparison(rows: List[Dict[str, Any]], threshold: float):
+    table = Table(show_header=True, header_style="bold magenta")
+    for col in ('benchmark', 'baseline s', 'current s', 'ratio'):
+        table.add_column(col, justify='left' if col == 'benchmark' else 'right')
+    for row in rows:
+        style = 'bold red' if row['regressed'] else ('green' if row['ratio'] < 1.0 - threshold else None)
+        table.add_row(row['name'], f"{row['baseline']:.4f}", f"{row['current']:.4f}", f"{row['ratio']:.2f}x", style=style)
+    console.print(table)
+
+
+@click.command()
+@click.option('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES), help='Comma-separated bar counts')
+@click.option('--repeat', default=3, help='Runs per benchmark; the fastest is kept')
+@click.option('--workers', default=2, help='Workers for the end-to-end scan/optimize')
+@click.option('--n-calls', default=10, help='Optimizer trials per task in the optimize benchmark')
+@click.option('--e2e-max-bars', default=1_000_000, help='Skip end-to-end flows above this many bars')
+@click.option('--csv-max-bars', default=5_000_000, help='Skip CSV loading above this many bars')
+@click.option('--out', default='benchmark_results.json', help='Where to write the JSON results')
+@click.option('--compare', 'baseline_path', default=None, type=click.Path(exists=True), help='Earlier results JSON to compare against')
+@click.option('--threshold', default=0.15, help='Allowed slowdown before a benchmark counts as a regression (0.15 = 15%)')
+def main(sizes, repeat, workers, n_calls, e2e_max_bars, csv_max_bars, out, baseline_path, threshold):
+    """Run the benchmark suite."""
+    size_list = [int(s) for s in sizes.split(',') if s.strip()]
+    report = run_benchmarks(
+        size_list, repeat=repeat, workers=workers, n_calls=n_calls,
+        e2e_max_bars=e2e_max_bars, csv_max_bars=csv_max_bars
+    )
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=1)
+    _print_results(report)
+    console.print(f"Results saved to {out}", style="bold green")
+    startup = report['results']['startup_cli_help']['seconds']
+    if startup > STARTUP_BUDGET:
+        console.print(f"cli.py --help took {startup * 1000:.0f} ms (budget {STARTUP_BUDGET * 1000:.0f} ms)", style="bold yellow")
+
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, threshold)
+        _print_comparison(rows, threshold)
+        regressed = [r['name'] for r in rows if r['regressed']]
+        if regressed:
+            console.print(f"{len(regressed)} benchmark(s) slower than {1 + threshold:.2f}x baseline", style="bold red")
+            sys.exit(1)
+        console.print("No regressions.", style="bold green")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,21 @@
 import os
+import functools
+from typing import TYPE_CHECKING
 import click
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
-import concurrent.futures
-import pandas as pd
 
-from data_manager import load_templates, load_data
-from ai_utils import create_ai_pine, refine_pine
-from backtester import Backtester
-from optimizer import scan_optimize
+import profiler
+from profiler import PROFILE_DIR, ProfileReport, profiled_task
+from search_options import OPT_METRICS, SEARCH_MODES
+
+# Heavy modules (pandas, skopt, yfinance, aiohttp, ...) are imported inside
+# the commands that use them, so --help and light commands start fast.
 
 console = Console()
 
+if TYPE_CHECKING:
+    from worker_pool import Task
+
 
 def _print_user(question: str):
     console.print(f"❯ {question}", style="bold cyan")
@@ -21,6 +25,52 @@ def _print_ai(response: str):
     console.print(response, style="bold yellow")
 
 
+def _run_backtest(task: 'Task', use_cache: bool = True) -> dict:
+    """Worker task for scan: backtest one template with its default inputs."""
+    from backtester import Backtester
+    from result_cache import ResultCache
+    from worker_pool import get_frame, get_template
+
+    with profiler.stage('slice'):
+        df = get_frame(task.symbol, task.start, task.end)
+    tmpl = get_template(task.template)
+    bt = Backtester(result_cache=ResultCache() if use_cache else None, keep_curve=False, keep_trades=False)
+    with profiler.stage('compile'):
+        strat = tmpl.compile()
+    res = bt.run(df, strat, task.params)
+    return {
+        'symbol': task.symbol,
+        'start': task.start,
+        'end': task.end,
+        'template': task.template,
+        'net_profit': res['net_profit'],
+        'win_rate': res['win_rate']
+    }
+
+
+def _print_profile(summary: dict, profile_dir: str):
+    from rich.table import Table
+
+    table = Table(show_header=True, header_style="bold magenta")
+    for col in ('where', 'stage', 'calls', 'wall s', 'self s', 'cpu s', '% task'):
+        table.add_column(col, justify='left' if col in ('where', 'stage') else 'right')
+    for row in summary['stages']:
+        pct = row['pct_task_wall']
+        table.add_row(
+            row['where'], row['stage'], str(row['calls']), f"{row['wall']:.3f}", f"{row['self_wall']:.3f}",
+            f"{row['cpu']:.3f}", '' if pct != pct else f"{pct:.1f}"
+        )
+    console.print(table)
+    counters = ', '.join(f"{k}={v:,}" for k, v in sorted(summary['counters'].items()))
+    console.print(
+        f"{summary['tasks']} tasks on {summary['workers']} workers, "
+        f"{summary['task_wall']:.2f}s task wall / {summary['task_cpu']:.2f}s CPU. {counters}"
+    )
+    for item in summary['slowest']:
+        console.print(f"  slow: {item['task']} {item['wall']:.2f}s")
+    console.print(f"Profile saved to {profile_dir}", style="bold green")
+
+
 @click.group()
 def cli():
     """STONKS Backtesting Suite CLI"""
@@ -33,10 +83,15 @@ def cli():
 @click.option('--start', default=None, help='Start date (YYYY-MM-DD)')
 @click.option('--end', default=None, help='End date (YYYY-MM-DD)')
 @click.option('--verboseAI', is_flag=True, default=False, help='Show AI reasoning logs')
-def create_ai(templates_dir, symbol, start, end, verboseai):
+@click.option('--no-cache', is_flag=True, default=False, help='Always query the model; ignore and do not store cached completions')
+def create_ai(templates_dir, symbol, start, end, verboseai, no_cache=False):
     """
     Create a new Pine Script strategy using AI and available templates.
     """
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    from ai_utils import create_ai_pine
+    from data_manager import load_templates, load_data
+
     _print_user(f"create-ai --symbol {symbol} --start {start} --end {end}")
 
     templates = load_templates(templates_dir)
@@ -54,9 +109,9 @@ def create_ai(templates_dir, symbol, start, end, verboseai):
     if not verboseai:
         with Progress(SpinnerColumn(), TextColumn("[green]Thinking..."), transient=True) as progress:
             progress.add_task("ai", total=None)
-            code = create_ai_pine(templates, df, start, end)
+            code = create_ai_pine(templates, df, start, end, use_cache=not no_cache)
     else:
-        code = create_ai_pine(templates, df, start, end, verbose=True)
+        code = create_ai_pine(templates, df, start, end, verbose=True, use_cache=not no_cache)
 
     _print_ai(code)
 
@@ -79,6 +134,10 @@ def refine_ai(templates_dir, input_script, symbol, start, end, verboseai):
     """
     Refine an existing Pine Script strategy using AI-based optimization.
     """
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    from ai_utils import refine_pine
+    from data_manager import load_templates, load_data
+
     _print_user(f"refine-ai --input-script {input_script} --symbol {symbol} --start {start} --end {end}")
 
     templates = load_templates(templates_dir)
@@ -116,10 +175,22 @@ def refine_ai(templates_dir, input_script, symbol, start, end, verboseai):
 @click.option('--periods', required=True, help='Comma-separated date ranges (start:end, YYYY-MM-DD:YYYY-MM-DD)')
 @click.option('--templates-dir', default='templates', help='Directory of Pine Script templates')
 @click.option('--workers', default=4, help='Number of parallel workers')
-def scan(symbols, periods, templates_dir, workers):
+@click.option('--no-cache', is_flag=True, default=False, help='Ignore and do not store cached backtest results')
+@click.option('--output', default='scan_results.csv', help='Results file (.csv, .jsonl or .parquet), written as tasks finish')
+@click.option('--fresh', is_flag=True, default=False, help='Start over instead of resuming an interrupted run')
+@click.option('--profile', is_flag=True, default=False, help='Time each pipeline stage and keep cProfile stats of the slowest tasks')
+@click.option('--profile-dir', default=PROFILE_DIR, help='Where --profile writes summary.json and .prof files')
+def scan(
+    symbols, periods, templates_dir, workers, no_cache=False, output='scan_results.csv', fresh=False,
+    profile=False, profile_dir=PROFILE_DIR
+):
     """
     Scan multiple symbols and periods with all templates in parallel.
     """
+    from data_manager import load_templates, load_data
+    from result_writer import ResultWriter, run_id, task_id
+    from worker_pool import Task, stream_tasks, task_frames
+
     _print_user(f"scan --symbols {symbols} --periods {periods}")
 
     symbol_list = [s.strip().upper() for s in symbols.split(',')]
@@ -128,8 +199,12 @@ def scan(symbols, periods, templates_dir, workers):
         start, end = p.split(':')
         period_list.append((start, end))
 
-    data = load_data()
-    templates = load_templates(templates_dir)
+    report = ProfileReport() if profile else None
+    parent = report.parent if profile else profiler.Profiler()
+    with parent.stage('load_data'):
+        data = load_data()
+    with parent.stage('load_templates'):
+        templates = load_templates(templates_dir)
     if not templates:
         console.print(f"No templates found in {templates_dir}", style="bold red")
         return
@@ -139,38 +214,37 @@ def scan(symbols, periods, templates_dir, workers):
         if sym not in data:
             console.print(f"Data for symbol {sym} not found, skipping.", style="bold yellow")
             continue
-        df_full = data[sym]
         for (start, end) in period_list:
-            df = df_full.loc[start:end]
             for tmpl in templates:
-                tasks.append((sym, start, end, tmpl))
-
-    results = []
-
-    def _run_backtest(task):
-        sym, start, end, tmpl = task
-        df = data[sym].loc[start:end]
-        bt = Backtester(df)
-        code = tmpl.instantiate({k: v['default'] for k, v in tmpl.param_space.items()})
-        res = bt.run(code)
-        return {
-            'symbol': sym,
-            'start': start,
-            'end': end,
-            'template': tmpl.name,
-            'net_profit': res.net_profit,
-            'win_rate': res.win_rate
-        }
-
-    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
-        for r in executor.map(_run_backtest, tasks):
-            results.append(r)
-
-    df_res = pd.DataFrame(results)
-    out_csv = 'scan_results.csv'
-    df_res.to_csv(out_csv, index=False)
-
-    console.print(f"Scan complete. Results saved to {out_csv}", style="bold green")
+                params = {k: v['default'] for k, v in tmpl.param_space.items()}
+                tasks.append(Task(sym, start, end, tmpl.name, params))
+
+    with parent.stage('load_data'):
+        frames = task_frames(data, tasks)
+    task_fn = functools.partial(_run_backtest, use_cache=not no_cache)
+    if profile:
+        task_fn = functools.partial(profiled_task, task_fn, cprofile=True)
+
+    ids = {task_id(t): t for t in tasks}
+    with ResultWriter(output, run=run_id(ids), resume=not fresh) as writer:
+        todo = [t for tid, t in ids.items() if tid not in writer.done]
+        if len(todo) < len(ids):
+            console.print(f"Resuming: {len(ids) - len(todo)} of {len(ids)} tasks already done.", style="bold yellow")
+        if todo:
+            with parent.stage('pool'):
+                for task, res in stream_tasks(task_fn, todo, frames, templates, workers):
+                    if profile:
+                        res, record = res
+                        report.add(task, record)
+                    with parent.stage('write'):
+                        writer.write(task_id(task), res)
+        results = writer.read()
+
+    console.print(f"Scan complete. {len(results)} results saved to {output}", style="bold green")
+    if profile:
+        results.attrs['profile'] = report.to_dict()
+        report.dump(profile_dir)
+        _print_profile(results.attrs['profile'], profile_dir)
 
 
 @cli.command('optimize')
@@ -180,10 +254,26 @@ def scan(symbols, periods, templates_dir, workers):
 @click.option('--workers', default=4, help='Number of parallel workers')
 @click.option('--n-initial', default=10, help='Number of initial Bayesian samples')
 @click.option('--n-calls', default=50, help='Number of Bayesian optimization calls')
-def optimize(symbols, periods, templates_dir, workers, n_initial, n_calls):
+@click.option('--no-cache', is_flag=True, default=False, help='Ignore and do not store cached backtest results')
+@click.option('--search', type=click.Choice(SEARCH_MODES), default='bayes', help='bayes, or multi-fidelity halving/hyperband (n-calls candidates)')
+@click.option('--metric', type=click.Choice(OPT_METRICS), default='net_profit', help='Backtest result to maximize')
+@click.option('--max-drawdown-pct', type=float, default=None, help='Stop a trial once equity falls this % below its peak')
+@click.option('--min-equity', type=float, default=None, help='Stop a trial once equity falls below this value')
+@click.option('--max-idle-bars', type=int, default=None, help='Stop a trial after this many bars without an entry or exit')
+@click.option('--output', default='opt_results.csv', help='Results file (.csv, .jsonl or .parquet), written as tasks finish')
+@click.option('--fresh', is_flag=True, default=False, help='Start over instead of resuming an interrupted run')
+@click.option('--profile', is_flag=True, default=False, help='Time each pipeline stage and keep cProfile stats of the slowest tasks')
+@click.option('--profile-dir', default=PROFILE_DIR, help='Where --profile writes summary.json and .prof files')
+def optimize(
+    symbols, periods, templates_dir, workers, n_initial, n_calls, no_cache=False, search='bayes',
+    metric='net_profit', max_drawdown_pct=None, min_equity=None, max_idle_bars=None, output='opt_results.csv',
+    fresh=False, profile=False, profile_dir=PROFILE_DIR
+):
     """
     Run Bayesian optimization across multiple symbols and periods.
     """
+    from optimizer import scan_optimize
+
     _print_user(f"optimize --symbols {symbols} --periods {periods} --n-initial {n_initial} --n-calls {n_calls}")
 
     symbol_list = [s.strip().upper() for s in symbols.split(',')]
@@ -192,11 +282,129 @@ def optimize(symbols, periods, templates_dir, workers, n_initial, n_calls):
         start, end = p.split(':')
         period_list.append((start, end))
 
-    df_results = scan_optimize(symbol_list, period_list, templates_dir, workers, n_initial, n_calls)
-    out_csv = 'opt_results.csv'
-    df_results.to_csv(out_csv, index=False)
+    df_results = scan_optimize(
+        symbol_list, period_list, templates_dir, workers, n_initial, n_calls,
+        use_cache=not no_cache, search=search, metric=metric,
+        stop_rules={'max_drawdown_pct': max_drawdown_pct, 'min_equity': min_equity, 'max_idle_bars': max_idle_bars},
+        output=output, resume=not fresh, profile=profile, profile_dir=profile_dir
+    )
+
+    console.print(f"Optimization complete. {len(df_results)} results saved to {output}", style="bold green")
+    if profile:
+        _print_profile(df_results.attrs['profile'], profile_dir)
+
 
-    console.print(f"Optimization complete. Results saved to {out_csv}", style="bold green")
+@cli.command('portfolio')
+@click.option('--symbols', required=True, help='Comma-separated list of stock symbols traded as one portfolio')
+@click.option('--start', default=None, help='Start date (YYYY-MM-DD)')
+@click.option('--end', default=None, help='End date (YYYY-MM-DD)')
+@click.option('--templates-dir', default='templates', help='Directory of Pine Script templates')
+@click.option('--capital', default=10000.0, help='Starting cash shared by all symbols')
+@click.option('--order-size-pct', default=20.0, help='Percent of current cash per entry')
+@click.option('--output', default='portfolio_results.csv', help='Portfolio metrics, one row per template')
+def portfolio(symbols, start, end, templates_dir, capital, order_size_pct, output='portfolio_results.csv'):
+    """
+    Backtest each template on all symbols at once, sharing one cash balance.
+    """
+    import pandas as pd
+    from data_manager import load_templates, load_data
+    from portfolio import PortfolioBacktester
+
+    _print_user(f"portfolio --symbols {symbols} --start {start} --end {end}")
+
+    data = load_data()
+    frames = {}
+    for sym in (s.strip().upper() for s in symbols.split(',')):
+        if sym not in data:
+            console.print(f"Data for symbol {sym} not found, skipping.", style="bold yellow")
+            continue
+        frames[sym] = data[sym].loc[start:end]
+    templates = load_templates(templates_dir)
+    if not frames or not templates:
+        console.print("Nothing to run (no data or no templates).", style="bold red")
+        return
+
+    bt = PortfolioBacktester(capital=capital, order_size_pct=order_size_pct)
+    rows, per_symbol = [], []
+    for tmpl in templates:
+        params = {k: v['default'] for k, v in tmpl.param_space.items()}
+        res = bt.run(frames, tmpl.compile(), params)
+        per_symbol.append(res.pop('per_symbol').assign(template=tmpl.name))
+        res.pop('equity_curve')
+        rows.append({'template': tmpl.name, **res})
+
+    pd.DataFrame(rows).to_csv(output, index=False)
+    symbols_csv = os.path.splitext(output)[0] + '_symbols.csv'
+    pd.concat(per_symbol).to_csv(symbols_csv)
+    console.print(f"Portfolio backtest complete. Results saved to {output} and {symbols_csv}", style="bold green")
+
+
+@cli.command('walk-forward')
+@click.option('--symbols', required=True, help='Comma-separated list of stock symbols')
+@click.option('--train-bars', required=True, type=int, help='Bars in each training window')
+@click.option('--test-bars', required=True, type=int, help='Bars in each out-of-sample test window')
+@click.option('--anchored', is_flag=True, default=False, help='Grow the training window from the first bar instead of rolling it')
+@click.option('--start', default=None, help='Start of the history to use (YYYY-MM-DD)')
+@click.option('--end', default=None, help='End of the history to use (YYYY-MM-DD)')
+@click.option('--templates-dir', default='templates', help='Directory of Pine Script templates')
+@click.option('--workers', default=4, help='Number of parallel workers')
+@click.option('--n-initial', default=10, help='Number of initial Bayesian samples')
+@click.option('--n-calls', default=50, help='Number of Bayesian optimization calls')
+@click.option('--no-cache', is_flag=True, default=False, help='Ignore and do not store cached backtest results')
+def walk_forward_cmd(
+    symbols, train_bars, test_bars, anchored, templates_dir, workers, n_initial, n_calls, no_cache=False,
+    start=None, end=None
+):
+    """
+    Walk-forward optimization: optimize on each train window, test on the next.
+    """
+    import pandas as pd
+    from optimizer import walk_forward
+
+    _print_user(f"walk-forward --symbols {symbols} --train-bars {train_bars} --test-bars {test_bars}")
+
+    symbol_list = [s.strip().upper() for s in symbols.split(',')]
+    folds, equity = walk_forward(
+        symbol_list, train_bars, test_bars, templates_dir, anchored, workers,
+        n_initial, n_calls, use_cache=not no_cache, start=start, end=end
+    )
+    if folds.empty:
+        console.print("No folds to run (missing data or history shorter than --train-bars).", style="bold red")
+        return
+
+    out_csv = 'wf_folds.csv'
+    folds.to_csv(out_csv, index=False)
+    equity_csv = 'wf_equity.csv'
+    pd.DataFrame({f"{sym}:{tmpl}": curve for (sym, tmpl), curve in equity.items()}).to_csv(equity_csv)
+
+    console.print(
+        f"Walk-forward complete: {len(folds)} folds in {folds['wall_time'].sum():.1f}s of worker time. "
+        f"Results saved to {out_csv} and {equity_csv}",
+        style="bold green"
+    )
+
+
+@cli.command('validate')
+@click.argument('scripts', nargs=-1, required=True, type=click.Path(exists=True))
+def validate(scripts):
+    """
+    Check Pine Script files locally (version, strategy(), inputs, ta.*, brackets, identifiers).
+    """
+    from pine_validator import check_pine, format_issues, is_valid
+
+    failed = 0
+    for path in scripts:
+        with open(path, 'r') as f:
+            issues = check_pine(f.read())
+        if is_valid(issues):
+            console.print(f"{path}: OK", style="bold green")
+        else:
+            failed += 1
+            console.print(f"{path}: invalid", style="bold red")
+        if issues:
+            console.print(format_issues(issues), markup=False)
+    if failed:
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
@@ -1,19 +1,107 @@
 import os
+import re
 import glob
+import json
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from typing import List
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from strategies import StrategyTemplate
+from template_manager import TemplateManager
 
 # Default folder for CSV history files
 DATA_FOLDER = 'data'
+# Columnar binary copies of the CSVs live in this subfolder next to them
+STORE_DIRNAME = '.store'
+STORE_VERSION = 2
+# Manifest describing every CSV in the data folder
+CATALOG_FILENAME = 'catalog.json'
+# Files written by download_yfinance: {symbol}_{years}Y_{interval}.csv
+FILENAME_PATTERN = re.compile(r"^(?P<symbol>.+?)_(?P<years>\d+)Y_(?P<interval>[^_]+)$")
+
+def _bound(value: str, tz: Optional[str], upper: bool):
+    """
+    Converts a start/end label to a UTC-naive timestamp and the searchsorted
+    side to use. An upper bound given as a partial date ('2015', '2015-06',
+    '2015-06-30') covers the whole period, as with df.loc, and becomes an
+    exclusive limit.
+    """
+    ts = pd.Timestamp(value)
+    side = 'left'
+    if upper:
+        text = value.strip() if isinstance(value, str) else ''
+        if re.fullmatch(r"\d{4}", text):
+            ts = ts + pd.DateOffset(years=1)
+        elif re.fullmatch(r"\d{4}-\d{2}", text):
+            ts = ts + pd.DateOffset(months=1)
+        elif re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
+            ts = ts + pd.Timedelta(days=1)
+        else:
+            side = 'right'
+    if ts.tz is None and tz is not None:
+        ts = ts.tz_localize(tz)
+    if ts.tz is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.to_datetime64(), side
+
+
+def row_range(ts: np.ndarray, tz: Optional[str], start: Optional[str], end: Optional[str]):
+    """
+    [lo, hi) rows of a sorted datetime64 array between start and end.
+    """
+    lo, hi = 0, len(ts)
+    if start is not None:
+        bound, side = _bound(start, tz, False)
+        lo = int(np.searchsorted(ts, bound.astype(ts.dtype), side=side))
+    if end is not None:
+        bound, side = _bound(end, tz, True)
+        hi = int(np.searchsorted(ts, bound.astype(ts.dtype), side=side))
+    return lo, max(lo, hi)
+
+
+def covering_range(ranges: List[Tuple[Optional[str], Optional[str]]]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Smallest (start, end) whose df.loc slice holds the rows of every
+    (start, end) in ranges; a None bound is open-ended.
+    """
+    def _end_key(end: str):
+        limit, side = _bound(end, None, True)
+        # On a tie, an exact end label includes its timestamp; a partial
+        # date stops just before it
+        return limit, side == 'right'
+
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    start = None if None in starts else min(starts, key=lambda s: _bound(s, None, False)[0])
+    end = None if None in ends else max(ends, key=_end_key)
+    return start, end
+
+
+def _pick_paths(manager: 'DataManager', entries: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Maps each symbol to one dataset path; with several files for a symbol,
+    the largest (most history) wins.
+    """
+    paths: Dict[str, str] = {}
+    sizes: Dict[str, int] = {}
+    for entry in entries:
+        sym = entry['symbol']
+        size = entry['fingerprint']['size']
+        if sym not in paths or size > sizes[sym]:
+            paths[sym] = os.path.join(manager.data_folder, entry['file'])
+            sizes[sym] = size
+    return paths
+
 
 class DataManager:
     """
     Handles listing, loading, and downloading OHLC data CSVs.
     """
 
-    def __init__(self, data_folder: str = DATA_FOLDER):
+    def __init__(self, data_folder: str = DATA_FOLDER, use_store: bool = True):
         self.data_folder = data_folder
+        self.use_store = use_store
         # Ensure the data folder exists
         os.makedirs(self.data_folder, exist_ok=True)
 
@@ -24,10 +112,284 @@ class DataManager:
         pattern = os.path.join(self.data_folder, "*.csv")
         return glob.glob(pattern)
 
+    def catalog(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the dataset manifest keyed by file name. Each entry records
+        symbol, interval, rows, first/last timestamp, columns and the file
+        fingerprint (mtime, size). Only file metadata is read: entries for new
+        or changed files take their stats from the columnar store if it is
+        current, and are otherwise left empty until the file is first loaded.
+        """
+        path = os.path.join(self.data_folder, CATALOG_FILENAME)
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+
+        entries: Dict[str, Dict[str, Any]] = {}
+        changed = False
+        with os.scandir(self.data_folder) as it:
+            for de in it:
+                if not (de.is_file() and de.name.lower().endswith('.csv')):
+                    continue
+                st = de.stat()
+                fingerprint = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+                entry = saved.get(de.name)
+                if entry is None or entry.get('fingerprint') != fingerprint:
+                    entry = self._catalog_entry(de.path, fingerprint)
+                    changed = True
+                entries[de.name] = entry
+        if changed or set(entries) != set(saved):
+            self._save_catalog(entries)
+        return entries
+
+    def find_datasets(self, symbol: Optional[str] = None, interval: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Filters the catalog by symbol and/or interval without loading data.
+        """
+        out = []
+        for name, entry in sorted(self.catalog().items()):
+            if symbol is not None and entry['symbol'] != symbol.upper():
+                continue
+            if interval is not None and entry['interval'] != interval:
+                continue
+            out.append({'file': name, **entry})
+        return out
+
+    def _catalog_entry(
+        self,
+        filepath: str,
+        fingerprint: Dict[str, int],
+        df: Optional[pd.DataFrame] = None
+    ) -> Dict[str, Any]:
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        m = FILENAME_PATTERN.match(stem)
+        entry: Dict[str, Any] = {
+            'symbol': (m.group('symbol') if m else stem).upper(),
+            'interval': m.group('interval') if m else None,
+            'rows': None,
+            'first': None,
+            'last': None,
+            'columns': None,
+            'fingerprint': fingerprint,
+        }
+        if df is None and self.use_store and self._read_meta(filepath) is not None:
+            df = self._open_store(filepath)
+        if df is not None:
+            entry['rows'] = int(len(df))
+            entry['columns'] = list(df.columns)
+            if len(df):
+                entry['first'] = str(df.index[0])
+                entry['last'] = str(df.index[-1])
+        return entry
+
+    def _save_catalog(self, entries: Dict[str, Dict[str, Any]]):
+        path = os.path.join(self.data_folder, CATALOG_FILENAME)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f, indent=1)
+        os.replace(tmp, path)
+
+    def _record_loaded(self, filepath: str, df: pd.DataFrame):
+        """
+        Fills in the catalog stats for a dataset that has just been loaded.
+        """
+        entries = self.catalog()
+        name = os.path.basename(filepath)
+        if name in entries and entries[name]['rows'] is None:
+            entries[name] = self._catalog_entry(filepath, entries[name]['fingerprint'], df)
+            self._save_catalog(entries)
+
     def load_csv(self, filepath: str) -> pd.DataFrame:
         """
         Loads a CSV into a pandas DataFrame, parsing dates and dropping non-numeric rows.
         Expects CSV with datetime index in column 0 and OHLC(+Volume) columns.
+
+        With use_store, the CSV is parsed once into a columnar store and later
+        loads memory-map the stored columns instead of re-parsing text.
+        """
+        if self.use_store:
+            df = self._open_store(filepath)
+            if df is not None:
+                return df
+            df = self._parse_csv(filepath)
+            if self._build_store(filepath, df):
+                return self._open_store(filepath)
+            return df
+        return self._parse_csv(filepath)
+
+    def store_path(self, filepath: str) -> str:
+        """
+        Directory holding the columnar store for a CSV: one .npy file per
+        column, an int64 timestamp index and a meta.json.
+        """
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        return os.path.join(os.path.dirname(filepath), STORE_DIRNAME, name)
+
+    @staticmethod
+    def _fingerprint(filepath: str) -> Dict[str, int]:
+        st = os.stat(filepath)
+        return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+    def _read_meta(self, filepath: str) -> Optional[dict]:
+        """
+        Returns the store metadata if it exists and matches the CSV's current
+        mtime and size, else None.
+        """
+        meta_path = os.path.join(self.store_path(filepath), 'meta.json')
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != STORE_VERSION:
+            return None
+        if meta.get('source') != self._fingerprint(filepath):
+            return None
+        return meta
+
+    def _build_store(self, filepath: str, df: pd.DataFrame) -> bool:
+        """
+        Writes df as a columnar store for filepath. meta.json is written last,
+        so a partially written store is never considered valid.
+        Returns False if the index cannot be stored as timestamps.
+        """
+        index = df.index
+        if not isinstance(index, pd.DatetimeIndex):
+            try:
+                index = pd.DatetimeIndex(pd.to_datetime(index))
+            except (ValueError, TypeError):
+                # Mixed UTC offsets (e.g. across DST) only parse as UTC
+                try:
+                    index = pd.DatetimeIndex(pd.to_datetime(index, utc=True))
+                except (ValueError, TypeError):
+                    return False
+        tz = str(index.tz) if index.tz is not None else None
+        if tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+
+        store = self.store_path(filepath)
+        os.makedirs(store, exist_ok=True)
+        meta_path = os.path.join(store, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        def _save(name: str, arr: np.ndarray):
+            tmp = os.path.join(store, f'.{name}.tmp.npy')
+            np.save(tmp, np.ascontiguousarray(arr))
+            os.replace(tmp, os.path.join(store, f'{name}.npy'))
+
+        ts = index.to_numpy()
+        _save('index', ts.view(np.int64))
+        for i, col in enumerate(df.columns):
+            _save(f'col{i}', df[col].to_numpy())
+
+        meta = {
+            'version': STORE_VERSION,
+            'source': self._fingerprint(filepath),
+            'columns': list(df.columns),
+            'index_name': df.index.name,
+            'index_dtype': str(ts.dtype),
+            'tz': tz,
+            'rows': int(len(df)),
+            'sorted': bool(len(ts) < 2 or (np.diff(ts.view(np.int64)) >= 0).all()),
+        }
+        tmp = meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+        return True
+
+    def _open_store(
+        self,
+        filepath: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Opens a valid store as a DataFrame over read-only memory-mapped
+        columns (no parsing, no copy). With start/end, the row range is found
+        by binary search on the sorted timestamp index and only those rows
+        are mapped. Returns None if the store is missing or stale.
+        """
+        meta = self._read_meta(filepath)
+        if meta is None:
+            return None
+        store = self.store_path(filepath)
+        try:
+            ts = np.load(os.path.join(store, 'index.npy'), mmap_mode='r')
+            cols = {
+                col: np.load(os.path.join(store, f'col{i}.npy'), mmap_mode='r')
+                for i, col in enumerate(meta['columns'])
+            }
+        except (OSError, ValueError):
+            return None
+        ts = ts.view(meta['index_dtype'])
+
+        ranged = start is not None or end is not None
+        if ranged and meta['sorted']:
+            lo, hi = row_range(ts, meta['tz'], start, end)
+            ts = ts[lo:hi]
+            cols = {col: arr[lo:hi] for col, arr in cols.items()}
+            ranged = False
+
+        index = pd.DatetimeIndex(ts, name=meta['index_name'], copy=False)
+        if meta['tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        df = pd.DataFrame(cols, index=index, copy=False)
+        if ranged:
+            # Unsorted index: fall back to a label slice of the full frame
+            df = df.loc[start:end]
+        return df
+
+    def load_range(
+        self,
+        filepath: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Loads rows of a CSV between start and end (inclusive, same semantics
+        as df.loc[start:end]). With the store enabled, only the requested
+        rows are mapped.
+        """
+        if self.use_store:
+            df = self._open_store(filepath, start, end)
+            if df is not None:
+                return df
+            self.load_csv(filepath)
+            df = self._open_store(filepath, start, end)
+            if df is not None:
+                return df
+        return self.load_csv(filepath).loc[start:end]
+
+    def resolve(self, symbol: str, interval: Optional[str] = None) -> Optional[str]:
+        """
+        Path of the dataset used for symbol (the largest file when several
+        match), or None.
+        """
+        return _pick_paths(self, self.find_datasets(symbol=symbol, interval=interval)).get(symbol.upper())
+
+    def load(
+        self,
+        symbol: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        interval: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Loads symbol's history between start and end as a zero-copy view.
+        Raises KeyError if no dataset exists for the symbol.
+        """
+        path = self.resolve(symbol, interval)
+        if path is None:
+            raise KeyError(symbol)
+        return self.load_range(path, start, end)
+
+    def _parse_csv(self, filepath: str) -> pd.DataFrame:
+        """
+        Parses the CSV text (the slow path the store avoids).
         """
         df = pd.read_csv(filepath, parse_dates=[0], index_col=0)
         # Normalize column names (e.g. 'open' -> 'Open')
@@ -43,8 +405,65 @@ class DataManager:
         Downloads historical data via yfinance and saves to data_folder.
         Returns the filepath of the saved CSV.
         """
+        import yfinance as yf
+
         df = yf.download(symbol, period=f"{years}y", interval=interval)
         filename = f"{symbol}_{years}Y_{interval}.csv"
         path = os.path.join(self.data_folder, filename)
         df.to_csv(path)
         return path
+
+
+class LazyData(Mapping):
+    """
+    Read-only symbol -> DataFrame mapping over the catalog. Membership and
+    iteration only consult the manifest; a symbol's file is loaded the first
+    time it is indexed and kept for later lookups.
+    """
+
+    def __init__(self, manager: DataManager, interval: Optional[str] = None):
+        self.manager = manager
+        self._paths = _pick_paths(manager, manager.find_datasets(interval=interval))
+        self._loaded: Dict[str, pd.DataFrame] = {}
+
+    def __getitem__(self, symbol: str) -> pd.DataFrame:
+        if symbol not in self._loaded:
+            path = self._paths[symbol]
+            df = self.manager.load_csv(path)
+            self.manager._record_loaded(path, df)
+            self._loaded[symbol] = df
+        return self._loaded[symbol]
+
+    def load(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        Loads only the rows of symbol between start and end (see
+        DataManager.load_range); uses the in-memory frame if already loaded.
+        """
+        if symbol in self._loaded:
+            return self._loaded[symbol].loc[start:end]
+        return self.manager.load_range(self._paths[symbol], start, end)
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self._paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+def load_data(data_folder: str = DATA_FOLDER, interval: Optional[str] = None) -> LazyData:
+    """
+    Returns a lazy symbol -> DataFrame mapping of the datasets in data_folder.
+    """
+    return LazyData(DataManager(data_folder), interval=interval)
+
+
+def load_templates(templates_dir: str = 'templates') -> List[StrategyTemplate]:
+    """
+    Loads all Pine Script templates in templates_dir ([] if it does not exist).
+    """
+    if not os.path.isdir(templates_dir):
+        return []
+    return TemplateManager(templates_dir).get_templates()
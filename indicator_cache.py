@@ -0,0 +1,179 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import profiler
+
+# Default memory budget for cached indicator arrays
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=False, deep=False)))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return 0
+
+
+def dataset_key(series: pd.Series) -> Tuple[Optional[Tuple[Hashable, ...]], Any]:
+    """
+    Identity of the data a series holds, and the object a cache entry must
+    keep alive for that identity to stay unique; (None, None) when the
+    series cannot be cached.
+
+    NumPy-backed series are keyed by the address, strides, length and
+    first/last timestamps of their buffer, which only identifies the
+    values if they cannot change: the array owning the buffer must be
+    read-only (columnar store memmaps, shared-memory frames). It is
+    returned for pinning, so the address cannot be reused by other data
+    while an entry for it is alive. Writable frames can be modified in
+    place under the same address and are not cached. For extension dtypes
+    to_numpy() returns a fresh copy each time, so those series are keyed
+    by a hash of their values and index instead.
+    """
+    if len(series) == 0:
+        return (0, 0, None, None), None
+    if not isinstance(series.dtype, np.dtype):
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(series).to_numpy().view(np.uint8), digest_size=16)
+        return ('content', digest.hexdigest(), len(series)), None
+    arr = series.to_numpy()
+    owner = arr
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    if owner.flags.writeable:
+        return None, None
+    key = (
+        arr.__array_interface__['data'][0],
+        arr.strides,
+        len(arr),
+        series.index[0],
+        series.index[-1],
+    )
+    return key, owner
+
+
+class IndicatorCache:
+    """
+    LRU cache of derived indicator series, keyed by
+    (dataset identity, indicator name, parameters) and bounded by a memory
+    budget. The budget covers the cached values and the source arrays the
+    entries keep alive (each counted once). Only series over read-only
+    data are cached (see dataset_key); others are computed every time.
+    Cached values are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Any, int]]" = OrderedDict()
+        # id(owner) -> [owner, number of entries pinning it]
+        self._owners: Dict[int, list] = {}
+
+    def get(
+        self,
+        series: pd.Series,
+        name: str,
+        params: Tuple[Hashable, ...],
+        compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return the cached value for (series, name, params), computing and
+        storing it on a miss.
+        """
+        data_key, owner = dataset_key(series)
+        if data_key is None:
+            self.misses += 1
+            profiler.count('indicator_cache_misses')
+            return compute()
+        key = (data_key, name, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            profiler.count('indicator_cache_hits')
+            return entry[0]
+
+        self.misses += 1
+        profiler.count('indicator_cache_misses')
+        value = compute()
+        size = _nbytes(value)
+        pinned = owner is not None and id(owner) not in self._owners
+        if size + (owner.nbytes if pinned else 0) > self.max_bytes:
+            return value
+        self._entries[key] = (value, owner, size)
+        self.nbytes += size
+        if owner is not None:
+            if pinned:
+                self._owners[id(owner)] = [owner, 0]
+                self.nbytes += owner.nbytes
+            self._owners[id(owner)][1] += 1
+        while self.nbytes > self.max_bytes:
+            _, (_, old_owner, old_size) = self._entries.popitem(last=False)
+            self.nbytes -= old_size
+            self._unpin(old_owner)
+            self.evictions += 1
+        return value
+
+    def _unpin(self, owner: Any):
+        if owner is None:
+            return
+        pin = self._owners[id(owner)]
+        pin[1] -= 1
+        if pin[1] == 0:
+            del self._owners[id(owner)]
+            self.nbytes -= owner.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self._owners.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'nbytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    # Indicator helpers
+
+    def ema(self, series: pd.Series, span: int) -> pd.Series:
+        return self.get(series, 'ema', (span,), lambda: series.ewm(span=span).mean())
+
+    def diff(self, series: pd.Series) -> pd.Series:
+        return self.get(series, 'diff', (), lambda: series.diff())
+
+    def rma_gain(self, series: pd.Series, length: int) -> pd.Series:
+        """Wilder average of up-moves (ewm with alpha=1/length)."""
+        def _compute():
+            d = self.diff(series)
+            return d.where(d > 0, 0).ewm(alpha=1/length).mean()
+        return self.get(series, 'rma_gain', (length,), _compute)
+
+    def rma_loss(self, series: pd.Series, length: int) -> pd.Series:
+        """Wilder average of down-moves (ewm with alpha=1/length)."""
+        def _compute():
+            d = self.diff(series)
+            return (-d.where(d < 0, 0)).ewm(alpha=1/length).mean()
+        return self.get(series, 'rma_loss', (length,), _compute)
+
+    def rsi(self, series: pd.Series, length: int) -> pd.Series:
+        def _compute():
+            ag = self.rma_gain(series, length)
+            al = self.rma_loss(series, length)
+            return 100 - (100/(1+ag/al))
+        return self.get(series, 'rsi', (length,), _compute)
+
+
+# Process-wide cache shared by strategies unless they are given their own
+INDICATOR_CACHE = IndicatorCache()
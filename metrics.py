@@ -0,0 +1,150 @@
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Calendar days per year, for turning an index span into bars per year
+DAYS_PER_YEAR = 365.25
+
+# Keys added to backtest results by equity_metrics
+RISK_METRICS = (
+    'max_drawdown_val', 'max_drawdown_pct', 'max_drawdown_bars', 'annual_return_pct',
+    'sharpe', 'sortino', 'calmar', 'profit_factor', 'exposure_pct',
+)
+
+Metric = Union[float, np.ndarray]
+
+
+def bars_per_year(index: pd.DatetimeIndex) -> Optional[float]:
+    """
+    Bar density of index: bars per calendar year over the span it covers,
+    so gaps (nights, weekends) are accounted for. None if it spans no time.
+    """
+    if len(index) < 2:
+        return None
+    years = (index[-1] - index[0]) / pd.Timedelta(days=DAYS_PER_YEAR)
+    return (len(index) - 1) / years if years > 0 else None
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """num / den, with a zero denominator giving +-inf by the numerator's sign, or 0 for 0/0."""
+    num, den = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(den, dtype=float))
+    out = np.where(num > 0, np.inf, np.where(num < 0, -np.inf, num))
+    ok = den > 0
+    out[ok] = num[ok] / den[ok]
+    return out
+
+
+def profit_factor(gross_profit: Metric, gross_loss: Metric) -> Metric:
+    """Gross profit over gross loss; inf without losing trades, 0 without trades."""
+    out = _ratio(gross_profit, gross_loss)
+    return float(out) if out.ndim == 0 else out
+
+
+def equity_metrics(
+    equity: np.ndarray,
+    capital: Optional[float] = None,
+    index: Optional[pd.DatetimeIndex] = None,
+    periods_per_year: Optional[float] = None,
+    trade_logs: Union[np.ndarray, Sequence[np.ndarray], None] = None,
+    n_bars: Optional[int] = None
+) -> Dict[str, Metric]:
+    """
+    Risk and return metrics of an equity curve (n values) or of a
+    bars x variants equity matrix, computed column-wise with array passes.
+    Returns floats for a curve and arrays (one value per variant) for a
+    matrix:
+    - max_drawdown_val / _pct: largest fall from a running peak (capital
+      counts as the first peak), and max_drawdown_bars, the longest run of
+      bars below a peak
+    - annual_return_pct: compound annual growth from capital to the final
+      value over the time the curve spans; inf when that overflows, NaN
+      when it spans no time
+    - sharpe / sortino: annualized mean bar return over its standard
+      deviation / downside deviation
+    - calmar: annual return over max drawdown
+    - profit_factor and exposure_pct (bars from entry to exit over n_bars),
+      from trade_logs (backtester.TRADE_DTYPE arrays, one per variant);
+      NaN without them
+
+    Bars per year (for annualizing Sharpe/Sortino) come from
+    periods_per_year, else from index (see bars_per_year). The span for
+    annual_return_pct is that of index, else n - 1 bar intervals at
+    periods_per_year; without either the whole curve counts as one year.
+    capital defaults to the first value, n_bars to the curve length.
+    Ratios with a zero denominator are +-inf by the sign of the numerator,
+    or 0 when both are 0 (e.g. a flat curve).
+    """
+    eq = np.asarray(equity, dtype=np.float64)
+    if eq.ndim not in (1, 2) or len(eq) == 0:
+        raise ValueError("equity must be a non-empty curve or bars x variants matrix")
+    single = eq.ndim == 1
+    # Reductions run along axis 0, so a single curve stays 1-D (faster than n x 1)
+    n, shape = len(eq), eq.shape[1:]
+    start = eq[0].copy() if capital is None else np.full(shape, float(capital))
+    n_bars = n if n_bars is None else n_bars
+    # A final point (e.g. cash after closing at the end) may follow the
+    # last bar, so years come from the index span rather than n
+    if index is not None and len(index) > 1:
+        years = (index[-1] - index[0]) / pd.Timedelta(days=DAYS_PER_YEAR)
+    elif periods_per_year is not None:
+        years = (n - 1) / periods_per_year
+    else:
+        years = 1.0
+    if periods_per_year is None and index is not None:
+        periods_per_year = bars_per_year(index)
+    if periods_per_year is None:
+        periods_per_year = float(n)
+
+    # Drawdown from the running peak and how long each one lasts
+    peak = np.maximum(np.maximum.accumulate(eq, axis=0), start)
+    dd = peak - eq
+    max_dd_val = dd.max(axis=0)
+    max_dd_frac = np.divide(dd, peak, out=np.zeros_like(dd), where=peak > 0).max(axis=0)
+    bar = np.arange(n).reshape((n,) + (1,) * len(shape))
+    last_peak = np.maximum.accumulate(np.where(eq >= peak, bar, -1), axis=0)
+    max_dd_bars = (bar - last_peak).max(axis=0)
+
+    # Bar returns, the first one from capital
+    prev = np.concatenate((start[None], eq[:-1]))
+    rets = np.divide(eq, prev, out=np.ones_like(eq), where=prev != 0)
+    rets -= 1.0
+    mean = rets.mean(axis=0)
+    std = rets.std(axis=0, ddof=1) if n > 1 else np.zeros(shape)
+    downside = np.sqrt(np.mean(np.minimum(rets, 0.0) ** 2, axis=0))
+    scale = np.sqrt(periods_per_year)
+
+    # In log space: growth ** (1 / years) overflows for short spans
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = np.maximum(np.where(start > 0, eq[-1] / start, 0.0), 0.0)
+        if years > 0:
+            annual = np.expm1(np.log(growth) / years)
+        else:
+            annual = np.full(shape, np.nan)
+
+    out: Dict[str, Metric] = {
+        'max_drawdown_val': max_dd_val,
+        'max_drawdown_pct': max_dd_frac * 100.0,
+        'max_drawdown_bars': max_dd_bars,
+        'annual_return_pct': annual * 100.0,
+        'sharpe': _ratio(mean, std) * scale,
+        'sortino': _ratio(mean, downside) * scale,
+        'calmar': _ratio(annual, max_dd_frac),
+        'profit_factor': np.full(shape, np.nan),
+        'exposure_pct': np.full(shape, np.nan),
+    }
+
+    if trade_logs is not None:
+        logs = [trade_logs] if single else list(trade_logs)
+        if len(logs) != (1 if single else shape[0]):
+            raise ValueError(f"Got {len(logs)} trade logs for {1 if single else shape[0]} equity curves")
+        pnl = [log['pnl'] for log in logs]
+        gross_profit = np.array([p[p > 0].sum() for p in pnl])
+        gross_loss = np.array([-p[p < 0].sum() for p in pnl])
+        held = np.array([(log['exit_bar'] - log['entry_bar']).sum() for log in logs], dtype=float)
+        out['profit_factor'] = _ratio(gross_profit, gross_loss).reshape(shape)
+        out['exposure_pct'] = (held / n_bars * 100.0 if n_bars else np.zeros(len(logs))).reshape(shape)
+
+    if single:
+        return {name: (int(v) if name == 'max_drawdown_bars' else float(v)) for name, v in out.items()}
+    return out
@@ -1,15 +1,43 @@
+import functools
 import random
-from typing import Any, Dict, List, Tuple
-import concurrent.futures
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 import pandas as pd
 
-from skopt import gp_minimize
-from skopt.space import Real, Integer, Categorical
+from skopt import Optimizer, gp_minimize
+from skopt.space import Real, Integer, Categorical, Space
 from skopt.utils import use_named_args
 
+import profiler
 from backtester import Backtester, BacktestResult
+from profiler import PROFILE_DIR, ProfileReport, profiled_task
+from result_cache import ResultCache
 from strategies import StrategyTemplate
-from data_manager import load_data, load_templates
+from data_manager import LazyData, load_data, load_templates
+from result_writer import ResultWriter, run_id, task_id
+from search_options import OPT_METRICS, SEARCH_MODES
+from worker_pool import SharedPool, Task, get_frame, get_template, run_tasks, stream_tasks, task_frames
+
+
+def sample_params(param_space: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Draws one random parameter set from a template-style param_space.
+    Inputs without bounds are left out and keep their default.
+    """
+    params = {}
+    for name, space in param_space.items():
+        if space['bounds'] is None:
+            continue
+        if space['type'] == 'int':
+            params[name] = random.randint(space['bounds'][0], space['bounds'][1])
+        elif space['type'] == 'float':
+            low, high = space['bounds']
+            params[name] = random.uniform(low, high)
+        elif space['type'] == 'categorical':
+            params[name] = random.choice(space['bounds'])
+        else:
+            raise ValueError(f"Unsupported parameter type: {space['type']}")
+    return params
 
 
 class EnsembleSampler:
@@ -27,80 +55,352 @@ class EnsembleSampler:
         selected = random.sample(self.templates, self.num_strategies)
         variants: List[Tuple[str, str, Dict[str, Any]]] = []
         for tmpl in selected:
-            params = {}
-            for name, space in tmpl.param_space.items():
-                if space['type'] == 'int':
-                    params[name] = random.randint(space['bounds'][0], space['bounds'][1])
-                elif space['type'] == 'float':
-                    low, high = space['bounds']
-                    params[name] = random.uniform(low, high)
-                elif space['type'] == 'categorical':
-                    params[name] = random.choice(space['bounds'])
-                else:
-                    raise ValueError(f"Unsupported parameter type: {space['type']}")
-
+            params = sample_params(tmpl.param_space)
             script = tmpl.instantiate(params)
             variants.append((tmpl.name, script, params))
         return variants
 
 
+# Bound on objective values: ratio metrics are +-inf without losses or trades
+SCORE_CAP = 1e6
+
+
+def trial_score(result: BacktestResult, metric: str, pruned_penalty: float = 0.0) -> float:
+    """
+    Objective value of one backtest. NaN scores 0 and +-inf is clipped to
+    +-SCORE_CAP, as the GP surrogate needs finite values. A run ended early
+    by a Backtester stop rule scores below every completed run: its partial
+    score, at most 0, is shifted down by 2 * SCORE_CAP plus pruned_penalty,
+    so pruned runs keep their order among themselves.
+    """
+    score = float(result[metric])
+    if score != score:
+        score = 0.0
+    score = min(max(score, -SCORE_CAP), SCORE_CAP)
+    if result.get('pruned'):
+        # Completed runs score at least -SCORE_CAP
+        score = min(score, 0.0) - 2 * SCORE_CAP - pruned_penalty
+    return score
+
+
 class BayesianOptimizer:
     """
     Performs Bayesian optimization over a StrategyTemplate's parameters to maximize net profit.
+
+    With batch_size > 1, candidates are proposed k at a time with skopt's
+    ask/tell interface (constant-liar strategy) and each batch is scored on a
+    process pool. Results are reproducible for a given random_state and
+    batch_size. Timing of the latest run is kept in last_run.
+
+    Trials pruned by the backtester's stop rules are scored with
+    trial_score, i.e. below every completed trial, less pruned_penalty.
     """
     def __init__(
         self,
         backtester: Backtester,
+        data: pd.DataFrame = None,
         metric: str = 'net_profit',
-        win_rate_metric: str = 'win_rate'
+        win_rate_metric: str = 'win_rate',
+        random_state: int = 42,
+        pruned_penalty: float = 0.0
     ):
         self.backtester = backtester
+        self.data = data
         self.metric = metric
         self.win_rate_metric = win_rate_metric
+        self.random_state = random_state
+        self.pruned_penalty = pruned_penalty
+        self.last_run: Dict[str, Any] = {}
+
+    @staticmethod
+    def _dimensions(template: StrategyTemplate) -> list:
+        """Search dimensions of the bounded inputs; the others keep their default."""
+        dimensions = []
+        for name, space in template.param_space.items():
+            if space['bounds'] is None:
+                continue
+            if space['type'] == 'int':
+                dimensions.append(Integer(space['bounds'][0], space['bounds'][1], name=name))
+            elif space['type'] == 'float':
+                dimensions.append(Real(space['bounds'][0], space['bounds'][1], name=name))
+            elif space['type'] == 'categorical':
+                dimensions.append(Categorical(space['bounds'], name=name))
+            else:
+                raise ValueError(f"Unsupported parameter type: {space['type']}")
+        if not dimensions:
+            raise ValueError(f"Template {template.name} has no inputs with minval/maxval to optimize")
+        return dimensions
 
     def optimize(
         self,
         template: StrategyTemplate,
         n_initial: int = 10,
-        n_calls: int = 50
+        n_calls: int = 50,
+        batch_size: int = 1,
+        workers: int = None
     ) -> Tuple[Dict[str, Any], float]:
         """
         Runs Bayesian optimization on the given strategy template.
+        batch_size > 1 evaluates that many candidates per step in parallel
+        on `workers` processes (default: batch_size).
 
         Returns:
             best_params: dict of parameter name to optimal value
             best_score: achieved metric value
         """
-        dimensions = []
-        for name, space in template.param_space.items():
-            if space['type'] == 'int':
-                dimensions.append(Integer(space['bounds'][0], space['bounds'][1], name=name))
-            elif space['type'] == 'float':
-                dimensions.append(Real(space['bounds'][0], space['bounds'][1], name=name))
-            elif space['type'] == 'categorical':
-                dimensions.append(Categorical(space['bounds'], name=name))
-            else:
-                raise ValueError(f"Unsupported parameter type: {space['type']}")
+        dimensions = self._dimensions(template)
+        t0 = time.perf_counter()
+        if batch_size > 1:
+            x, fun = self._optimize_batched(
+                template, dimensions, n_initial, n_calls, batch_size, workers or batch_size
+            )
+        else:
+            x, fun = self._optimize_sequential(template, dimensions, n_initial, n_calls)
+        self.last_run = {
+            'mode': 'batched' if batch_size > 1 else 'sequential',
+            'batch_size': batch_size,
+            'n_calls': n_calls,
+            'bar_evaluations': n_calls * len(self.data),
+            'wall_time': time.perf_counter() - t0,
+        }
+
+        best_params = {dim.name: val for dim, val in zip(dimensions, x)}
+        best_score = -fun
+        return best_params, best_score
+
+    def _optimize_sequential(self, template, dimensions, n_initial, n_calls):
+        # Compiled once per template; each trial only binds parameter values
+        strat = template.compile()
 
         @use_named_args(dimensions)
         def objective(**params) -> float:
-            script = template.instantiate(params)
-            result: BacktestResult = self.backtester.run(script)
-            score = getattr(result, self.metric)
-            return -float(score)
+            result: BacktestResult = self.backtester.run(self.data, strat, params)
+            return -trial_score(result, self.metric, self.pruned_penalty)
 
         result = gp_minimize(
             func=objective,
             dimensions=dimensions,
             n_initial_points=n_initial,
             n_calls=n_calls,
-            random_state=42
+            random_state=self.random_state
         )
+        return result.x, result.fun
 
-        best_params = {dim.name: val for dim, val in zip(dimensions, result.x)}
-        best_score = -result.fun
+    def _optimize_batched(self, template, dimensions, n_initial, n_calls, batch_size, workers):
+        opt = Optimizer(
+            dimensions,
+            base_estimator='GP',
+            n_initial_points=n_initial,
+            random_state=self.random_state
+        )
+        names = [dim.name for dim in dimensions]
+        score_fn = functools.partial(
+            _score_task, backtester=self.backtester, metric=self.metric, pruned_penalty=self.pruned_penalty
+        )
+
+        with SharedPool({_DATA_KEY: self.data}, [template], workers) as pool:
+            done = 0
+            while done < n_calls:
+                k = min(batch_size, n_calls - done)
+                xs = opt.ask(n_points=k, strategy='cl_min') if k > 1 else [opt.ask()]
+                tasks = [
+                    Task(_DATA_KEY, None, None, template.name, dict(zip(names, x)))
+                    for x in xs
+                ]
+                ys = list(pool.map(score_fn, tasks))
+                opt.tell(xs, ys)
+                done += k
+
+        best = min(range(len(opt.yi)), key=lambda i: opt.yi[i])
+        return opt.Xi[best], opt.yi[best]
+
+    def optimize_multifidelity(
+        self,
+        template: StrategyTemplate,
+        n_candidates: int = 81,
+        eta: int = 3,
+        min_bars: int = None,
+        hyperband: bool = False
+    ) -> Tuple[Dict[str, Any], float]:
+        """
+        Multi-fidelity search. Random candidates are first backtested on the
+        leading min_bars of the data; only the best 1/eta of each rung moves
+        on to eta times as many bars, until the survivors run on the full
+        data (successive halving). With hyperband, several such brackets with
+        different starting budgets are run and the best full-data score wins;
+        bracket sizes then follow from eta and n_candidates is not used.
+
+        Each rung is one run_batch call. The number of bar-evaluations spent
+        (and what the same candidates would cost at full length) is kept in
+        last_run.
+
+        Returns:
+            best_params: dict of parameter name to optimal value
+            best_score: metric value on the full data
+        """
+        dimensions = self._dimensions(template)
+        names = [dim.name for dim in dimensions]
+        n_bars = len(self.data)
+        if min_bars is None:
+            min_bars = max(1, n_bars // eta ** 3)
+        min_bars = max(1, min(min_bars, n_bars))
+        s_max = 0
+        while min_bars * eta ** (s_max + 1) <= n_bars:
+            s_max += 1
+
+        if hyperband:
+            # Bracket s starts more candidates on fewer bars
+            brackets = [
+                (s, -(-(s_max + 1) * eta ** s // (s + 1)))
+                for s in range(s_max, -1, -1)
+            ]
+        else:
+            brackets = [(s_max, n_candidates)]
+
+        strat = template.compile()
+        space = Space(dimensions)
+        t0 = time.perf_counter()
+        bar_evals = 0
+        n_trials = 0
+        best_params, best_score = None, float('-inf')
+        for b, (s, n) in enumerate(brackets):
+            seed = None if self.random_state is None else self.random_state + b
+            xs = space.rvs(n_samples=n, random_state=seed)
+            candidates = [dict(zip(names, x)) for x in xs]
+            n_trials += len(candidates)
+            for i in range(s + 1):
+                bars = n_bars if i == s else int(n_bars / eta ** (s - i))
+                results = self.backtester.run_batch(self.data.iloc[:bars], strat, candidates)
+                bar_evals += bars * len(candidates)
+                scored = sorted(
+                    zip(candidates, (trial_score(r, self.metric, self.pruned_penalty) for r in results)),
+                    key=lambda cs: cs[1],
+                    reverse=True
+                )
+                if i < s:
+                    candidates = [c for c, _ in scored[:max(1, len(scored) // eta)]]
+            if scored[0][1] > best_score:
+                best_params, best_score = scored[0]
+
+        self.last_run = {
+            'mode': 'hyperband' if hyperband else 'halving',
+            'n_trials': n_trials,
+            'bar_evaluations': bar_evals,
+            'full_bar_evaluations': n_trials * n_bars,
+            'wall_time': time.perf_counter() - t0,
+        }
         return best_params, best_score
 
+    def compare_modes(
+        self,
+        template: StrategyTemplate,
+        n_initial: int = 10,
+        n_calls: int = 50,
+        batch_size: int = 4,
+        workers: int = None
+    ) -> Dict[str, Any]:
+        """
+        Runs the same optimization sequentially and batched and reports the
+        wall-clock time and best score of each.
+        """
+        report = {}
+        for mode, k in (('sequential', 1), ('batched', batch_size)):
+            _, score = self.optimize(template, n_initial, n_calls, batch_size=k, workers=workers)
+            report[mode] = {'wall_time': self.last_run['wall_time'], 'best_score': score}
+        report['speedup'] = report['sequential']['wall_time'] / report['batched']['wall_time']
+        return report
+
+
+# Frame key used when BayesianOptimizer shares its data with pool workers
+_DATA_KEY = '__data__'
+
+
+def _score_task(task: Task, backtester: Backtester, metric: str, pruned_penalty: float = 0.0) -> float:
+    """Worker task for batched optimization: negated score of one candidate."""
+    df = get_frame(task.symbol, task.start, task.end)
+    strat = get_template(task.template).compile()
+    result: BacktestResult = backtester.run(df, strat, task.params)
+    return -trial_score(result, metric, pruned_penalty)
+
+
+def random_search(
+    backtester: Backtester,
+    data: pd.DataFrame,
+    strat: Any,
+    param_space: Dict[str, Dict[str, Any]],
+    n_trials: int = 100,
+    metric: str = 'net_profit',
+    batch_size: int = 100,
+    pruned_penalty: float = 0.0
+) -> pd.DataFrame:
+    """
+    Scores n_trials random parameter sets of a Python Strategy, evaluating
+    batch_size variants per data pass with Backtester.run_batch.
+
+    Returns a DataFrame of params + score, best first.
+    """
+    rows = []
+    for offset in range(0, n_trials, batch_size):
+        batch = [sample_params(param_space) for _ in range(min(batch_size, n_trials - offset))]
+        for params, res in zip(batch, backtester.run_batch(data, strat, batch)):
+            rows.append({**params, 'score': trial_score(res, metric, pruned_penalty)})
+    df_res = pd.DataFrame(rows)
+    if not df_res.empty:
+        df_res = df_res.sort_values('score', ascending=False, ignore_index=True)
+    return df_res
+
+
+def searchable_templates(templates: List[StrategyTemplate]) -> List[StrategyTemplate]:
+    """
+    The templates with at least one bounded input (minval and maxval);
+    the others have nothing to search and are skipped with a warning.
+    """
+    kept = []
+    for tmpl in templates:
+        if any(space['bounds'] is not None for space in tmpl.param_space.values()):
+            kept.append(tmpl)
+        else:
+            print(f"Warning: skipping template {tmpl.name}: no inputs with minval/maxval to optimize")
+    return kept
+
+
+def _opt_task(
+    task: Task,
+    n_initial: int,
+    n_calls: int,
+    use_cache: bool = True,
+    search: str = 'bayes',
+    stop_rules: Dict[str, Any] = None,
+    metric: str = 'net_profit'
+) -> Dict[str, Any]:
+    """Worker task for scan_optimize: optimize one template on one period."""
+    with profiler.stage('slice'):
+        df = get_frame(task.symbol, task.start, task.end)
+    tmpl = get_template(task.template)
+    # Trials are only scored, so curves and trade logs are left out
+    bt = Backtester(
+        result_cache=ResultCache() if use_cache else None,
+        keep_curve=False, keep_trades=False, **(stop_rules or {})
+    )
+    optimizer = BayesianOptimizer(bt, df, metric=metric)
+    # self_wall of 'search' is the optimizer's own overhead (GP fits, sampling)
+    with profiler.stage('search'):
+        if search == 'bayes':
+            best_params, best_score = optimizer.optimize(tmpl, n_initial=n_initial, n_calls=n_calls)
+        else:
+            best_params, best_score = optimizer.optimize_multifidelity(
+                tmpl, n_candidates=n_calls, hyperband=search == 'hyperband'
+            )
+    return {
+        'symbol': task.symbol,
+        'start': task.start,
+        'end': task.end,
+        'template': task.template,
+        'best_params': best_params,
+        'best_score': best_score,
+        'bar_evaluations': optimizer.last_run.get('bar_evaluations')
+    }
+
 
 def scan_optimize(
     symbols: List[str],
@@ -108,16 +408,50 @@ def scan_optimize(
     templates_dir: str = 'templates',
     workers: int = 4,
     n_initial: int = 10,
-    n_calls: int = 50
+    n_calls: int = 50,
+    use_cache: bool = True,
+    search: str = 'bayes',
+    stop_rules: Dict[str, Any] = None,
+    metric: str = 'net_profit',
+    output: Optional[str] = None,
+    resume: bool = True,
+    max_in_flight: Optional[int] = None,
+    profile: bool = False,
+    profile_dir: str = PROFILE_DIR
 ) -> pd.DataFrame:
     """
     Runs Bayesian optimization across multiple symbols and periods in parallel.
+    With use_cache, backtests are looked up in (and added to) the persistent
+    ResultCache, so a repeated or interrupted sweep resumes quickly.
+    search='halving' or 'hyperband' uses optimize_multifidelity instead,
+    with n_calls candidates per task. stop_rules (Backtester keyword
+    arguments such as max_drawdown_pct) end losing trials early. metric is
+    the result key maximized (one of OPT_METRICS), e.g. 'sharpe'.
+
+    With output (a .csv, .jsonl or .parquet path), each result is written
+    by a ResultWriter as soon as its task finishes, at most max_in_flight
+    tasks are queued at once, and a restarted run with resume skips the
+    tasks already written. The returned DataFrame is read back from output.
 
-    Returns a DataFrame of results: symbol, start, end, template, best_params, best_score.
+    With profile, every task runs under profiler.profiled_task: the
+    per-stage summary (a ProfileReport dict) is attached to the result as
+    df.attrs['profile'], and it is written to profile_dir together with
+    cProfile stats of the slowest tasks.
+
+    Returns a DataFrame of results: symbol, start, end, template, best_params,
+    best_score, bar_evaluations.
     """
+    if search not in SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode: {search}")
+    if metric not in OPT_METRICS:
+        raise ValueError(f"Unsupported metric: {metric}")
+    report = ProfileReport() if profile else None
+    parent = report.parent if profile else profiler.Profiler()
     # Load data and templates
-    data = load_data()
-    templates = load_templates(templates_dir)
+    with parent.stage('load_data'):
+        data = load_data()
+    with parent.stage('load_templates'):
+        templates = searchable_templates(load_templates(templates_dir))
 
     tasks = []
     for sym in symbols:
@@ -125,32 +459,219 @@ def scan_optimize(
         if sym_u not in data:
             continue
         for start, end in periods:
-            bt_data = data[sym_u].loc[start:end]
             for tmpl in templates:
-                tasks.append((sym_u, start, end, tmpl))
-
-    def _opt_task(task):
-        sym, start, end, tmpl = task
-        df = data[sym].loc[start:end]
-        bt = Backtester(df)
-        optimizer = BayesianOptimizer(bt)
-        best_params, best_score = optimizer.optimize(tmpl, n_initial=n_initial, n_calls=n_calls)
-        return {
-            'symbol': sym,
-            'start': start,
-            'end': end,
-            'template': tmpl.name,
-            'best_params': best_params,
-            'best_score': best_score
-        }
+                tasks.append(Task(sym_u, start, end, tmpl.name, {}))
 
-    results = []
-    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
-        for res in executor.map(_opt_task, tasks):
-            results.append(res)
+    with parent.stage('load_data'):
+        frames = task_frames(data, tasks)
+    task_fn = functools.partial(
+        _opt_task, n_initial=n_initial, n_calls=n_calls, use_cache=use_cache,
+        search=search, stop_rules=stop_rules, metric=metric
+    )
+    if profile:
+        task_fn = functools.partial(profiled_task, task_fn, cprofile=True)
 
-    df_res = pd.DataFrame(results)
-    return df_res
+    def _unwrap(task, res):
+        if not profile:
+            return res
+        res, record = res
+        report.add(task, record)
+        return res
+
+    if output is None:
+        with parent.stage('pool'):
+            results = [
+                _unwrap(task, res)
+                for task, res in zip(tasks, run_tasks(task_fn, tasks, frames, templates, workers))
+            ]
+        df = pd.DataFrame(results)
+    else:
+        ids = {task_id(t): t for t in tasks}
+        with ResultWriter(output, run=run_id(ids), resume=resume) as writer:
+            todo = [t for tid, t in ids.items() if tid not in writer.done]
+            if todo:
+                with parent.stage('pool'):
+                    for task, res in stream_tasks(task_fn, todo, frames, templates, workers, max_in_flight):
+                        with parent.stage('write'):
+                            writer.write(task_id(task), _unwrap(task, res))
+            df = writer.read()
+
+    if profile:
+        df.attrs['profile'] = report.to_dict()
+        report.dump(profile_dir)
+    return df
+
+
+class Fold(NamedTuple):
+    """
+    One walk-forward step: optimize a template on the train window, then
+    score the best parameters on the test window that follows it.
+    Bounds are exact bar timestamps (inclusive).
+    """
+    symbol: str
+    template: str
+    fold: int
+    train_start: str
+    train_end: str
+    test_start: str
+    test_end: str
+
+
+def walk_forward_windows(
+    index: pd.DatetimeIndex,
+    train_bars: int,
+    test_bars: int,
+    anchored: bool = False
+) -> List[Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, pd.Timestamp]]:
+    """
+    Splits a bar index into consecutive (train_start, train_end, test_start,
+    test_end) windows. Test windows are back to back and never overlap, so
+    their results can be stitched. Rolling windows keep train_bars of
+    history; anchored windows always start at the first bar.
+    """
+    if train_bars < 1 or test_bars < 1:
+        raise ValueError("train_bars and test_bars must be positive")
+    windows = []
+    n = len(index)
+    test_lo = train_bars
+    while test_lo < n:
+        test_hi = min(test_lo + test_bars, n)
+        train_lo = 0 if anchored else test_lo - train_bars
+        windows.append((index[train_lo], index[test_lo - 1], index[test_lo], index[test_hi - 1]))
+        test_lo = test_hi
+    return windows
+
+
+def _fold_task(
+    fold: Fold,
+    n_initial: int,
+    n_calls: int,
+    use_cache: bool = True,
+    stop_rules: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """Worker task for walk_forward: optimize on train, backtest on test."""
+    tmpl = get_template(fold.template)
+    cache = ResultCache() if use_cache else None
+    bt = Backtester(result_cache=cache)
+
+    t0 = time.perf_counter()
+    train_df = get_frame(fold.symbol, fold.train_start, fold.train_end)
+    train_bt = Backtester(result_cache=cache, keep_curve=False, keep_trades=False, **(stop_rules or {}))
+    optimizer = BayesianOptimizer(train_bt, train_df)
+    best_params, best_score = optimizer.optimize(tmpl, n_initial=n_initial, n_calls=n_calls)
+    # skopt returns numpy scalars; plain values keep wf_folds.csv readable
+    best_params = {k: v.item() if hasattr(v, 'item') else v for k, v in best_params.items()}
+    t1 = time.perf_counter()
+
+    test_df = get_frame(fold.symbol, fold.test_start, fold.test_end)
+    res: BacktestResult = bt.run(test_df, tmpl.compile(), best_params)
+    t2 = time.perf_counter()
+
+    # One value per test bar; an open position is closed on the last bar
+    equity = res['equity_curve'][:len(test_df)].copy()
+    if len(equity):
+        equity[-1] = res['equity_curve'][-1]
+    return {
+        **fold._asdict(),
+        'train_bars': len(train_df),
+        'test_bars': len(test_df),
+        'best_params': best_params,
+        'train_score': best_score,
+        'test_net_profit': res['net_profit'],
+        'test_win_rate': res['win_rate'],
+        'test_total_trades': res['total_trades'],
+        'train_time': t1 - t0,
+        'test_time': t2 - t1,
+        'wall_time': t2 - t0,
+        'equity_index': test_df.index,
+        'equity': equity,
+        'capital': bt.capital,
+    }
+
+
+def stitch_equity(fold_results: List[Dict[str, Any]]) -> pd.Series:
+    """
+    Chains the test-window equity curves of consecutive folds into one
+    out-of-sample curve: each fold starts from the previous fold's final
+    equity, scaled from the Backtester's starting capital.
+    """
+    pieces = []
+    level = None
+    for res in sorted(fold_results, key=lambda r: r['fold']):
+        if not len(res['equity']):
+            continue
+        capital = res['capital']
+        if level is None:
+            level = capital
+        seg = pd.Series(res['equity'], index=res['equity_index'], dtype=float) * (level / capital)
+        pieces.append(seg)
+        level = float(seg.iloc[-1])
+    if not pieces:
+        return pd.Series(dtype=float)
+    return pd.concat(pieces)
+
+
+def walk_forward(
+    symbols: List[str],
+    train_bars: int,
+    test_bars: int,
+    templates_dir: str = 'templates',
+    anchored: bool = False,
+    workers: int = 4,
+    n_initial: int = 10,
+    n_calls: int = 50,
+    use_cache: bool = True,
+    data: Optional[Dict[str, pd.DataFrame]] = None,
+    stop_rules: Dict[str, Any] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+) -> Tuple[pd.DataFrame, Dict[Tuple[str, str], pd.Series]]:
+    """
+    Walk-forward optimization of every template on each symbol's history
+    between start and end (df.loc semantics; default all of it). With
+    LazyData, only those rows are loaded. Folds of all symbols and
+    templates run in parallel; price data is shared with the workers once.
+    stop_rules apply to the training trials only; test windows always run
+    to the end.
+
+    Returns:
+        folds: DataFrame with one row per fold (windows, best_params,
+            train_score, test metrics and train/test/wall timing)
+        equity: (symbol, template) -> stitched out-of-sample equity curve
+    """
+    data = data if data is not None else load_data()
+    templates = searchable_templates(load_templates(templates_dir))
+
+    tasks: List[Fold] = []
+    frames: Dict[str, pd.DataFrame] = {}
+    for sym in symbols:
+        sym_u = sym.upper()
+        if sym_u not in data:
+            continue
+        df = data.load(sym_u, start, end) if isinstance(data, LazyData) else data[sym_u].loc[start:end]
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        windows = walk_forward_windows(df.index, train_bars, test_bars, anchored)
+        if not windows:
+            continue
+        frames[sym_u] = df
+        for tmpl in templates:
+            for i, (tr_lo, tr_hi, te_lo, te_hi) in enumerate(windows):
+                tasks.append(Fold(sym_u, tmpl.name, i, str(tr_lo), str(tr_hi), str(te_lo), str(te_hi)))
+
+    task_fn = functools.partial(
+        _fold_task, n_initial=n_initial, n_calls=n_calls, use_cache=use_cache, stop_rules=stop_rules
+    )
+    results = list(run_tasks(task_fn, tasks, frames, templates, workers)) if tasks else []
+
+    grouped: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for res in results:
+        grouped.setdefault((res['symbol'], res['template']), []).append(res)
+    equity = {key: stitch_equity(group) for key, group in grouped.items()}
+
+    drop = ['equity_index', 'equity', 'capital']
+    folds = pd.DataFrame([{k: v for k, v in res.items() if k not in drop} for res in results])
+    return folds, equity
 
 
 # Example usage
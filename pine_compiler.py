@@ -0,0 +1,501 @@
+import ast
+import functools
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicator_cache import IndicatorCache, INDICATOR_CACHE
+from strategies import Strategy
+
+
+class PineCompileError(ValueError):
+    """Raised when a script uses Pine features outside the supported subset."""
+
+
+# Top-level calls that only draw or alert and have no effect on signals
+IGNORED_CALLS = {
+    'plot', 'plotshape', 'plotchar', 'plotarrow', 'plotcandle', 'plotbar',
+    'hline', 'fill', 'bgcolor', 'barcolor', 'alertcondition', 'alert',
+}
+
+# Pine price series -> DataFrame column (as normalized by DataManager.load_csv)
+SOURCES = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume',
+}
+
+_ASSIGN_RE = re.compile(
+    r"^(?:var\s+)?(?:(?:int|float|bool|string)\s+)?(?P<name>[A-Za-z_]\w*)\s*=(?!=)\s*(?P<expr>.+)$"
+)
+_TUPLE_RE = re.compile(r"^\[(?P<names>[^\]]+)\]\s*=(?!=)\s*(?P<expr>.+)$")
+_IF_RE = re.compile(r"^if\b\s*(?P<cond>.+)$")
+_CALL_RE = re.compile(r"^(?P<func>[A-Za-z_][\w\.]*)\s*\(")
+_LITERALS = {'true': 'True', 'false': 'False', 'na': 'nan'}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.Expr, ast.Call, ast.Name, ast.Attribute, ast.Constant,
+    ast.keyword, ast.Load, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+    ast.Not, ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+_NAMESPACES = {'ta', 'input', 'strategy', 'math'}
+
+
+def mask_strings(text: str) -> Tuple[str, bool]:
+    """
+    text with the contents of string literals blanked out (quotes kept, so
+    positions line up), for scanning code without tripping over brackets
+    or '//' inside strings. A backslash escapes the next character in a
+    string. Also returns whether a string is still open at the end.
+    """
+    out = list(text)
+    quote = None
+    escaped = False
+    for i, ch in enumerate(text):
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == quote:
+                quote = None
+                continue
+            out[i] = ' '
+        elif ch in '"\'':
+            quote = ch
+    return ''.join(out), quote is not None
+
+
+def _strip_comment(line: str) -> str:
+    cut = mask_strings(line)[0].find('//')
+    return line if cut < 0 else line[:cut]
+
+
+def _depth(text: str) -> int:
+    masked = mask_strings(text)[0]
+    return masked.count('(') + masked.count('[') - masked.count(')') - masked.count(']')
+
+
+def logical_lines(source: str) -> List[Tuple[int, int, str]]:
+    """
+    Split source into (lineno, indent, text) statements, dropping comments and
+    blank lines and joining lines while brackets are open.
+    """
+    out: List[Tuple[int, int, str]] = []
+    pending: Optional[List[Any]] = None
+    for lineno, raw in enumerate(source.splitlines(), start=1):
+        line = _strip_comment(raw).rstrip()
+        if not line.strip():
+            continue
+        if pending is not None:
+            pending[2] += ' ' + line.strip()
+        else:
+            indent = len(line) - len(line.lstrip())
+            pending = [lineno, indent, line.strip()]
+        if _depth(pending[2]) <= 0:
+            out.append(tuple(pending))
+            pending = None
+    if pending is not None:
+        raise PineCompileError(f"line {pending[0]}: unbalanced brackets")
+    return out
+
+
+class _Rewriter(ast.NodeTransformer):
+    """Maps Pine boolean operators onto element-wise helpers."""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        func = '_and' if isinstance(node.op, ast.And) else '_or'
+        return ast.copy_location(
+            ast.Call(func=ast.Name(id=func, ctx=ast.Load()), args=node.values, keywords=[]),
+            node
+        )
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.copy_location(
+                ast.Call(func=ast.Name(id='_not', ctx=ast.Load()), args=[node.operand], keywords=[]),
+                node
+            )
+        return node
+
+
+def _parse_expr(text: str, lineno: int) -> ast.Expression:
+    text = re.sub(r"\b(true|false|na)\b", lambda m: _LITERALS[m.group(1)], text)
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise PineCompileError(f"line {lineno}: cannot parse expression {text!r}: {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise PineCompileError(f"line {lineno}: unsupported syntax {type(node).__name__} in {text!r}")
+        if isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id in _NAMESPACES):
+                raise PineCompileError(f"line {lineno}: unsupported attribute access in {text!r}")
+    return tree
+
+
+def _compile_expr(tree: ast.Expression, lineno: int):
+    tree = ast.fix_missing_locations(_Rewriter().visit(tree))
+    return compile(tree, f'<pine:{lineno}>', 'eval')
+
+
+def _const(node: ast.AST, lineno: int) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise PineCompileError(f"line {lineno}: expected a literal, got {ast.unparse(node)!r}")
+
+
+def _call_args(call: ast.Call, names: List[str]) -> Dict[str, ast.AST]:
+    """Bind positional and keyword arguments of a call to parameter names."""
+    bound = dict(zip(names, call.args))
+    for kw in call.keywords:
+        bound[kw.arg] = kw.value
+    return bound
+
+
+def _input_calls(tree: ast.AST, lineno: int) -> List[Dict[str, Any]]:
+    inputs = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id == 'input'
+        ):
+            kind = node.func.attr
+            if kind not in ('int', 'float', 'bool'):
+                raise PineCompileError(f"line {lineno}: unsupported input.{kind}")
+            args = _call_args(node, ['defval', 'title'])
+            if 'title' not in args:
+                raise PineCompileError(f"line {lineno}: input.{kind} needs a title")
+            spec = {
+                'type': kind,
+                'title': _const(args['title'], lineno),
+                'default': _const(args['defval'], lineno) if 'defval' in args else None,
+            }
+            for key in ('minval', 'maxval', 'step'):
+                spec[key] = _const(args[key], lineno) if key in args else None
+            inputs.append(spec)
+    return inputs
+
+
+def _strategy_call(text: str, lineno: int) -> Tuple[str, Dict[str, ast.AST]]:
+    tree = _parse_expr(text, lineno)
+    call = tree.body
+    if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)):
+        raise PineCompileError(f"line {lineno}: expected a strategy.* call")
+    kind = call.func.attr
+    if kind == 'entry':
+        args = _call_args(call, ['id', 'direction'])
+    elif kind == 'exit':
+        args = _call_args(call, ['id', 'from_entry'])
+    elif kind == 'close':
+        args = _call_args(call, ['id'])
+    else:
+        raise PineCompileError(f"line {lineno}: unsupported strategy.{kind}")
+    return kind, args
+
+
+class PineProgram:
+    """
+    A parsed Pine script: ordered variable assignments, the input
+    declarations they read, and entry/exit rules. Expressions are held as
+    compiled code objects, so running a parameter set never re-parses text.
+    """
+
+    def __init__(self, source_hash: str = ''):
+        self.source_hash = source_hash
+        self.inputs: List[Dict[str, Any]] = []
+        # (target names, code); one name for plain assignment
+        self.steps: List[Tuple[Tuple[str, ...], Any]] = []
+        # (entry id, 'long' | 'short', condition code or None)
+        self.entries: List[Tuple[str, str, Any]] = []
+        # (entry id, condition code or None) from strategy.close
+        self.closes: List[Tuple[str, Any]] = []
+        # entry id -> (profit code, loss code)
+        self.exits: Dict[str, Tuple[Any, Any]] = {}
+
+    def param_space(self) -> Dict[str, Dict[str, Any]]:
+        """Input declarations in the StrategyTemplate.param_space layout."""
+        space = {}
+        for spec in self.inputs:
+            bounds = None
+            if spec['minval'] is not None and spec['maxval'] is not None:
+                bounds = (spec['minval'], spec['maxval'])
+            space[spec['title']] = {
+                'type': spec['type'],
+                'default': spec['default'],
+                'bounds': bounds,
+                'step': spec['step'],
+            }
+        return space
+
+
+def _add_statement(prog: PineProgram, lineno: int, text: str, cond):
+    if text.startswith('strategy.'):
+        kind, args = _strategy_call(text, lineno)
+        if kind == 'entry':
+            direction = args.get('direction')
+            if not (isinstance(direction, ast.Attribute) and direction.attr in ('long', 'short')):
+                raise PineCompileError(f"line {lineno}: entry direction must be strategy.long/short")
+            prog.entries.append((_const(args['id'], lineno), direction.attr, cond))
+        elif kind == 'close':
+            prog.closes.append((_const(args['id'], lineno), cond))
+        else:
+            if cond is not None:
+                raise PineCompileError(f"line {lineno}: conditional strategy.exit is not supported")
+            if 'from_entry' not in args:
+                raise PineCompileError(f"line {lineno}: strategy.exit needs from_entry")
+            codes = []
+            for key in ('profit', 'loss'):
+                node = args.get(key)
+                codes.append(_compile_expr(ast.Expression(body=node), lineno) if node is not None else None)
+            prog.exits[_const(args['from_entry'], lineno)] = tuple(codes)
+        return
+    raise PineCompileError(f"line {lineno}: unsupported statement {text!r}")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_pine(source: str) -> PineProgram:
+    """
+    Compile the Pine v5 subset used by our templates. Results are cached per
+    source text, so repeated calls for a template are free.
+    """
+    prog = PineProgram(hashlib.sha256(source.encode()).hexdigest())
+    lines = logical_lines(source)
+    i = 0
+    while i < len(lines):
+        lineno, indent, text = lines[i]
+        i += 1
+        if indent:
+            raise PineCompileError(f"line {lineno}: unexpected indentation")
+
+        m = _IF_RE.match(text)
+        if m:
+            cond = _compile_expr(_parse_expr(m.group('cond'), lineno), lineno)
+            body = 0
+            while i < len(lines) and lines[i][1] > 0:
+                _add_statement(prog, lines[i][0], lines[i][2], cond)
+                i += 1
+                body += 1
+            if not body:
+                raise PineCompileError(f"line {lineno}: empty if block")
+            continue
+
+        m = _TUPLE_RE.match(text)
+        if m:
+            names = tuple(n.strip() for n in m.group('names').split(','))
+            tree = _parse_expr(m.group('expr'), lineno)
+            prog.inputs.extend(_input_calls(tree, lineno))
+            prog.steps.append((names, _compile_expr(tree, lineno)))
+            continue
+
+        m = _ASSIGN_RE.match(text)
+        if m:
+            tree = _parse_expr(m.group('expr'), lineno)
+            prog.inputs.extend(_input_calls(tree, lineno))
+            prog.steps.append(((m.group('name'),), _compile_expr(tree, lineno)))
+            continue
+
+        m = _CALL_RE.match(text)
+        if m and m.group('func') == 'strategy':
+            continue
+        if m and m.group('func') in IGNORED_CALLS:
+            continue
+        _add_statement(prog, lineno, text, None)
+
+    if not prog.entries:
+        raise PineCompileError("script has no strategy.entry")
+    return prog
+
+
+# Runtime helpers
+
+def _as_bool(x):
+    if isinstance(x, pd.Series):
+        return x.fillna(0).astype(bool)
+    if isinstance(x, np.ndarray):
+        return np.nan_to_num(x.astype(float)) != 0
+    return bool(x) and not (isinstance(x, float) and np.isnan(x))
+
+
+def _and(*args):
+    out = _as_bool(args[0])
+    for a in args[1:]:
+        out = out & _as_bool(a)
+    return out
+
+
+def _or(*args):
+    out = _as_bool(args[0])
+    for a in args[1:]:
+        out = out | _as_bool(a)
+    return out
+
+
+def _not(x):
+    b = _as_bool(x)
+    return ~b if isinstance(b, (pd.Series, np.ndarray)) else not b
+
+
+class _Namespace:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class _TA:
+    """ta.* functions, matching the conventions of strategies.py."""
+
+    def __init__(self, cache: IndicatorCache, sources: List[pd.Series]):
+        self.cache = cache
+        # Only raw price columns are cached; derived series change per run
+        self._sources = {id(s) for s in sources}
+
+    def ema(self, source, length):
+        if id(source) in self._sources:
+            return self.cache.ema(source, int(length))
+        return source.ewm(span=int(length)).mean()
+
+    def sma(self, source, length):
+        compute = lambda: source.rolling(int(length)).mean()
+        if id(source) in self._sources:
+            return self.cache.get(source, 'sma', (int(length),), compute)
+        return compute()
+
+    def rsi(self, source, length):
+        if id(source) in self._sources:
+            return self.cache.rsi(source, int(length))
+        d = source.diff(); g=d.where(d>0,0); l=-d.where(d<0,0)
+        ag = g.ewm(alpha=1/int(length)).mean(); al=l.ewm(alpha=1/int(length)).mean()
+        return 100 - (100/(1+ag/al))
+
+    def macd(self, source, fast, slow, signal):
+        mac = self.ema(source, fast) - self.ema(source, slow)
+        sigl = mac.ewm(span=int(signal)).mean()
+        return mac, sigl, mac - sigl
+
+    def crossover(self, a, b):
+        prev_a = a.shift(1) if isinstance(a, pd.Series) else a
+        prev_b = b.shift(1) if isinstance(b, pd.Series) else b
+        return (a > b) & (prev_a <= prev_b)
+
+    def crossunder(self, a, b):
+        prev_a = a.shift(1) if isinstance(a, pd.Series) else a
+        prev_b = b.shift(1) if isinstance(b, pd.Series) else b
+        return (a < b) & (prev_a >= prev_b)
+
+
+class PineStrategy(Strategy):
+    """
+    Strategy backed by a compiled Pine program, usable with Backtester.
+
+    The backtester is long-only, so signals are: 1 on a long entry, -1 on a
+    short entry or strategy.close of a long. strategy.exit profit/loss are
+    price offsets from the entry close (e.g. takeProfitPerc * close),
+    returned as exit levels by generate_orders; Backtester checks them
+    against later closes for the entries it fills.
+    """
+
+    def __init__(self, program: PineProgram, cache: IndicatorCache = None):
+        super().__init__(cache)
+        self.program = program
+        # strategy.exit of the first long entry that has one
+        self._exit = next(
+            (program.exits[i] for i, direction, _ in program.entries if direction == 'long' and i in program.exits),
+            None
+        )
+
+    @property
+    def has_exit_levels(self) -> bool:
+        return self._exit is not None
+
+    def cache_key(self) -> str:
+        return f"pine:{self.program.source_hash}"
+
+    def evaluate(self, data: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the program's assignments for one parameter set."""
+        sources = {k: data[col] for k, col in SOURCES.items() if col in data.columns}
+
+        def _input(kind):
+            def _fn(defval=None, title=None, **_):
+                val = params.get(title, defval)
+                if kind == 'int':
+                    return int(round(val))
+                if kind == 'float':
+                    return float(val)
+                return bool(val)
+            return _fn
+
+        env: Dict[str, Any] = {
+            '__builtins__': {},
+            'nan': np.nan,
+            '_and': _and, '_or': _or, '_not': _not,
+            'ta': _TA(self.cache, list(sources.values())),
+            'input': _Namespace(int=_input('int'), float=_input('float'), bool=_input('bool')),
+            'math': _Namespace(abs=abs, max=max, min=min),
+            'strategy': _Namespace(long='long', short='short'),
+            **sources,
+        }
+        for names, code in self.program.steps:
+            try:
+                value = eval(code, env)
+            except NameError as e:
+                raise PineCompileError(str(e))
+            if len(names) == 1:
+                env[names[0]] = value
+            else:
+                for name, v in zip(names, value):
+                    env[name] = v
+        return env
+
+    def generate_signals(self, data, params):
+        return self.generate_orders(data, params)[0]
+
+    def generate_orders(self, data, params):
+        env = self.evaluate(data, params)
+        n = len(data)
+
+        def _mask(code):
+            if code is None:
+                return np.ones(n, dtype=bool)
+            val = _as_bool(eval(code, env))
+            if isinstance(val, pd.Series):
+                return val.to_numpy(dtype=bool)
+            return np.broadcast_to(np.asarray(val, dtype=bool), (n,)).copy()
+
+        long_ids = set()
+        buy = np.zeros(n, dtype=bool)
+        sell = np.zeros(n, dtype=bool)
+        for entry_id, direction, cond in self.program.entries:
+            if direction == 'long':
+                buy |= _mask(cond)
+                long_ids.add(entry_id)
+            else:
+                sell |= _mask(cond)
+        for entry_id, cond in self.program.closes:
+            if entry_id in long_ids:
+                sell |= _mask(cond)
+
+        s = np.where(sell, -1, np.where(buy, 1, 0))
+
+        levels = None
+        if self._exit is not None:
+            def _offset(code):
+                if code is None:
+                    return np.full(n, np.inf)
+                val = eval(code, env)
+                val = val.to_numpy(dtype=float) if isinstance(val, pd.Series) else val
+                return np.broadcast_to(np.asarray(val, dtype=float), (n,))
+
+            levels = (_offset(self._exit[0]), _offset(self._exit[1]))
+
+        return pd.Series(s, index=data.index), levels
@@ -1,5 +1,88 @@
+import functools
 import re
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Tuple
+
+# Matches input.int(default, "Name"... ) or input.float(default, "Name"... )
+POSITIONAL_PATTERN = re.compile(
+    r"(input\.(?P<type>int|float)\(\s*)(?P<default>[-\d\.]+)(\s*,\s*['\"](?P<name>[^'\"]+)['\"])",
+    flags=re.IGNORECASE
+)
+
+# Matches input.*(title="Name", ..., defval=value ...) as used by StrategyTemplate
+KEYWORD_PATTERN = re.compile(
+    r"(input\.[^\(]*\(\s*title=['\"](?P<name>[^'\"]*)['\"][^,]*,\s*defval=)(?P<default>[^,\)]+)"
+)
+
+
+class CompiledTemplate:
+    """
+    Pine source split once into literal segments and input-value slots.
+    Rendering a parameter set is a single join; slots whose name is not in
+    the params keep their original text.
+    """
+
+    def __init__(self, segments: List[str], slots: List[Tuple[str, str, Callable[[Any], str]]]):
+        # segments[i] precedes slots[i]; segments[-1] follows the last slot
+        self.segments = segments
+        self.slots = slots
+
+    @property
+    def names(self) -> List[str]:
+        return list(dict.fromkeys(name for name, _, _ in self.slots))
+
+    def render(self, params: Dict[str, Any]) -> str:
+        parts = [self.segments[0]]
+        for (name, original, fmt), seg in zip(self.slots, self.segments[1:]):
+            parts.append(fmt(params[name]) if name in params else original)
+            parts.append(seg)
+        return ''.join(parts)
+
+    def render_many(self, params_list: List[Dict[str, Any]]) -> List[str]:
+        return [self.render(p) for p in params_list]
+
+
+def _split(code: str, pattern: re.Pattern, fmt_for: Callable[[re.Match], Callable[[Any], str]]) -> CompiledTemplate:
+    segments: List[str] = []
+    slots: List[Tuple[str, str, Callable[[Any], str]]] = []
+    pos = 0
+    for m in pattern.finditer(code):
+        start, end = m.span('default')
+        segments.append(code[pos:start])
+        slots.append((m.group('name'), m.group('default'), fmt_for(m)))
+        pos = end
+    segments.append(code[pos:])
+    return CompiledTemplate(segments, slots)
+
+
+def _format_int(val: Any) -> str:
+    return str(int(round(val)))
+
+
+def _format_float(val: Any) -> str:
+    return str(float(val))
+
+
+@functools.lru_cache(maxsize=256)
+def compile_positional_template(script: str) -> CompiledTemplate:
+    """
+    Slots for input.int(default, "Name") / input.float(default, "Name")
+    declarations, formatted as inject_pine_script does.
+    """
+    return _split(
+        script,
+        POSITIONAL_PATTERN,
+        lambda m: _format_int if m.group('type').lower() == 'int' else _format_float
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def compile_keyword_template(code: str) -> CompiledTemplate:
+    """
+    Slots for input.*(title="Name", defval=...) declarations, filled with
+    str(value) as StrategyTemplate.instantiate does.
+    """
+    return _split(code, KEYWORD_PATTERN, lambda m: format)
+
 
 def inject_pine_script(script: str, params: Dict[str, Any]) -> str:
     """
@@ -7,26 +90,12 @@ def inject_pine_script(script: str, params: Dict[str, Any]) -> str:
     replace the default values in input.int(...) and input.float(...) calls with those new values.
     Returns the modified script.
     """
-    # Matches input.int(default, "Name"... ) or input.float(default, "Name"... )
-    pattern = re.compile(
-        r"(input\.(?P<type>int|float)\(\s*)(?P<default>[-\d\.]+)(\s*,\s*['\"](?P<name>[^'\"]+)['\"])",
-        flags=re.IGNORECASE
-    )
+    return compile_positional_template(script).render(params)
 
-    def repl(match: re.Match) -> str:
-        prefix = match.group(1)      # e.g. "input.int("
-        val_type = match.group('type')  # "int" or "float"
-        name = match.group('name')   # parameter name
-        suffix = match.group(4)      # e.g. ", \"Name\""
-        if name in params:
-            new_val = params[name]
-            # Format according to type
-            if val_type.lower() == 'int':
-                new_default = str(int(round(new_val)))
-            else:
-                new_default = str(float(new_val))
-            return f"{prefix}{new_default}{suffix}"
-        # No replacement if param not in dict
-        return match.group(0)
-
-    return pattern.sub(repl, script)
+
+def inject_pine_scripts(script: str, params_list: List[Dict[str, Any]]) -> List[str]:
+    """
+    Batch form of inject_pine_script: the script is parsed once for all
+    parameter sets.
+    """
+    return compile_positional_template(script).render_many(params_list)
@@ -0,0 +1,355 @@
+import ast
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pine_compiler import PineCompileError, logical_lines, mask_strings
+
+
+class PineIssue(NamedTuple):
+    """
+    One finding of check_pine. line is 1-based (0 for the whole script);
+    severity is 'error' or 'warning'.
+    """
+    line: int
+    code: str
+    message: str
+    severity: str = 'error'
+
+
+# ta.* functions and series of Pine v5
+TA_FUNCTIONS = {
+    'alma', 'atr', 'barssince', 'bb', 'bbw', 'cci', 'change', 'cmo', 'cog',
+    'correlation', 'cross', 'crossover', 'crossunder', 'cum', 'dev', 'dmi',
+    'ema', 'falling', 'highest', 'highestbars', 'hma', 'kc', 'kcw', 'linreg',
+    'lowest', 'lowestbars', 'macd', 'max', 'median', 'mfi', 'min', 'mode',
+    'mom', 'percentile_linear_interpolation', 'percentile_nearest_rank',
+    'percentrank', 'pivot_point_levels', 'pivothigh', 'pivotlow', 'range',
+    'rci', 'rising', 'rma', 'roc', 'rsi', 'sar', 'sma', 'stdev', 'stoch',
+    'supertrend', 'swma', 'tr', 'tsi', 'valuewhen', 'variance', 'vwap',
+    'vwma', 'wma', 'wpr',
+}
+TA_VARIABLES = {'accdist', 'iii', 'nvi', 'obv', 'pvi', 'pvt', 'tr', 'vwap', 'wad', 'wvad'}
+
+# input.* kinds -> keyword arguments they accept ('' is plain input())
+_INPUT_COMMON = {'defval', 'title', 'tooltip', 'inline', 'group', 'confirm', 'display'}
+INPUT_KINDS: Dict[str, Set[str]] = {
+    '': _INPUT_COMMON,
+    'int': _INPUT_COMMON | {'minval', 'maxval', 'step', 'options'},
+    'float': _INPUT_COMMON | {'minval', 'maxval', 'step', 'options'},
+    'bool': _INPUT_COMMON,
+    'string': _INPUT_COMMON | {'options'},
+    'text_area': _INPUT_COMMON,
+    'source': _INPUT_COMMON,
+    'color': _INPUT_COMMON,
+    'price': _INPUT_COMMON,
+    'time': _INPUT_COMMON,
+    'timeframe': _INPUT_COMMON | {'options'},
+    'symbol': _INPUT_COMMON,
+    'session': _INPUT_COMMON | {'options'},
+}
+
+# Names every script can use without declaring them
+BUILTINS = {
+    # series and bar state
+    'open', 'high', 'low', 'close', 'volume', 'hl2', 'hlc3', 'ohlc4', 'hlcc4',
+    'time', 'time_close', 'timenow', 'bar_index', 'last_bar_index',
+    'dayofweek', 'dayofmonth', 'month', 'year', 'hour', 'minute', 'second', 'weekofyear',
+    # namespaces
+    'ta', 'math', 'input', 'strategy', 'color', 'str', 'array', 'matrix', 'map',
+    'request', 'syminfo', 'timeframe', 'barstate', 'session', 'ticker', 'runtime',
+    'log', 'label', 'line', 'box', 'table', 'linefill', 'polyline', 'chart',
+    'shape', 'location', 'size', 'position', 'display', 'extend', 'xloc', 'yloc',
+    'text', 'font', 'format', 'currency', 'order', 'scale', 'barmerge',
+    'adjustment', 'backadjustment', 'settlement_as_close', 'splits', 'dividends', 'earnings',
+    # functions
+    'strategy', 'indicator', 'library', 'plot', 'plotshape', 'plotchar', 'plotarrow',
+    'plotcandle', 'plotbar', 'hline', 'fill', 'bgcolor', 'barcolor', 'alert',
+    'alertcondition', 'nz', 'fixnan', 'na', 'max_bars_back', 'int', 'float', 'bool', 'string',
+    # literals
+    'true', 'false',
+}
+KEYWORDS = {
+    'if', 'else', 'for', 'to', 'by', 'in', 'while', 'switch', 'and', 'or', 'not',
+    'var', 'varip', 'import', 'export', 'method', 'type', 'break', 'continue', 'as',
+    'series', 'simple', 'const',
+}
+
+_VERSION_RE = re.compile(r"^\s*//\s*@version\s*=\s*(?P<version>\d+)\s*$")
+_STRING_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'")
+_COLOR_RE = re.compile(r"#[0-9A-Fa-f]{6,8}\b")
+_IDENT_RE = re.compile(r"(?<![\w.])(?P<name>[A-Za-z_]\w*)(?P<attr>(?:\s*\.\s*[A-Za-z_]\w*)*)(?P<after>\s*(?:==|=>|:=|=|\()?)")
+_DECL_RE = re.compile(
+    r"^(?:(?:var|varip)\s+)?(?:(?:int|float|bool|string|color|series|simple|const)\s+)*"
+    r"(?P<name>[A-Za-z_]\w*)\s*=(?![=>])"
+)
+_TUPLE_DECL_RE = re.compile(r"^\[(?P<names>[^\]]+)\]\s*=(?![=>])")
+_REASSIGN_RE = re.compile(r"^(?P<name>[A-Za-z_]\w*)\s*(?::=|\+=|-=|\*=|/=|%=)")
+_FUNC_RE = re.compile(r"^(?:method\s+)?(?P<name>[A-Za-z_]\w*)\s*\((?P<params>[^)]*)\)\s*=>")
+_FOR_RE = re.compile(r"^for\s+(?:\[(?P<pair>[^\]]+)\]|(?P<name>[A-Za-z_]\w*))\s*(?:=|in\b)")
+_INPUT_RE = re.compile(r"\binput(?:\s*\.\s*(?P<kind>\w+))?\s*\(")
+_TA_RE = re.compile(r"(?<![\w.])ta\s*\.\s*(?P<name>\w+)(?P<call>\s*\()?")
+
+
+def _check_version(lines: List[str]) -> List[PineIssue]:
+    for lineno, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        m = _VERSION_RE.match(raw)
+        if m is None:
+            return [PineIssue(lineno, 'version', "first line must be '//@version=5'")]
+        if m.group('version') != '5':
+            return [PineIssue(lineno, 'version', f"expected Pine version 5, got {m.group('version')}")]
+        return []
+    return [PineIssue(0, 'version', "empty script")]
+
+
+def _check_brackets(lines: List[str]) -> List[PineIssue]:
+    issues = []
+    stack: List[Tuple[str, int]] = []
+    pairs = {')': '(', ']': '['}
+    for lineno, raw in enumerate(lines, start=1):
+        code, open_string = mask_strings(raw)
+        cut = code.find('//')
+        if cut >= 0:
+            # Code before a comment has no open string
+            code, open_string = code[:cut], False
+        for ch in code:
+            if ch in '([':
+                stack.append((ch, lineno))
+            elif ch in ')]':
+                if not stack or stack[-1][0] != pairs[ch]:
+                    issues.append(PineIssue(lineno, 'brackets', f"unmatched '{ch}'"))
+                else:
+                    stack.pop()
+        if open_string:
+            issues.append(PineIssue(lineno, 'string', "unterminated string literal"))
+    for ch, lineno in stack:
+        issues.append(PineIssue(lineno, 'brackets', f"'{ch}' is never closed"))
+    return issues
+
+
+def _check_declaration(statements: List[Tuple[int, int, str]]) -> List[PineIssue]:
+    issues = []
+    decls = [(lineno, text) for lineno, indent, text in statements if re.match(r"^strategy\s*\(", text)]
+    for lineno, indent, text in statements:
+        if re.match(r"^(indicator|library)\s*\(", text):
+            issues.append(PineIssue(lineno, 'declaration', "script must declare strategy(), not an indicator or library"))
+    if not decls:
+        issues.append(PineIssue(0, 'declaration', "missing strategy(...) declaration"))
+        return issues
+    for lineno, _ in decls[1:]:
+        issues.append(PineIssue(lineno, 'declaration', "strategy() declared more than once"))
+    lineno, text = decls[0]
+    call = _parse_call(text)
+    if call is None:
+        issues.append(PineIssue(lineno, 'declaration', "cannot parse strategy(...) arguments"))
+    else:
+        title = call.args[0] if call.args else next((k.value for k in call.keywords if k.arg == 'title'), None)
+        if not (isinstance(title, ast.Constant) and isinstance(title.value, str)):
+            issues.append(PineIssue(lineno, 'declaration', "strategy() needs a string title"))
+    return issues
+
+
+def _call_text(text: str, start: int) -> Optional[str]:
+    """The call expression starting at text[start:], up to its closing ')'."""
+    depth = 0
+    code = mask_strings(text)[0]
+    for i in range(code.index('(', start), len(code)):
+        ch = code[i]
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def _parse_call(text: str) -> Optional[ast.Call]:
+    text = re.sub(r"\b(true|false|na)\b", lambda m: {'true': 'True', 'false': 'False', 'na': 'None'}[m.group(1)], text)
+    text = _COLOR_RE.sub('0', text)
+    try:
+        node = ast.parse(text.strip(), mode='eval').body
+    except SyntaxError:
+        return None
+    return node if isinstance(node, ast.Call) else None
+
+
+def _literal(node: ast.AST):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return None
+
+
+def _check_input(lineno: int, kind: str, call: Optional[ast.Call]) -> List[PineIssue]:
+    label = f"input.{kind}" if kind else "input"
+    if kind not in INPUT_KINDS:
+        return [PineIssue(lineno, 'input', f"unknown input function {label}")]
+    if call is None:
+        return [PineIssue(lineno, 'input', f"cannot parse {label}(...) arguments")]
+    issues = []
+    if len(call.args) > 2:
+        # Past (defval, title) the positional order differs per overload
+        issues.append(PineIssue(lineno, 'input', f"{label}: pass arguments after title by keyword", 'warning'))
+    args = dict(zip(('defval', 'title'), call.args))
+    for kw in call.keywords:
+        if kw.arg not in INPUT_KINDS[kind]:
+            issues.append(PineIssue(lineno, 'input', f"{label} has no argument '{kw.arg}'"))
+        elif kw.arg in args:
+            issues.append(PineIssue(lineno, 'input', f"{label}: '{kw.arg}' given twice"))
+        args[kw.arg] = kw.value
+
+    if 'defval' not in args:
+        issues.append(PineIssue(lineno, 'input', f"{label} needs a default value (defval)"))
+    title = args.get('title')
+    if title is not None and not (isinstance(title, ast.Constant) and isinstance(title.value, str)):
+        issues.append(PineIssue(lineno, 'input', f"{label}: title must be a string literal"))
+
+    defval = _literal(args['defval']) if 'defval' in args else None
+    expected = {'int': int, 'float': (int, float), 'bool': bool, 'string': str}.get(kind)
+    if expected is not None and 'defval' in args and defval is not None:
+        wrong = not isinstance(defval, expected) or (kind != 'bool' and isinstance(defval, bool))
+        if wrong:
+            issues.append(PineIssue(lineno, 'input', f"{label}: default {defval!r} is not a {kind}"))
+    if kind == 'source' and 'defval' in args:
+        src = args['defval']
+        if not (isinstance(src, ast.Name) and src.id in BUILTINS):
+            issues.append(PineIssue(lineno, 'input', f"{label}: default must be a price series such as close"))
+
+    lo = _literal(args['minval']) if 'minval' in args else None
+    hi = _literal(args['maxval']) if 'maxval' in args else None
+    numeric = lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)
+    if numeric(lo) and numeric(hi) and lo > hi:
+        issues.append(PineIssue(lineno, 'input', f"{label}: minval {lo} is above maxval {hi}"))
+    if numeric(defval):
+        if numeric(lo) and defval < lo:
+            issues.append(PineIssue(lineno, 'input', f"{label}: default {defval} is below minval {lo}"))
+        if numeric(hi) and defval > hi:
+            issues.append(PineIssue(lineno, 'input', f"{label}: default {defval} is above maxval {hi}"))
+    step = _literal(args['step']) if 'step' in args else None
+    if numeric(step) and step <= 0:
+        issues.append(PineIssue(lineno, 'input', f"{label}: step must be positive"))
+    return issues
+
+
+def _check_calls(statements: List[Tuple[int, int, str]]) -> List[PineIssue]:
+    issues = []
+    for lineno, _, text in statements:
+        for m in _INPUT_RE.finditer(text):
+            call_text = _call_text(text, m.start())
+            issues.extend(_check_input(lineno, m.group('kind') or '', _parse_call(call_text) if call_text else None))
+        for m in _TA_RE.finditer(_STRING_RE.sub('""', text)):
+            name = m.group('name')
+            if m.group('call'):
+                if name not in TA_FUNCTIONS:
+                    issues.append(PineIssue(lineno, 'ta', f"unknown function ta.{name}()"))
+            elif name not in TA_VARIABLES:
+                issues.append(PineIssue(lineno, 'ta', f"unknown series ta.{name}"))
+    return issues
+
+
+def _declared(text: str) -> Tuple[List[str], int]:
+    """
+    Names a statement declares and where its expression part starts.
+    """
+    m = _FUNC_RE.match(text)
+    if m:
+        return [m.group('name')], m.end()
+    m = _TUPLE_DECL_RE.match(text)
+    if m:
+        return [n.strip() for n in m.group('names').split(',')], m.end()
+    m = _FOR_RE.match(text)
+    if m:
+        names = m.group('pair').split(',') if m.group('pair') else [m.group('name')]
+        return [n.strip() for n in names], m.end()
+    m = _DECL_RE.match(text)
+    if m:
+        return [m.group('name')], m.end()
+    return [], 0
+
+
+def _check_identifiers(statements: List[Tuple[int, int, str]]) -> List[PineIssue]:
+    issues = []
+    all_declared: Set[str] = set()
+    for _, _, text in statements:
+        all_declared.update(_declared(text)[0])
+
+    declared: Set[str] = set()
+    reported: Set[str] = set()
+    # (indent, names) of enclosing function bodies
+    scopes: List[Tuple[int, Set[str]]] = []
+    for lineno, indent, text in statements:
+        while scopes and indent <= scopes[-1][0]:
+            scopes.pop()
+        local = set().union(*(names for _, names in scopes)) if scopes else set()
+
+        names, expr_start = _declared(text)
+        # Locals of a function body are not visible outside it
+        target = scopes[-1][1] if scopes else declared
+        target.update(names)
+        m = _FUNC_RE.match(text)
+        if m:
+            params = {p.split('=')[0].split()[-1] for p in m.group('params').split(',') if p.strip()}
+            scopes.append((indent, params))
+            local |= params
+
+        r = _REASSIGN_RE.match(text)
+        if r and r.group('name') not in declared | local | BUILTINS:
+            issues.append(PineIssue(lineno, 'undefined', f"'{r.group('name')}' is reassigned before it is declared"))
+            expr_start = r.end()
+
+        code = _COLOR_RE.sub('0', _STRING_RE.sub('""', text[expr_start:]))
+        for im in _IDENT_RE.finditer(code):
+            name = im.group('name')
+            after = im.group('after').strip()
+            if after == '=' or after == ':=' or name in KEYWORDS:
+                # keyword argument or reassignment target
+                continue
+            if name in BUILTINS or name in declared or name in local or name in names:
+                continue
+            key = (name, lineno)
+            if key in reported:
+                continue
+            reported.add(key)
+            if name in all_declared:
+                issues.append(PineIssue(lineno, 'undefined', f"'{name}' is used before it is declared"))
+            else:
+                issues.append(PineIssue(lineno, 'undefined', f"undefined identifier '{name}'"))
+    return issues
+
+
+def check_pine(source: str) -> List[PineIssue]:
+    """
+    Static checks for the Pine v5 subset our templates use: version header,
+    strategy() declaration, input.* signatures, known ta.* names, balanced
+    brackets and undefined identifiers. Runs in-process in milliseconds.
+    Returns the issues found, in line order; none means the script passed.
+    """
+    lines = source.splitlines()
+    issues = _check_version(lines)
+    bracket_issues = _check_brackets(lines)
+    issues.extend(bracket_issues)
+    if not bracket_issues:
+        try:
+            statements = logical_lines(source)
+        except PineCompileError as e:
+            return sorted(issues + [PineIssue(0, 'brackets', str(e))], key=lambda i: i.line)
+        issues.extend(_check_declaration(statements))
+        issues.extend(_check_calls(statements))
+        issues.extend(_check_identifiers(statements))
+        if not any(re.search(r"\bstrategy\s*\.\s*entry\s*\(", text) for _, _, text in statements):
+            issues.append(PineIssue(0, 'entry', "no strategy.entry() call; the script never trades", 'warning'))
+    return sorted(issues, key=lambda i: i.line)
+
+
+def is_valid(issues: List[PineIssue]) -> bool:
+    """True when issues holds no errors (warnings are allowed)."""
+    return not any(i.severity == 'error' for i in issues)
+
+
+def format_issues(issues: List[PineIssue]) -> str:
+    return '\n'.join(
+        f"{'line ' + str(i.line) if i.line else 'script'}: {i.severity}: {i.message} [{i.code}]"
+        for i in issues
+    )
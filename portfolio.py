@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import profiler
+from metrics import RISK_METRICS, equity_metrics, profit_factor
+
+# Cells of the bars x symbols position matrix built at a time for the equity curve
+EQUITY_BLOCK_CELLS = 1 << 22
+
+
+def align_frames(frames: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Puts several symbols on their common (union) timestamp index.
+    Returns (close, has_bar): bars x symbols Close prices, forward-filled
+    over bars where a symbol has no row (NaN before its first one), and
+    whether the symbol really has a bar at each timestamp.
+    """
+    close = pd.DataFrame({sym: df['Close'] for sym, df in frames.items()})
+    close = close.sort_index()
+    has_bar = close.notna()
+    return close.ffill(), has_bar
+
+
+class PortfolioBacktester:
+    """
+    Simulates one strategy on several symbols that share a single cash
+    balance.
+
+    Symbols are aligned as a bars x symbols matrix. Entries size
+    order_size_pct of the shared cash (times margin leverage). The
+    max_day/max_week caps count entries across the whole portfolio. Each
+    symbol holds at most one long position, as in Backtester.
+
+    Only bars where some symbol has a signal are visited, and all symbols
+    of a bar are filled with array operations. Within a bar, exits are
+    filled before entries, and entries are filled in column order, each
+    sizing off the cash left by the previous one. Entries need positive
+    cash. Open positions are closed at each symbol's last price.
+    """
+
+    def __init__(
+        self,
+        capital: float = 10000.0,
+        order_size_pct: float = 20.0,
+        tick_verify: float = 0.0,
+        slippage: float = 0.0,
+        margin: float = 100.0,
+        max_day: int = 100,
+        max_week: int = 500,
+    ):
+        self.capital = capital
+        self.order_size_pct = order_size_pct
+        self.tick_verify = tick_verify
+        self.slippage = slippage
+        self.margin = margin
+        self.max_day = max_day
+        self.max_week = max_week
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            'capital': self.capital,
+            'order_size_pct': self.order_size_pct,
+            'tick_verify': self.tick_verify,
+            'slippage': self.slippage,
+            'margin': self.margin,
+            'max_day': self.max_day,
+            'max_week': self.max_week,
+        }
+
+    def run(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        strat: Any,
+        params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Run the strategy on every symbol of frames ({symbol: OHLC DataFrame})
+        as one portfolio. Returns portfolio metrics (the Backtester keys)
+        plus 'per_symbol', a DataFrame of metrics indexed by symbol.
+        """
+        if strat.has_exit_levels:
+            raise ValueError("PortfolioBacktester does not support take-profit/stop-loss exit levels")
+        close, has_bar = align_frames(frames)
+        with profiler.stage('signals'):
+            signals = pd.DataFrame(
+                {sym: strat.generate_signals(df, params) for sym, df in frames.items()}
+            ).reindex(close.index)
+        return self.run_signals(close, signals, has_bar)
+
+    def run_signals(
+        self,
+        close: pd.DataFrame,
+        signals: pd.DataFrame,
+        has_bar: pd.DataFrame = None
+    ) -> Dict[str, Any]:
+        """
+        Simulate given bars x symbols Close prices and signals (1 enter,
+        -1 exit, 0 hold; columns matched by symbol). Signals only fill
+        where has_bar is True (default: where close is not NaN).
+        """
+        signals = signals.reindex(index=close.index, columns=close.columns)
+        sig = signals.fillna(0).to_numpy(dtype=np.int8)
+        px = close.to_numpy(dtype=float)
+        valid = ~np.isnan(px) if has_bar is None else has_bar.reindex_like(close).fillna(False).to_numpy(dtype=bool)
+
+        idx = close.index
+        day_key = (idx.year * 10000 + idx.month * 100 + idx.day).to_numpy(dtype=np.int64)
+        week_key = idx.isocalendar().week.to_numpy(dtype=np.int64)
+        with profiler.stage('simulate'):
+            result = self._simulate(px, sig, valid, day_key, week_key)
+        profiler.count('backtests')
+        profiler.count('bars', px.size)
+        profiler.count('trades', result['total_trades'])
+
+        with profiler.stage('metrics'):
+            return self._summarize(close, result)
+
+    def _simulate(
+        self,
+        close: np.ndarray,
+        sig: np.ndarray,
+        valid: np.ndarray,
+        day_key: np.ndarray,
+        week_key: np.ndarray
+    ) -> Dict[str, Any]:
+        n, n_sym = close.shape
+        buy_rows, buy_cols = np.nonzero((sig == 1) & valid)
+        sell_rows, sell_cols = np.nonzero((sig == -1) & valid)
+        event_rows = np.union1d(buy_rows, sell_rows)
+        # Each event row's slice of the (row-sorted) buy/sell coordinates
+        buy_lo = np.searchsorted(buy_rows, event_rows, side='left')
+        buy_hi = np.searchsorted(buy_rows, event_rows, side='right')
+        sell_lo = np.searchsorted(sell_rows, event_rows, side='left')
+        sell_hi = np.searchsorted(sell_rows, event_rows, side='right')
+
+        leverage = max(self.margin / 100.0, 1.0)
+        frac = self.order_size_pct / 100.0
+        # Cash left after each entry, as a fraction of the cash before it
+        keep = 1.0 - frac * leverage
+        cost = self.tick_verify + self.slippage
+
+        cash = self.capital
+        pos = np.zeros(n_sym)
+        entry_price = np.zeros(n_sym)
+        trades = np.zeros(n_sym, dtype=np.int64)
+        wins = np.zeros(n_sym, dtype=np.int64)
+        losses = np.zeros(n_sym, dtype=np.int64)
+        gross_profit = np.zeros(n_sym)
+        gross_loss = np.zeros(n_sym)
+
+        day_count: Dict[int, int] = {}
+        week_count: Dict[int, int] = {}
+
+        # Fills (bar, symbol, position change) and cash after each event bar
+        fill_rows: List[np.ndarray] = []
+        fill_cols: List[np.ndarray] = []
+        fill_delta: List[np.ndarray] = []
+        points: List[int] = [0]
+        cash_vals: List[float] = [cash]
+
+        for e, r in enumerate(event_rows):
+            r = int(r)
+            changed = False
+
+            cols = sell_cols[sell_lo[e]:sell_hi[e]]
+            cols = cols[pos[cols] > 0]
+            if cols.size:
+                exit_price = close[r, cols] - cost
+                held = pos[cols]
+                cash += float(held @ exit_price)
+                pnl = (exit_price - entry_price[cols]) * held
+                won = pnl >= 0
+                wins[cols] += won
+                losses[cols] += ~won
+                gross_profit[cols] += np.where(won, pnl, 0.0)
+                gross_loss[cols] += np.where(won, 0.0, -pnl)
+                fill_rows.append(np.full(cols.size, r))
+                fill_cols.append(cols)
+                fill_delta.append(-held)
+                pos[cols] = 0.0
+                changed = True
+
+            cols = buy_cols[buy_lo[e]:buy_hi[e]]
+            cols = cols[pos[cols] == 0]
+            if cols.size and cash > 0:
+                d, w = int(day_key[r]), int(week_key[r])
+                room = min(self.max_day - day_count.get(d, 0), self.max_week - week_count.get(w, 0))
+                if keep <= 0:
+                    # The first entry uses up all cash
+                    room = min(room, 1)
+                cols = cols[:max(room, 0)]
+            else:
+                cols = cols[:0]
+            if cols.size:
+                price = close[r, cols] + cost
+                order_cash = frac * cash * keep ** np.arange(cols.size)
+                size = order_cash / price * leverage
+                cash -= float(size @ price)
+                pos[cols] = size
+                entry_price[cols] = price
+                trades[cols] += 1
+                day_count[d] = day_count.get(d, 0) + cols.size
+                week_count[w] = week_count.get(w, 0) + cols.size
+                fill_rows.append(np.full(cols.size, r))
+                fill_cols.append(cols)
+                fill_delta.append(size)
+                changed = True
+
+            if changed:
+                if points[-1] == r:
+                    cash_vals[-1] = cash
+                else:
+                    points.append(r)
+                    cash_vals.append(cash)
+
+        lengths = np.diff(np.append(points, n))
+        cash_arr = np.repeat(cash_vals, lengths)
+
+        rows = np.concatenate(fill_rows) if fill_rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(fill_cols) if fill_cols else np.zeros(0, dtype=np.int64)
+        delta = np.concatenate(fill_delta) if fill_delta else np.zeros(0)
+        equity, max_pos = self._equity(close, cash_arr, rows, cols, delta)
+        # Bars with at least one open position (entries +1, exits -1); positions
+        # still open are closed on the last bar, like Backtester's trade log
+        open_count = np.cumsum(np.bincount(rows, weights=np.sign(delta), minlength=n))
+        invested_bars = int(np.count_nonzero(open_count[:-1] > 0.5))
+
+        # Close open positions at each symbol's last price
+        open_cols = np.flatnonzero(pos > 0)
+        final_cash = cash
+        if open_cols.size:
+            exit_price = close[-1, open_cols] - cost
+            held = pos[open_cols]
+            final_cash += float(held @ exit_price)
+            pnl = (exit_price - entry_price[open_cols]) * held
+            won = pnl >= 0
+            wins[open_cols] += won
+            losses[open_cols] += ~won
+            gross_profit[open_cols] += np.where(won, pnl, 0.0)
+            gross_loss[open_cols] += np.where(won, 0.0, -pnl)
+
+        return {
+            'cash': final_cash,
+            'equity': equity,
+            'closed_at_end': bool(open_cols.size),
+            'trades': trades,
+            'wins': wins,
+            'losses': losses,
+            'gross_profit': gross_profit,
+            'gross_loss': gross_loss,
+            'max_pos': max_pos,
+            'invested_bars': invested_bars,
+            'total_trades': int(trades.sum()),
+            'max_trades_day': max(day_count.values()) if day_count else 0,
+            'max_trades_week': max(week_count.values()) if week_count else 0,
+        }
+
+    @staticmethod
+    def _equity(
+        close: np.ndarray,
+        cash_arr: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        delta: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Portfolio equity per bar (cash plus marked-to-market positions) and
+        each symbol's largest position. Positions are rebuilt from the fills
+        a block of bars at a time, so memory stays bounded for many symbols.
+        """
+        n, n_sym = close.shape
+        priced = np.nan_to_num(close)
+        equity = np.empty(n)
+        max_pos = np.zeros(n_sym)
+        carry = np.zeros(n_sym)
+        block = max(1, EQUITY_BLOCK_CELLS // max(n_sym, 1))
+        bounds = np.searchsorted(rows, np.arange(0, n + block, block))
+        for k, lo in enumerate(range(0, n, block)):
+            hi = min(lo + block, n)
+            step = np.zeros((hi - lo, n_sym))
+            f_lo, f_hi = bounds[k], bounds[k + 1]
+            np.add.at(step, (rows[f_lo:f_hi] - lo, cols[f_lo:f_hi]), delta[f_lo:f_hi])
+            held = np.cumsum(step, axis=0, out=step)
+            held += carry
+            equity[lo:hi] = cash_arr[lo:hi] + np.einsum('ij,ij->i', held, priced[lo:hi])
+            np.maximum(max_pos, held.max(axis=0), out=max_pos)
+            carry = held[-1].copy()
+        return equity, max_pos
+
+    def _summarize(self, close: pd.DataFrame, sim: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Portfolio metrics with the same keys as Backtester results (the
+        equity curve as a float64 array), plus per_symbol. Buy & hold is an
+        equal-weight split of capital.
+        """
+        equity_curve = sim['equity']
+        cash = sim['cash']
+        if sim['closed_at_end']:
+            equity_curve = np.append(equity_curve, cash)
+        max_equity = max(self.capital, float(equity_curve.max())) if len(equity_curve) else self.capital
+
+        px = close.to_numpy(dtype=float)
+        first = close.bfill().iloc[0].to_numpy(dtype=float) if len(close) else np.full(px.shape[1], np.nan)
+        last = px[-1] if len(close) else np.full(px.shape[1], np.nan)
+        sym_return = (last - first) / first
+        buy_hold_pct = float(np.nanmean(sym_return)) * 100.0 if np.isfinite(sym_return).any() else 0.0
+
+        trades = sim['trades']
+        total_trades = sim['total_trades']
+        wins = int(sim['wins'].sum())
+        losses = int(sim['losses'].sum())
+        gross_profit = float(sim['gross_profit'].sum())
+        gross_loss = float(sim['gross_loss'].sum())
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sym_win_rate = np.where(trades > 0, sim['wins'] / trades * 100.0, 0.0)
+        per_symbol = pd.DataFrame({
+            'net_profit': sim['gross_profit'] - sim['gross_loss'],
+            'gross_profit': sim['gross_profit'],
+            'gross_loss': sim['gross_loss'],
+            'total_trades': trades,
+            'win_rate': sym_win_rate,
+            'buy_hold_pct': sym_return * 100.0,
+            'max_contracts_held': sim['max_pos'],
+        }, index=pd.Index(close.columns, name='symbol'))
+
+        runup_val = max_equity - self.capital
+        if len(equity_curve):
+            risk = equity_metrics(equity_curve, capital=self.capital, index=close.index)
+        else:
+            risk = dict.fromkeys(RISK_METRICS, 0.0)
+            risk['max_drawdown_bars'] = 0
+        risk['profit_factor'] = profit_factor(gross_profit, gross_loss)
+        risk['exposure_pct'] = sim['invested_bars'] / len(close) * 100.0 if len(close) else 0.0
+        return {
+            "net_profit": cash - self.capital,
+            "gross_profit": gross_profit,
+            "gross_loss": gross_loss,
+            "buy_hold_val": buy_hold_pct / 100.0 * self.capital,
+            "buy_hold_pct": buy_hold_pct,
+            "max_runup_val": runup_val,
+            "max_runup_pct": runup_val / self.capital * 100.0,
+            **risk,
+            "total_trades": total_trades,
+            "win_rate": (wins / total_trades * 100.0) if total_trades > 0 else 0.0,
+            "loss_rate": (losses / total_trades * 100.0) if total_trades > 0 else 0.0,
+            "max_trades_day": sim['max_trades_day'],
+            "max_trades_week": sim['max_trades_week'],
+            "max_contracts_held": float(sim['max_pos'].sum()),
+            "symbols": close.shape[1],
+            "bars_run": len(close),
+            "equity_curve": equity_curve,
+            "per_symbol": per_symbol,
+        }
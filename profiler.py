@@ -0,0 +1,225 @@
+import contextlib
+import cProfile
+import heapq
+import json
+import marshal
+import os
+import pickle
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Slowest tasks whose cProfile stats are kept by ProfileReport
+PROFILE_TOP = 5
+PROFILE_DIR = 'profiles'
+
+_NULL = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    Per-stage wall/CPU timers and counters for one process.
+
+    Stages may nest: wall and cpu are inclusive, self_wall excludes the
+    time spent in nested stages (e.g. 'search' minus the backtests it ran).
+    Profilers from several workers are combined with merge.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}  # name -> [calls, wall, self_wall, cpu]
+        self.counters: Dict[str, int] = {}
+        self._children: List[float] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        self._children.append(0.0)
+        w0 = time.perf_counter()
+        c0 = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - w0
+            cpu = time.process_time() - c0
+            nested = self._children.pop()
+            if self._children:
+                self._children[-1] += wall
+            rec = self.stages.setdefault(name, [0, 0.0, 0.0, 0.0])
+            rec[0] += 1
+            rec[1] += wall
+            rec[2] += wall - nested
+            rec[3] += cpu
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: Dict[str, Any]):
+        """Adds another profiler's to_dict() into this one."""
+        for name, rec in other.get('stages', {}).items():
+            mine = self.stages.setdefault(name, [0, 0.0, 0.0, 0.0])
+            for i, v in enumerate(rec):
+                mine[i] += v
+        for name, n in other.get('counters', {}).items():
+            self.count(name, n)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'stages': {k: list(v) for k, v in self.stages.items()}, 'counters': dict(self.counters)}
+
+
+_ACTIVE: Optional[Profiler] = None
+
+
+def stage(name: str):
+    """Times a block under the active profiler; a no-op when profiling is off."""
+    if _ACTIVE is None:
+        return _NULL
+    return _ACTIVE.stage(name)
+
+
+def count(name: str, n: int = 1):
+    """Adds n to a counter of the active profiler, if any."""
+    if _ACTIVE is not None:
+        _ACTIVE.count(name, n)
+
+
+def enabled() -> bool:
+    return _ACTIVE is not None
+
+
+@contextlib.contextmanager
+def profiling(profiler: Optional[Profiler] = None):
+    """Makes profiler (a new one by default) the active one for the block."""
+    global _ACTIVE
+    prev = _ACTIVE
+    _ACTIVE = profiler if profiler is not None else Profiler()
+    try:
+        yield _ACTIVE
+    finally:
+        _ACTIVE = prev
+
+
+def profiled_task(fn: Callable[[Any], Any], task: Any, cprofile: bool = False) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Pool worker wrapper: runs fn(task) under a fresh Profiler (and cProfile
+    with cprofile) and returns (result, record). record holds the task's
+    wall/cpu time, its profiler dict, the pickled size of the result and,
+    with cprofile, the marshalled pstats data.
+    """
+    prof = cProfile.Profile() if cprofile else None
+    w0 = time.perf_counter()
+    c0 = time.process_time()
+    with profiling() as profiler:
+        if prof is not None:
+            prof.enable()
+        try:
+            result = fn(task)
+        finally:
+            if prof is not None:
+                prof.disable()
+        # What the pool will pay to send the result back
+        with profiler.stage('pickle_result'):
+            profiler.count('result_bytes', len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL)))
+    record = {
+        'pid': os.getpid(),
+        'wall': time.perf_counter() - w0,
+        'cpu': time.process_time() - c0,
+        'profile': profiler.to_dict(),
+        'pstats': None,
+    }
+    if prof is not None:
+        prof.create_stats()
+        record['pstats'] = marshal.dumps(prof.stats)
+    return result, record
+
+
+def _label(task: Any) -> str:
+    fields = task._asdict() if hasattr(task, '_asdict') else {'task': task}
+    parts = [str(v) for k, v in fields.items() if k != 'params' and v is not None]
+    return '_'.join(parts)
+
+
+class ProfileReport:
+    """
+    Parent-side aggregate of profiled_task records: stage totals across
+    workers, the parent's own stages (time them with report.parent.stage),
+    and the cProfile stats of the `top` slowest tasks.
+    """
+
+    def __init__(self, top: int = PROFILE_TOP):
+        self.top = top
+        self.profiler = Profiler()
+        self.parent = Profiler()
+        self.tasks = 0
+        self.task_wall = 0.0
+        self.task_cpu = 0.0
+        self.workers = set()
+        self._slowest: List[Tuple[float, int, str, Optional[bytes]]] = []
+
+    def add(self, task: Any, record: Dict[str, Any]):
+        self.profiler.merge(record['profile'])
+        self.tasks += 1
+        self.task_wall += record['wall']
+        self.task_cpu += record['cpu']
+        self.workers.add(record['pid'])
+        item = (record['wall'], self.tasks, _label(task), record['pstats'])
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, item)
+        elif item[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest(self) -> List[Tuple[str, float]]:
+        """(task label, wall seconds) of the slowest tasks, slowest first."""
+        return [(label, wall) for wall, _, label, _ in sorted(self._slowest, reverse=True)]
+
+    def summary(self) -> 'pd.DataFrame':
+        """
+        One row per (where, stage), where is 'worker' (summed over all
+        tasks) or 'parent': calls, wall, self_wall, cpu, and for worker
+        stages the share of total task wall time.
+        """
+        import pandas as pd
+
+        rows = [
+            {'where': where, 'stage': name, 'calls': int(calls), 'wall': wall, 'self_wall': self_wall, 'cpu': cpu}
+            for where, prof in (('worker', self.profiler), ('parent', self.parent))
+            for name, (calls, wall, self_wall, cpu) in prof.stages.items()
+        ]
+        df = pd.DataFrame(rows, columns=['where', 'stage', 'calls', 'wall', 'self_wall', 'cpu'])
+        share = df['self_wall'] / self.task_wall * 100.0 if self.task_wall else 0.0
+        df['pct_task_wall'] = share
+        df.loc[df['where'] == 'parent', 'pct_task_wall'] = float('nan')
+        return df.sort_values(['where', 'self_wall'], ascending=[False, False], ignore_index=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'tasks': self.tasks,
+            'workers': len(self.workers),
+            'task_wall': self.task_wall,
+            'task_cpu': self.task_cpu,
+            'counters': dict(self.profiler.counters),
+            'stages': self.summary().to_dict('records'),
+            'slowest': [{'task': label, 'wall': wall} for label, wall in self.slowest()],
+        }
+
+    def dump(self, directory: str = PROFILE_DIR) -> List[str]:
+        """
+        Writes summary.json and one <task>.prof per kept slow task (pstats
+        format: python -m pstats, snakeviz, or flameprof for flame graphs).
+        Returns the written paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        summary_path = os.path.join(directory, 'summary.json')
+        with open(summary_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+        paths.append(summary_path)
+        for rank, (wall, _, label, stats) in enumerate(sorted(self._slowest, reverse=True), start=1):
+            if stats is None:
+                continue
+            safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in label)
+            path = os.path.join(directory, f'{rank:02d}_{safe}.prof')
+            with open(path, 'wb') as f:
+                f.write(stats)
+            paths.append(path)
+        return paths
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+import weakref
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_manager import DATA_FOLDER
+
+# Default location of the backtest result cache
+CACHE_PATH = os.path.join(DATA_FOLDER, 'results_cache.sqlite')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Part of every key; bump when the layout of cached results changes
+RESULT_FORMAT = 4
+
+# id(DataFrame) -> (weakref to it, fingerprint); avoids rehashing the same
+# read-only frame on every optimizer trial
+_FP_MEMO: Dict[int, Tuple[Any, str]] = {}
+
+
+def _read_only(df: pd.DataFrame) -> bool:
+    """True when no column of df can be written in place."""
+    for col in df.columns:
+        owner = df[col].to_numpy()
+        while isinstance(owner.base, np.ndarray):
+            owner = owner.base
+        if owner.flags.writeable:
+            return False
+    return True
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Content hash of a DataFrame's index and columns. Identical data gives the
+    same fingerprint regardless of which file or process it came from.
+    Only frames over read-only columns (columnar store memmaps,
+    shared-memory frames) are memoized; others can change in place, so
+    they are hashed on every call.
+    """
+    memo = _FP_MEMO.get(id(df))
+    if memo is not None and memo[0]() is df:
+        return memo[1]
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(df.index.to_numpy()).view(np.uint8))
+    h.update(str(getattr(df.index, 'tz', None)).encode())
+    for col in df.columns:
+        h.update(str(col).encode())
+        h.update(np.ascontiguousarray(df[col].to_numpy()).view(np.uint8))
+    fp = h.hexdigest()
+    if not _read_only(df):
+        return fp
+
+    try:
+        ref = weakref.ref(df, lambda _, key=id(df): _FP_MEMO.pop(key, None))
+        _FP_MEMO[id(df)] = (ref, fp)
+    except TypeError:
+        pass
+    return fp
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def result_key(
+    data: pd.DataFrame,
+    strategy_key: str,
+    params: Dict[str, Any],
+    settings: Dict[str, Any]
+) -> str:
+    """
+    Cache key for one backtest: data fingerprint and date range, strategy
+    identity, normalized params and Backtester settings.
+    """
+    date_range = (str(data.index[0]), str(data.index[-1]), len(data)) if len(data) else None
+    payload = json.dumps(
+        {
+            'data': frame_fingerprint(data),
+            'range': date_range,
+            'strategy': strategy_key,
+            'params': _normalize(params),
+            'settings': _normalize(settings),
+            'format': RESULT_FORMAT,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed store of backtest results with least-recently-used
+    eviction once the stored size exceeds max_bytes. Safe to share between
+    processes; pickles by path and reconnects lazily. With ttl (seconds),
+    entries older than that are treated as missing and purged.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        return state
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # May be used from a worker thread other than the one that opened it
+            # (e.g. AsyncAIAdvisor's cache thread), one thread at a time
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'size INTEGER NOT NULL, last_used REAL NOT NULL, '
+                'created REAL NOT NULL DEFAULT 0)'
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(results)')]
+            if 'created' not in columns:
+                # Cache files written before entries had a creation time
+                conn.execute('ALTER TABLE results ADD COLUMN created REAL NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self.conn.execute('SELECT value, created FROM results WHERE key = ?', (key,)).fetchone()
+        if row is not None and self.ttl is not None and row[1] < time.time() - self.ttl:
+            with self.conn:
+                self.conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.conn:
+            self.conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, result: Any):
+        blob = zlib.compress(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, size, last_used, created) VALUES (?, ?, ?, ?, ?)',
+                (key, blob, len(blob), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        if self.ttl is not None:
+            self.conn.execute('DELETE FROM results WHERE created < ?', (time.time() - self.ttl,))
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self.conn.execute('SELECT key, size FROM results ORDER BY last_used'):
+            doomed.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self.conn.executemany('DELETE FROM results WHERE key = ?', doomed)
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM results')
+
+    def stats(self) -> Dict[str, Any]:
+        entries, nbytes = self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results'
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'nbytes': nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,250 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+# Completed task ids are kept next to the output, in <path>.ledger
+LEDGER_SUFFIX = '.ledger'
+_RUN_PREFIX = '#run '
+# Parquet parts are written under this suffix and renamed once complete
+_PART_TMP = '.tmp'
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def task_id(task: Any) -> str:
+    """
+    Stable id of a task (a NamedTuple such as worker_pool.Task or a dict),
+    the same across processes and restarts.
+    """
+    fields = task._asdict() if hasattr(task, '_asdict') else task
+    payload = json.dumps(fields, sort_keys=True, default=_json_default)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def run_id(task_ids: Iterable[str]) -> str:
+    """Id of a whole run: the set of its task ids."""
+    h = hashlib.sha1()
+    for tid in sorted(set(task_ids)):
+        h.update(tid.encode())
+    return h.hexdigest()
+
+
+def _flat(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Nested values (e.g. best_params) as JSON text, for tabular formats."""
+    return {
+        k: json.dumps(v, sort_keys=True, default=_json_default) if isinstance(v, (dict, list, tuple)) else v
+        for k, v in row.items()
+    }
+
+
+def _trim_partial_line(path: str):
+    """Drops a last line left half-written by a crash."""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        # Walk back to the previous newline
+        pos = size - 1
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b'\n')
+            if nl >= 0:
+                f.truncate(pos - step + nl + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+class ResultWriter:
+    """
+    Streams results to disk as they arrive: one CSV row or JSON line per
+    result, flushed immediately, or Parquet part files of row_group_size
+    rows (path is then a directory of part files; needs pyarrow).
+
+    After each write, the task ids and the point the output is complete up
+    to (the file size, or the name of a closed part file) are appended to
+    a ledger next to the output. When a run with the same set of tasks
+    (run) is started again, `done` holds the ledgered ids so they can be
+    skipped, and anything written after the last ledger entry (a row or a
+    part file whose ids never made it to the ledger) is dropped, so no
+    result is lost or duplicated. Any other run, or resume=False, starts
+    the output over. At most the results in flight when the process died
+    are computed twice.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        run: str = '',
+        resume: bool = True,
+        fmt: Optional[str] = None,
+        row_group_size: int = 1000
+    ):
+        self.path = path
+        self.run = run
+        self.fmt = fmt or self._format_of(path)
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Unsupported output format: {self.fmt}")
+        self.row_group_size = row_group_size
+        self.ledger_path = path.rstrip(os.sep) + LEDGER_SUFFIX
+        self.done: Set[str] = set()
+        self.written = 0
+
+        self._file = None
+        self._csv: Optional[csv.DictWriter] = None
+        self._schema = None
+        self._parts = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_ids: List[str] = []
+
+        if resume and self._load_ledger():
+            self._ledger = open(self.ledger_path, 'a', encoding='utf-8')
+        else:
+            self._reset()
+            self._ledger = open(self.ledger_path, 'w', encoding='utf-8')
+            self._ledger.write(f"{_RUN_PREFIX}{run}\n")
+            self._ledger.flush()
+
+    @staticmethod
+    def _format_of(path: str) -> str:
+        ext = os.path.splitext(path.rstrip(os.sep))[1].lower().lstrip('.')
+        return {'json': 'jsonl', 'ndjson': 'jsonl', 'pq': 'parquet'}.get(ext, ext or 'csv')
+
+    def _load_ledger(self) -> bool:
+        """
+        Reads the ledger and rolls the output back to its last entry; False
+        when it is missing or from another run.
+        """
+        if not os.path.exists(self.ledger_path) or not os.path.exists(self.path):
+            return False
+        _trim_partial_line(self.ledger_path)
+        marks = []
+        with open(self.ledger_path, 'r', encoding='utf-8') as f:
+            header = f.readline().rstrip('\n')
+            if header != f"{_RUN_PREFIX}{self.run}":
+                return False
+            for line in f:
+                ids, _, mark = line.rstrip('\n').partition('\t')
+                if not mark:
+                    continue
+                self.done.update(ids.split(','))
+                marks.append(mark)
+        if self.fmt == 'parquet':
+            # Parts (or temporary parts) not in the ledger were never committed
+            kept = set(marks)
+            for part in glob.glob(os.path.join(self.path, 'part-*')):
+                if os.path.basename(part) not in kept:
+                    os.remove(part)
+            self._parts = len(kept)
+        else:
+            with open(self.path, 'rb+') as f:
+                f.truncate(int(marks[-1]) if marks else 0)
+        return True
+
+    def _reset(self):
+        if self.fmt == 'parquet':
+            for part in glob.glob(os.path.join(self.path, 'part-*')):
+                os.remove(part)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self.done = set()
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, tid: str, row: Dict[str, Any]):
+        """Appends one result and marks its task done."""
+        if self.fmt == 'parquet':
+            self._buffer.append(_flat(row))
+            self._buffer_ids.append(tid)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush_row_group()
+            return
+
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8', newline='')
+        if self.fmt == 'csv':
+            if self._csv is None:
+                fields = self._csv_header() or list(row)
+                self._csv = csv.DictWriter(self._file, fieldnames=fields)
+                if self._file.tell() == 0:
+                    self._csv.writeheader()
+            self._csv.writerow(_flat(row))
+        else:
+            self._file.write(json.dumps(row, default=_json_default) + '\n')
+        self._file.flush()
+        self._mark_done([tid], str(self._file.tell()))
+
+    def _csv_header(self) -> Optional[List[str]]:
+        if os.path.getsize(self.path) == 0:
+            return None
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), None)
+
+    def _flush_row_group(self):
+        if not self._buffer:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow (pip install pyarrow)")
+        os.makedirs(self.path, exist_ok=True)
+        table = pa.Table.from_pylist(self._buffer, schema=self._schema)
+        self._schema = table.schema
+        # A part is only readable once its footer is written, so it gets its
+        # final name (and its ids their ledger entry) after it is closed
+        name = f'part-{self._parts:05d}.parquet'
+        tmp = os.path.join(self.path, name + _PART_TMP)
+        pq.write_table(table, tmp)
+        os.replace(tmp, os.path.join(self.path, name))
+        self._parts += 1
+        self._mark_done(self._buffer_ids, name)
+        self._buffer = []
+        self._buffer_ids = []
+
+    def _mark_done(self, ids: List[str], mark: str):
+        """Ledgers ids as written, with the point the output is complete up to."""
+        self._ledger.write(f"{','.join(ids)}\t{mark}\n")
+        self._ledger.flush()
+        self.done.update(ids)
+        self.written += len(ids)
+
+    def close(self):
+        if self.fmt == 'parquet':
+            self._flush_row_group()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._ledger.close()
+
+    def read(self) -> pd.DataFrame:
+        """Everything written so far, including earlier runs that were resumed."""
+        if self.fmt == 'parquet':
+            parts = sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+            return pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True) if parts else pd.DataFrame()
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return pd.DataFrame()
+        if self.fmt == 'csv':
+            return pd.read_csv(self.path)
+        return pd.read_json(self.path, lines=True)
@@ -10,8 +10,8 @@ from rich.table import Table
 from datetime import datetime
 import time
 
+# cli defers its heavy imports to the commands, so the menu opens at once
 from cli import create_ai, refine_ai, scan, optimize
-from data_manager import load_templates, load_data
 
 console = Console()
 
@@ -42,6 +42,7 @@ def main():
 
         # Common prompts
         templates_dir = Prompt.ask("Templates directory", default="templates")
+        from data_manager import load_data
         data = load_data()
 
         if choice == "1":  # Create AI
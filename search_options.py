@@ -0,0 +1,7 @@
+# Option values shared by optimizer and the CLI. This module imports
+# nothing heavy, so the CLI can build its option lists without skopt.
+
+# Search strategies of scan_optimize
+SEARCH_MODES = ('bayes', 'halving', 'hyperband')
+# Result keys scan_optimize can maximize
+OPT_METRICS = ('net_profit', 'sharpe', 'sortino', 'calmar', 'profit_factor', 'annual_return_pct')
@@ -1,45 +1,103 @@
-import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+from indicator_cache import IndicatorCache, INDICATOR_CACHE
+from pine_injector import compile_keyword_template
+
 
 class StrategyTemplate:
     """
     Represents a parameterized Pine Script strategy template.
     """
-    def __init__(self, name: str, code_template: str, param_space: Dict[str, Dict[str, Any]]):
+    def __init__(
+        self,
+        name: str,
+        code_template: str = None,
+        param_space: Dict[str, Dict[str, Any]] = None,
+        path: str = None,
+        tags: List[str] = None
+    ):
         self.name = name
-        self.code_template = code_template
-        self.param_space = param_space
+        self._code_template = code_template
+        self.param_space = param_space if param_space is not None else {}
+        self.path = path
+        self.tags = tags if tags is not None else []
+
+    @property
+    def code_template(self) -> str:
+        """Pine source; read from path on first access when not given."""
+        if self._code_template is None and self.path is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._code_template = f.read()
+        return self._code_template
 
     def instantiate(self, params: Dict[str, Any]) -> str:
         """
         Fill in the default parameter values in the Pine Script code.
         This replaces each input.* call's defval with the provided param.
         """
-        code = self.code_template
-        for title, val in params.items():
-            # Replace defval for the matching title
-            pattern = (
-                rf"(input\.[^\(]*\(\s*title=['\"]{re.escape(title)}['\"][^,]*,\s*defval=)([^,\)]+)"
-            )
-            code = re.sub(pattern, rf"\1{val}", code)
-        return code
+        return compile_keyword_template(self.code_template).render(params)
+
+    def instantiate_many(self, params_list: List[Dict[str, Any]]) -> List[str]:
+        """
+        Batch form of instantiate; the input declarations are parsed once.
+        """
+        return compile_keyword_template(self.code_template).render_many(params_list)
+
+    def compile(self) -> 'Strategy':
+        """
+        Compile the Pine code into a Strategy usable with Backtester.
+        Compilation is cached per template source, so each parameter set
+        only binds input values instead of re-parsing the script.
+        """
+        from pine_compiler import PineStrategy, compile_pine
+        return PineStrategy(compile_pine(self.code_template))
 
 
 # Placeholder strategy classes for backtester compatibility
 class Strategy:
+    def __init__(self, cache: IndicatorCache = None):
+        # Indicators are fetched from a cache shared across parameter sets
+        self.cache = cache if cache is not None else INDICATOR_CACHE
+
+    # True when generate_orders returns take-profit/stop-loss offsets
+    has_exit_levels = False
+
     def generate_signals(self, data: pd.DataFrame, params: dict) -> pd.Series:
         raise NotImplementedError
 
+    def generate_orders(
+        self, data: pd.DataFrame, params: dict
+    ) -> Tuple[pd.Series, Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Signals plus optional exit levels: a (profit, loss) pair of per-bar
+        price offsets (inf for none). Backtester sets take-profit/stop-loss
+        prices from the close of each entry it actually fills and exits on
+        the first later close at or beyond either. Default: signals only.
+        """
+        return self.generate_signals(data, params), None
+
+    def cache_key(self) -> str:
+        """Identity of the signal logic, used to key cached backtest results."""
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
+    def generate_signals_batch(self, data: pd.DataFrame, params_list: List[dict]) -> np.ndarray:
+        """
+        Signal matrix (bars x variants), one column per parameter set.
+        Subclasses override this to share indicator work across variants.
+        """
+        cols = [self.generate_signals(data, p).to_numpy(dtype=float) for p in params_list]
+        return np.column_stack(cols)
+
 
 class MACDStrategy(Strategy):
     def generate_signals(self, data, params):
         fast = int(params['Fast EMA Period'])
         slow = int(params['Slow EMA Period'])
         sig  = int(params['MACD Signal Smoothing'])
-        e1 = data['Close'].ewm(span=fast).mean()
-        e2 = data['Close'].ewm(span=slow).mean()
+        e1 = self.cache.ema(data['Close'], fast)
+        e2 = self.cache.ema(data['Close'], slow)
         mac = e1 - e2
         sigl = mac.ewm(span=sig).mean()
         buy = (mac>sigl) & (mac.shift(1)<=sigl.shift(1))
@@ -48,13 +106,41 @@ class MACDStrategy(Strategy):
         s[buy]=1; s[sell]=-1
         return s
 
+    def generate_signals_batch(self, data, params_list):
+        close = data['Close']
+        macs = []
+        sig_spans = []
+        for p in params_list:
+            fast = int(p['Fast EMA Period'])
+            slow = int(p['Slow EMA Period'])
+            e1 = self.cache.ema(close, fast).to_numpy()
+            e2 = self.cache.ema(close, slow).to_numpy()
+            macs.append(e1 - e2)
+            sig_spans.append(int(p['MACD Signal Smoothing']))
+        mac = np.column_stack(macs)
+        sigl = np.empty_like(mac)
+        for span in set(sig_spans):
+            cols = [j for j, s in enumerate(sig_spans) if s == span]
+            sigl[:, cols] = pd.DataFrame(mac[:, cols]).ewm(span=span).mean().to_numpy()
+        prev_mac = np.vstack([np.full((1, mac.shape[1]), np.nan), mac[:-1]])
+        prev_sig = np.vstack([np.full((1, mac.shape[1]), np.nan), sigl[:-1]])
+        buy = (mac>sigl) & (prev_mac<=prev_sig)
+        sell= (mac<sigl) & (prev_mac>=prev_sig)
+        return np.where(sell, -1.0, np.where(buy, 1.0, 0.0))
+
 
 class RSIStrategy(Strategy):
     def generate_signals(self, data, params):
         length = int(params['RSI Period'])
         ob = params['RSI Overbought']; os_ = params['RSI Oversold']
-        d = data['Close'].diff(); g=d.where(d>0,0); l=-d.where(d<0,0)
-        ag = g.ewm(alpha=1/length).mean(); al=l.ewm(alpha=1/length).mean()
-        rsi = 100 - (100/(1+ag/al))
+        rsi = self.cache.rsi(data['Close'], length)
         s=pd.Series(0,index=data.index); s[rsi<os_]=1; s[rsi>ob]=-1
         return s
+
+    def generate_signals_batch(self, data, params_list):
+        close = data['Close']
+        cols = [self.cache.rsi(close, int(p['RSI Period'])).to_numpy() for p in params_list]
+        rsi = np.column_stack(cols)
+        ob = np.array([p['RSI Overbought'] for p in params_list], dtype=float)
+        os_ = np.array([p['RSI Oversold'] for p in params_list], dtype=float)
+        return np.where(rsi>ob, -1.0, np.where(rsi<os_, 1.0, 0.0))
@@ -1,42 +1,142 @@
+import concurrent.futures
+import fnmatch
+import json
 import os
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
+from pine_compiler import PineCompileError, compile_pine
 from strategies import StrategyTemplate
 
+# Parse results per file, stored in the templates directory
+INDEX_FILENAME = '.template_index.json'
+INDEX_VERSION = 2
+# Below this many changed files, parsing in a process pool is not worth it
+PARALLEL_THRESHOLD = 32
+
+
+def _to_num(val: str):
+    try:
+        return int(val)
+    except ValueError:
+        return float(val)
+
 
 class TemplateManager:
     """
     Scans a directory of Pine Script (.pine) template files,
     parses input declarations, and builds StrategyTemplate objects.
+
+    Parse results are kept in an index file keyed by file name, mtime and
+    size, so only new or changed files are read; those are parsed in
+    parallel. Templates are returned without their code, which is read on
+    first use, and get_templates can filter by name or tag from the index.
     """
     INPUT_PATTERN = re.compile(r"input\.(?P<type>int|float|bool|string)\s*\(\s*title\s*=\s*['\"](?P<title>[^'\"]+)['\"]\s*(?:,\s*defval\s*=\s*(?P<defval>[^,\)]+))?(?:,\s*minval\s*=\s*(?P<min>[^,\)]+))?(?:,\s*maxval\s*=\s*(?P<max>[^,\)]+))?(?:,\s*step\s*=\s*(?P<step>[^,\)]+))?\s*\)")
+    # Explicit tags: a comment line such as "// @tags trend, breakout"
+    TAGS_PATTERN = re.compile(r"^\s*//\s*@tags\s*:?\s*(?P<tags>.+)$", re.MULTILINE)
+    # ta.* functions used by a template are added as tags (e.g. 'ema', 'rsi')
+    TA_PATTERN = re.compile(r"\bta\.(?P<func>\w+)\s*\(")
 
-    def __init__(self, templates_dir: str = 'templates'):
+    def __init__(self, templates_dir: str = 'templates', workers: Optional[int] = None):
         self.templates_dir = templates_dir
+        self.workers = workers
         self.templates: List[StrategyTemplate] = []
+        # template name -> parse error, for files that failed to load
+        self.errors: Dict[str, str] = {}
         self._load_all()
 
     def _load_all(self):
         if not os.path.isdir(self.templates_dir):
             raise FileNotFoundError(f"Templates directory not found: {self.templates_dir}")
 
-        for fname in os.listdir(self.templates_dir):
-            if fname.lower().endswith('.pine'):
-                path = os.path.join(self.templates_dir, fname)
-                try:
-                    tmpl = self._load_one(path)
-                    self.templates.append(tmpl)
-                except Exception as e:
-                    print(f"Warning: failed to load template {fname}: {e}")
+        index_path = os.path.join(self.templates_dir, INDEX_FILENAME)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != INDEX_VERSION:
+                index = {}
+        except (OSError, ValueError):
+            index = {}
+        cached: Dict[str, Dict[str, Any]] = index.get('files', {})
+
+        entries: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        with os.scandir(self.templates_dir) as it:
+            for de in sorted(it, key=lambda d: d.name):
+                if not (de.is_file() and de.name.lower().endswith('.pine')):
+                    continue
+                st = de.stat()
+                entry = cached.get(de.name)
+                if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                    entries[de.name] = entry
+                else:
+                    entries[de.name] = None
+                    stale.append(de.name)
+
+        if stale:
+            paths = [os.path.join(self.templates_dir, fname) for fname in stale]
+            if len(stale) >= PARALLEL_THRESHOLD and self.workers != 1:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    parsed = list(executor.map(_parse_file, paths, chunksize=16))
+            else:
+                parsed = [_parse_file(p) for p in paths]
+            for fname, entry in zip(stale, parsed):
+                entries[fname] = entry
 
-    def _load_one(self, filepath: str) -> StrategyTemplate:
+        if stale or set(entries) != set(cached):
+            tmp = index_path + '.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({'version': INDEX_VERSION, 'files': entries}, f)
+                os.replace(tmp, index_path)
+            except OSError:
+                # Read-only template folders still load, just without caching
+                pass
+
+        for fname, entry in entries.items():
+            if entry.get('error'):
+                self.errors[entry['name']] = entry['error']
+                print(f"Warning: failed to load template {fname}: {entry['error']}")
+                continue
+            param_space = {
+                title: {**space, 'bounds': tuple(space['bounds']) if space['bounds'] is not None else None}
+                for title, space in entry['param_space'].items()
+            }
+            self.templates.append(StrategyTemplate(
+                name=entry['name'],
+                param_space=param_space,
+                path=os.path.join(self.templates_dir, fname),
+                tags=entry['tags']
+            ))
+
+    @classmethod
+    def _load_one(cls, filepath: str) -> StrategyTemplate:
         name = os.path.splitext(os.path.basename(filepath))[0]
         with open(filepath, 'r', encoding='utf-8') as f:
             code = f.read()
 
+        return StrategyTemplate(
+            name=name,
+            code_template=code,
+            param_space=cls.parse_param_space(code),
+            path=filepath,
+            tags=cls.parse_tags(code)
+        )
+
+    @classmethod
+    def parse_param_space(cls, code: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Input declarations of a template. The Pine compiler's parse handles
+        positional and keyword arguments alike; scripts outside its subset
+        fall back to INPUT_PATTERN (keyword-style inputs only).
+        """
+        try:
+            return compile_pine(code).param_space()
+        except PineCompileError:
+            pass
         param_space: Dict[str, Dict[str, Any]] = {}
-        for match in self.INPUT_PATTERN.finditer(code):
+        for match in cls.INPUT_PATTERN.finditer(code):
             ptype = match.group('type')
             title = match.group('title')
             defval = match.group('defval')
@@ -45,12 +145,6 @@ class TemplateManager:
             step = match.group('step')
 
             # convert values
-            def _to_num(val: str):
-                try:
-                    return int(val)
-                except ValueError:
-                    return float(val)
-
             default = None
             if defval is not None:
                 default = _to_num(defval.strip())
@@ -66,13 +160,48 @@ class TemplateManager:
                 'bounds': bounds,
                 'step': _to_num(step.strip()) if step else None
             }
+        return param_space
+
+    @classmethod
+    def parse_tags(cls, code: str) -> List[str]:
+        tags = []
+        for match in cls.TAGS_PATTERN.finditer(code):
+            tags.extend(t.strip().lower() for t in match.group('tags').split(',') if t.strip())
+        tags.extend(m.group('func').lower() for m in cls.TA_PATTERN.finditer(code))
+        return list(dict.fromkeys(tags))
+
+    def get_templates(self, name: Optional[str] = None, tag: Optional[str] = None) -> List[StrategyTemplate]:
+        """
+        Returns the loaded StrategyTemplate objects, optionally filtered by a
+        name glob pattern (e.g. 'ema_*') and/or a tag. Filtering uses the
+        index only; template code is not read.
+        """
+        out = self.templates
+        if name is not None:
+            out = [t for t in out if fnmatch.fnmatchcase(t.name, name)]
+        if tag is not None:
+            out = [t for t in out if tag.lower() in t.tags]
+        return out
 
-        return StrategyTemplate(
-            name=name,
-            code_template=code,
-            param_space=param_space
-        )
 
-    def get_templates(self) -> List[StrategyTemplate]:
-        """Returns the loaded StrategyTemplate objects."""
-        return self.templates
+def _parse_file(path: str) -> Dict[str, Any]:
+    """
+    Parses one template file into an index entry (run in pool workers).
+    """
+    st = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    entry: Dict[str, Any] = {
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'name': name,
+        'param_space': {},
+        'tags': [],
+        'error': None,
+    }
+    try:
+        tmpl = TemplateManager._load_one(path)
+        entry['param_space'] = tmpl.param_space
+        entry['tags'] = tmpl.tags
+    except Exception as e:
+        entry['error'] = str(e)
+    return entry
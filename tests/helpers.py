@@ -0,0 +1,41 @@
+"""
+Deterministic test data shared by the test modules and benchmark.py.
+Only needs numpy and pandas.
+"""
+import numpy as np
+import pandas as pd
+
+MACD_PARAMS = {'Fast EMA Period': 12, 'Slow EMA Period': 26, 'MACD Signal Smoothing': 9}
+RSI_PARAMS = {'RSI Period': 14, 'RSI Overbought': 70, 'RSI Oversold': 30}
+
+
+def synthetic_ohlcv(n_bars: int, seed: int = 0, freq: str = 'min', start: str = '2000-01-03') -> pd.DataFrame:
+    """
+    Deterministic random-walk OHLCV bars; the same (n_bars, seed) always
+    gives the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='Date')
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.001, n_bars)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0.0, 0.0005, n_bars)) * close
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.integers(100, 10_000, n_bars).astype(float),
+    }, index=index)
+
+
+def read_only_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of df over read-only column arrays, like the frames the columnar
+    store and the shared-memory pool hand out.
+    """
+    columns = {}
+    for col in df.columns:
+        arr = df[col].to_numpy(copy=True)
+        arr.flags.writeable = False
+        columns[col] = arr
+    return pd.DataFrame(columns, index=df.index, copy=False)
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from ai_utils import AsyncAIAdvisor, CompletionCache
+
+
+class StubServer:
+    """
+    Local /v1/chat/completions endpoint. The user prompt selects the
+    behaviour: 'FLAKY' answers 503 to the first `flaky_failures` requests,
+    'DOWN' always answers 503, 'BAD' answers 400; anything else is echoed
+    back after `delay` seconds.
+    """
+
+    def __init__(self, delay: float = 0.0, flaky_failures: int = 2):
+        self.delay = delay
+        self.flaky_failures = flaky_failures
+        self.requests = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.failures = {}
+        self._runner = None
+        self.url = None
+
+    async def _handle(self, request):
+        body = await request.json()
+        prompt = body['messages'][1]['content']
+        self.requests += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if 'DOWN' in prompt:
+                return web.Response(status=503)
+            if 'FLAKY' in prompt and self.failures.get(prompt, 0) < self.flaky_failures:
+                self.failures[prompt] = self.failures.get(prompt, 0) + 1
+                return web.Response(status=503)
+            if 'BAD' in prompt:
+                return web.Response(status=400)
+            await asyncio.sleep(self.delay)
+            return web.json_response({'choices': [{'message': {'content': f'echo {prompt}'}}]})
+        finally:
+            self.in_flight -= 1
+
+    async def __aenter__(self) -> 'StubServer':
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+class RecordingCache(CompletionCache):
+    """CompletionCache that records the threads its methods run on."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.current_thread().name)
+        return super().get(key)
+
+    def put(self, key, result):
+        self.threads.add(threading.current_thread().name)
+        return super().put(key, result)
+
+
+def test_concurrency_limit():
+    async def main():
+        async with StubServer(delay=0.05) as server:
+            async with AsyncAIAdvisor(server.url, concurrency=3) as advisor:
+                results = await advisor.chat_many({i: ('sys', f'prompt {i}') for i in range(12)})
+            return server, results
+
+    server, results = asyncio.run(main())
+    assert results == {i: f'echo prompt {i}' for i in range(12)}
+    assert server.requests == 12
+    assert server.peak == 3
+
+
+def test_retries_with_backoff():
+    async def main():
+        async with StubServer() as server:
+            async with AsyncAIAdvisor(server.url, backoff=0.05, max_retries=3) as advisor:
+                t0 = time.perf_counter()
+                content = await advisor.chat('sys', 'FLAKY one')
+                elapsed = time.perf_counter() - t0
+            return server, content, elapsed
+
+    server, content, elapsed = asyncio.run(main())
+    assert content == 'echo FLAKY one'
+    assert server.requests == 3
+    # Two backoffs: at least 0.05 and 0.1 seconds (plus jitter)
+    assert elapsed >= 0.15
+
+
+def test_gives_up_after_max_retries():
+    async def main():
+        async with StubServer() as server:
+            async with AsyncAIAdvisor(server.url, backoff=0.001, max_retries=2) as advisor:
+                with pytest.raises(aiohttp.ClientResponseError) as err:
+                    await advisor.chat('sys', 'DOWN')
+            return server, err.value
+
+    server, err = asyncio.run(main())
+    assert err.status == 503
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried():
+    async def main():
+        async with StubServer() as server:
+            async with AsyncAIAdvisor(server.url, backoff=0.001) as advisor:
+                results = await advisor.chat_many(
+                    {'bad': ('sys', 'BAD'), 'ok': ('sys', 'fine')}, return_exceptions=True
+                )
+            return server, results
+
+    server, results = asyncio.run(main())
+    assert isinstance(results['bad'], aiohttp.ClientResponseError)
+    assert results['bad'].status == 400
+    assert results['ok'] == 'echo fine'
+    assert server.requests == 2
+
+
+def test_cache_hits_skip_the_server(tmp_path):
+    cache = RecordingCache(str(tmp_path / 'completions.sqlite'))
+
+    async def main():
+        async with StubServer() as server:
+            async with AsyncAIAdvisor(server.url, cache=cache) as advisor:
+                first = await advisor.chat('sys', 'hello')
+                second = await advisor.chat('sys', 'hello')
+                other = await advisor.chat('sys', 'other')
+            return server, first, second, other
+
+    server, first, second, other = asyncio.run(main())
+    assert first == second == 'echo hello'
+    assert other == 'echo other'
+    assert server.requests == 2
+    assert cache.stats()['hits'] == 1
+    # Cache calls ran off the event loop's thread
+    assert threading.current_thread().name not in cache.threads
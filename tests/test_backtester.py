@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from strategies import MACDStrategy, RSIStrategy, StrategyTemplate
+from tests.helpers import MACD_PARAMS, RSI_PARAMS, synthetic_ohlcv
+
+STRATEGIES = [
+    (MACDStrategy, MACD_PARAMS),
+    (RSIStrategy, {'RSI Period': 14, 'RSI Overbought': 60, 'RSI Oversold': 40}),
+]
+SETTINGS = [
+    {},
+    {'max_day': 1, 'max_week': 3},
+    {'max_day': 2, 'margin': 300, 'slippage': 0.01, 'tick_verify': 0.02},
+]
+STOP_RULES = [
+    {'max_drawdown_pct': 1.0},
+    {'min_equity': 9950},
+    {'max_idle_bars': 5},
+    {'max_drawdown_pct': 2.0, 'min_equity': 9950, 'max_idle_bars': 100},
+]
+
+# Entries while close is above its EMA; exits only through take-profit/stop-loss
+LEVELS_PINE = '''//@version=5
+strategy("levels", overlay=true)
+len = input.int(title="Len", defval=20, minval=2, maxval=100)
+tp = input.float(title="TP", defval=1.0, minval=0.1, maxval=5.0)
+m = ta.ema(close, len)
+if (close > m)
+    strategy.entry("Long", strategy.long)
+strategy.exit("x", from_entry="Long", profit=tp / 100 * close, loss=tp / 100 * close)
+'''
+
+
+def assert_same_result(a, b):
+    assert a.keys() == b.keys()
+    for key, value in a.items():
+        if isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(value, b[key], err_msg=key)
+        else:
+            assert value == b[key], key
+
+
+@pytest.fixture(scope='module', params=[('h', 5000), ('min', 20000), ('D', 3000)], ids=lambda p: p[0])
+def data(request):
+    freq, n_bars = request.param
+    return synthetic_ohlcv(n_bars, seed=7, freq=freq)
+
+
+@pytest.mark.parametrize('settings', SETTINGS)
+@pytest.mark.parametrize('strategy,params', STRATEGIES, ids=lambda s: getattr(s, '__name__', ''))
+def test_engines_agree(data, strategy, params, settings):
+    loop = Backtester(engine='loop', **settings).run(data, strategy(), params)
+    vectorized = Backtester(**settings).run(data, strategy(), params)
+    assert loop['total_trades'] > 0
+    assert_same_result(loop, vectorized)
+
+
+@pytest.mark.parametrize('stops', STOP_RULES)
+@pytest.mark.parametrize('strategy,params', STRATEGIES, ids=lambda s: getattr(s, '__name__', ''))
+def test_engines_agree_with_stop_rules(data, strategy, params, stops):
+    loop = Backtester(engine='loop', **stops).run(data, strategy(), params)
+    vectorized = Backtester(**stops).run(data, strategy(), params)
+    assert_same_result(loop, vectorized)
+    if loop['pruned']:
+        assert loop['bars_run'] < len(data)
+        assert loop['pruned_reason'] in stops or loop['pruned_reason'] == 'max_drawdown'
+
+
+def test_run_batch_matches_run(data):
+    params_list = [
+        {'Fast EMA Period': fast, 'Slow EMA Period': slow, 'MACD Signal Smoothing': 9}
+        for fast, slow in [(5, 20), (12, 26), (20, 50)]
+    ]
+    bt = Backtester(max_day=2, max_drawdown_pct=3.0)
+    batch = bt.run_batch(data, MACDStrategy(), params_list)
+    for params, result in zip(params_list, batch):
+        assert_same_result(bt.run(data, MACDStrategy(), params), result)
+
+
+def test_trade_log_and_curve_add_up():
+    data = synthetic_ohlcv(5000, seed=3, freq='h')
+    result = Backtester().run(data, MACDStrategy(), MACD_PARAMS)
+    trades = result['trade_log']
+    assert len(trades) == result['total_trades']
+    assert np.isclose(trades['pnl'].sum(), result['net_profit'])
+    assert np.isclose(result['equity_curve'][-1], 10000.0 + result['net_profit'])
+    assert np.all(trades['exit_bar'] > trades['entry_bar'])
+
+
+def test_compact_output_keeps_metrics():
+    data = synthetic_ohlcv(5000, seed=3, freq='h')
+    full = Backtester().run(data, MACDStrategy(), MACD_PARAMS)
+    compact = Backtester(keep_curve=False, keep_trades=False).run(data, MACDStrategy(), MACD_PARAMS)
+    thinned = Backtester(curve_points=100).run(data, MACDStrategy(), MACD_PARAMS)
+    assert compact['equity_curve'] is None and compact['trade_log'] is None
+    # Min and max of each bucket, plus the first and last value
+    assert len(thinned['equity_curve']) <= 102
+    np.testing.assert_array_equal(thinned['equity_curve'], full['equity_curve'][thinned['curve_bars']])
+    for key, value in full.items():
+        if not isinstance(value, np.ndarray) and key != 'curve_bars':
+            assert compact[key] == value == thinned[key], key
+
+
+@pytest.mark.parametrize('settings', [{}, {'max_day': 1}, {'max_week': 2}])
+def test_pine_exit_levels(settings):
+    data = synthetic_ohlcv(20000, seed=3, freq='15min')
+    strategy = StrategyTemplate('levels', LEVELS_PINE).compile()
+    params = {'Len': 20, 'TP': 0.5}
+    loop = Backtester(engine='loop', **settings).run(data, strategy, params)
+    vectorized = Backtester(**settings).run(data, strategy, params)
+    assert_same_result(loop, vectorized)
+
+    # Every trade leaves at the first close past the levels set at its own entry
+    close = data['Close'].to_numpy()
+    trades = loop['trade_log']
+    assert len(trades) > 0
+    for trade in trades:
+        entry, exit_ = trade['entry_bar'], trade['exit_bar']
+        level = 0.005 * close[entry]
+        moves = np.abs(close[entry + 1:] - close[entry])
+        hits = np.flatnonzero(moves >= level)
+        expected = entry + 1 + hits[0] if len(hits) else len(close) - 1
+        assert exit_ == expected
@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_manager import STORE_DIRNAME, DataManager, covering_range, load_data
+from indicator_cache import dataset_key
+from tests.helpers import synthetic_ohlcv
+
+RANGES = [
+    (None, None),
+    ('2000-01-05', None),
+    (None, '2000-01-20'),
+    ('2000-01-05', '2000-01'),
+    ('2000-01-05 10:30', '2000-01-09 07:00'),
+    ('2000', '2000-02-03'),
+    ('2000-04-01', '2000-04-03'),
+    ('1999-01-01', '1999-12-31'),
+]
+
+
+@pytest.fixture
+def folder(tmp_path):
+    synthetic_ohlcv(2000, seed=1, freq='h').to_csv(tmp_path / 'AAA_1Y_1h.csv')
+    synthetic_ohlcv(500, seed=2, freq='D').to_csv(tmp_path / 'AAA_2Y_1d.csv')
+    # Crosses the start of daylight saving, so the CSV mixes UTC offsets
+    ny = synthetic_ohlcv(3000, seed=3, freq='h')
+    ny.index = ny.index.tz_localize('UTC').tz_convert('America/New_York')
+    ny.to_csv(tmp_path / 'NY_1Y_1h.csv')
+    return tmp_path
+
+
+def parsed(path):
+    df = DataManager(os.path.dirname(path), use_store=False).load_csv(path)
+    if not isinstance(df.index, pd.DatetimeIndex):
+        # Mixed UTC offsets only parse as UTC; the store does the same
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.index, utc=True), name=df.index.name)
+    return df
+
+
+def assert_same_frame(store_df, csv_df):
+    np.testing.assert_array_equal(store_df.index.asi8, csv_df.index.asi8)
+    assert list(store_df.columns) == list(csv_df.columns)
+    np.testing.assert_array_equal(store_df.to_numpy(), csv_df.to_numpy())
+
+
+@pytest.mark.parametrize('name', ['AAA_1Y_1h.csv', 'NY_1Y_1h.csv'])
+def test_store_matches_csv(folder, name):
+    path = str(folder / name)
+    manager = DataManager(str(folder))
+    first = manager.load_csv(path)
+    assert os.path.exists(os.path.join(manager.store_path(path), 'meta.json'))
+    again = manager.load_csv(path)
+    assert_same_frame(first, parsed(path))
+    assert_same_frame(again, parsed(path))
+    # Later loads map the stored columns read-only instead of parsing text
+    assert not again['Close'].to_numpy().flags.writeable
+    assert dataset_key(again['Close'])[0] is not None
+
+
+def test_store_follows_csv_changes(folder):
+    path = str(folder / 'AAA_1Y_1h.csv')
+    manager = DataManager(str(folder))
+    assert len(manager.load_csv(path)) == 2000
+    synthetic_ohlcv(1500, seed=9, freq='h').to_csv(path)
+    df = manager.load_csv(path)
+    assert len(df) == 1500
+    assert_same_frame(df, parsed(path))
+
+
+def test_half_built_store_is_ignored(folder):
+    path = str(folder / 'AAA_1Y_1h.csv')
+    manager = DataManager(str(folder))
+    manager.load_csv(path)
+    os.remove(os.path.join(manager.store_path(path), 'meta.json'))
+    os.remove(os.path.join(manager.store_path(path), 'col0.npy'))
+    assert_same_frame(manager.load_csv(path), parsed(path))
+
+
+@pytest.mark.parametrize('start,end', RANGES)
+@pytest.mark.parametrize('name', ['AAA_1Y_1h.csv', 'NY_1Y_1h.csv'])
+def test_load_range_matches_loc(folder, name, start, end):
+    path = str(folder / name)
+    manager = DataManager(str(folder))
+    expected = parsed(path).loc[start:end]
+    # Before and after the store exists
+    for _ in range(2):
+        pd.testing.assert_frame_equal(manager.load_range(path, start, end), expected)
+
+
+def test_catalog_is_lazy(folder):
+    manager = DataManager(str(folder))
+    entries = manager.catalog()
+    assert sorted(entries) == ['AAA_1Y_1h.csv', 'AAA_2Y_1d.csv', 'NY_1Y_1h.csv']
+    assert entries['AAA_2Y_1d.csv']['interval'] == '1d'
+    assert entries['AAA_1Y_1h.csv']['rows'] is None
+    assert not os.path.exists(folder / STORE_DIRNAME)
+
+    data = load_data(str(folder))
+    assert sorted(data) == ['AAA', 'NY'] and 'AAA' in data
+    assert not os.path.exists(folder / STORE_DIRNAME)
+    # The larger AAA file is used; loading it fills in its catalog entry
+    assert len(data['AAA']) == 2000
+    assert manager.catalog()['AAA_1Y_1h.csv']['rows'] == 2000
+    assert len(data.load('NY', '2000-04-01', '2000-04-02')) == 48
+    assert str(data['NY'].index.tz) == 'UTC'
+    assert manager.resolve('aaa', '1d') == str(folder / 'AAA_2Y_1d.csv')
+    with pytest.raises(KeyError):
+        manager.load('ZZZ')
+
+
+@pytest.mark.parametrize('windows', [
+    RANGES[1:3],
+    RANGES[3:6],
+    [('2000-01-05', '2000-01'), ('2000-01-31 23:00', '2000-01-31 23:00')],
+    [('2000-01-10', '2000-01-12'), ('2000-01-05 10:30', '2000-01-06')],
+    RANGES,
+])
+def test_covering_range_spans_windows(folder, windows):
+    df = parsed(str(folder / 'AAA_1Y_1h.csv'))
+    start, end = covering_range(windows)
+    rows = [df.loc[lo:hi].index for lo, hi in windows]
+    rows = [idx for idx in rows if len(idx)]
+    covered = df.loc[start:end].index
+    assert covered[0] == min(idx[0] for idx in rows)
+    assert covered[-1] == max(idx[-1] for idx in rows)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from indicator_cache import IndicatorCache, dataset_key
+from strategies import MACDStrategy, RSIStrategy
+from tests.helpers import MACD_PARAMS, read_only_frame, synthetic_ohlcv
+
+
+def read_only_series(seed, n=500):
+    index = pd.date_range('2020-01-01', periods=n, freq='h')
+    return read_only_frame(pd.DataFrame({'Close': np.random.default_rng(seed).normal(100, 1, n)}, index=index))['Close']
+
+
+def test_cached_indicators_match_direct():
+    data = read_only_frame(synthetic_ohlcv(3000, seed=4, freq='h'))
+    cache = IndicatorCache()
+    close = data['Close']
+    pd.testing.assert_series_equal(cache.ema(close, 12), close.ewm(span=12).mean())
+    assert cache.ema(data['Close'], 12) is cache.ema(close, 12)
+    assert cache.stats()['hits'] == 2
+
+    shared = MACDStrategy(cache)
+    for params in [MACD_PARAMS, {**MACD_PARAMS, 'MACD Signal Smoothing': 5}]:
+        np.testing.assert_array_equal(
+            np.asarray(shared.generate_signals(data, params)),
+            np.asarray(MACDStrategy(IndicatorCache()).generate_signals(data, params)),
+        )
+    assert cache.stats()['hits'] > 2
+
+
+def test_views_of_the_same_rows_share_entries():
+    data = read_only_frame(synthetic_ohlcv(1000, seed=4, freq='h'))
+    assert dataset_key(data['Close'])[0] == dataset_key(data['Close'].iloc[:])[0]
+    assert dataset_key(data['Close'])[0] != dataset_key(data['Close'].iloc[:500])[0]
+    assert dataset_key(data['Close'])[0] != dataset_key(data['Open'])[0]
+
+
+def test_frames_changed_in_place_are_not_served_stale():
+    data = synthetic_ohlcv(3000, seed=4, freq='h')
+    strategy = MACDStrategy()
+    before = np.asarray(strategy.generate_signals(data, MACD_PARAMS))
+    data.loc[:, 'Close'] = data['Close'].to_numpy()[::-1]
+    after = np.asarray(strategy.generate_signals(data, MACD_PARAMS))
+    expected = np.asarray(MACDStrategy(IndicatorCache()).generate_signals(data.copy(), MACD_PARAMS))
+    np.testing.assert_array_equal(after, expected)
+    assert not np.array_equal(before, after)
+
+    # Writable data is computed every time and never stored
+    cache = IndicatorCache()
+    cache.ema(data['Close'], 10)
+    cache.ema(data['Close'], 10)
+    assert cache.stats()['entries'] == 0 and cache.stats()['hits'] == 0
+    assert dataset_key(data['Close']) == (None, None)
+
+
+def test_extension_dtypes_are_keyed_by_content():
+    index = pd.date_range('2020-01-01', periods=300, freq='h')
+    cache = IndicatorCache()
+    seen = []
+    for seed in range(5):
+        # A fresh temporary copy per series can reuse the previous address
+        values = np.random.default_rng(seed).normal(100, 1, 300)
+        series = pd.Series(values, index=index, dtype='Float64')
+        seen.append(cache.ema(series, 10).to_numpy(dtype=float))
+        np.testing.assert_allclose(seen[-1], series.astype(float).ewm(span=10).mean().to_numpy())
+    assert cache.stats()['misses'] == 5
+    same = pd.Series(np.random.default_rng(0).normal(100, 1, 300), index=index, dtype='Float64')
+    np.testing.assert_array_equal(cache.ema(same, 10).to_numpy(dtype=float), seen[0])
+    assert cache.stats()['hits'] == 1
+
+
+def test_entries_pin_their_data():
+    cache = IndicatorCache()
+    results = []
+    for seed in range(20):
+        series = read_only_series(seed)
+        results.append((seed, cache.ema(series, 10).iloc[-1]))
+        del series
+    assert cache.stats()['misses'] == 20
+    for seed, last in results:
+        assert read_only_series(seed).ewm(span=10).mean().iloc[-1] == last
+
+
+def test_memory_budget_counts_pinned_data():
+    data = read_only_frame(synthetic_ohlcv(10000, seed=4, freq='h'))
+    column = 10000 * 8
+    # The pinned Close array plus two cached series
+    cache = IndicatorCache(max_bytes=3 * column)
+    for span in range(5, 15):
+        cache.ema(data['Close'], span)
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['nbytes'] == 3 * column
+    assert stats['evictions'] == 8
+
+    # Pinned arrays are released with their last entry
+    for seed in range(3):
+        cache.ema(read_only_series(seed, 10000), 5)
+    assert cache.stats()['nbytes'] <= cache.max_bytes
+    assert len(cache._owners) == 1
+    cache.clear()
+    assert cache.stats()['nbytes'] == 0 and not cache._owners
+
+    # Data larger than the budget is never pinned
+    small = IndicatorCache(max_bytes=column)
+    small.ema(data['Close'], 5)
+    assert small.stats()['entries'] == 0
+    RSIStrategy(small).generate_signals(data, {'RSI Period': 14, 'RSI Overbought': 70, 'RSI Oversold': 30})
+    assert small.stats()['nbytes'] == 0
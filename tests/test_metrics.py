@@ -0,0 +1,103 @@
+import math
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtester import TRADE_DTYPE
+from metrics import RISK_METRICS, bars_per_year, equity_metrics, profit_factor
+
+CAPITAL = 10000.0
+
+
+def reference(eq, capital, ppy):
+    """Bar-by-bar computation of the metrics, for comparison."""
+    peak, max_dd, max_dd_frac, run, max_run = capital, 0.0, 0.0, 0, 0
+    rets, prev = [], capital
+    for value in eq:
+        peak = max(peak, value)
+        max_dd = max(max_dd, peak - value)
+        max_dd_frac = max(max_dd_frac, (peak - value) / peak)
+        run = run + 1 if value < peak else 0
+        max_run = max(max_run, run)
+        rets.append(value / prev - 1)
+        prev = value
+    r = np.array(rets)
+    annual = (eq[-1] / capital) ** (ppy / (len(eq) - 1)) - 1
+    return {
+        'max_drawdown_val': max_dd,
+        'max_drawdown_pct': max_dd_frac * 100,
+        'max_drawdown_bars': max_run,
+        'annual_return_pct': annual * 100,
+        'sharpe': r.mean() / r.std(ddof=1) * math.sqrt(ppy),
+        'sortino': r.mean() / math.sqrt(np.mean(np.minimum(r, 0) ** 2)) * math.sqrt(ppy),
+        'calmar': annual / max_dd_frac,
+    }
+
+
+@pytest.fixture(scope='module')
+def curves():
+    rng = np.random.default_rng(3)
+    matrix = CAPITAL * np.exp(np.cumsum(rng.normal(0.0002, 0.01, (3000, 5)), axis=0))
+    index = pd.date_range('2020-01-01', periods=3000, freq='D')
+    return matrix, index
+
+
+def test_matches_reference(curves):
+    matrix, index = curves
+    ppy = bars_per_year(index)
+    assert ppy == pytest.approx(365.25)
+    for j in range(matrix.shape[1]):
+        got = equity_metrics(matrix[:, j], capital=CAPITAL, index=index)
+        for name, value in reference(matrix[:, j], CAPITAL, ppy).items():
+            assert got[name] == pytest.approx(value), name
+
+
+def test_matrix_matches_single_curves(curves):
+    matrix, index = curves
+    together = equity_metrics(matrix, capital=CAPITAL, index=index)
+    for j in range(matrix.shape[1]):
+        alone = equity_metrics(matrix[:, j], capital=CAPITAL, index=index)
+        for name in RISK_METRICS:
+            np.testing.assert_allclose(together[name][j], alone[name], err_msg=name)
+
+
+def test_annual_return_spans_bar_intervals():
+    # 365 daily values are 364 bar intervals; the capital doubles over them
+    eq = CAPITAL * 2.0 ** (np.arange(365) / 364)
+    by_rate = equity_metrics(eq, capital=CAPITAL, periods_per_year=364)
+    assert by_rate['annual_return_pct'] == pytest.approx(100.0)
+    index = pd.date_range('2021-01-01', periods=len(eq), freq='D')
+    by_index = equity_metrics(eq, capital=CAPITAL, index=index)
+    assert by_index['annual_return_pct'] == pytest.approx((2.0 ** (365.25 / 364) - 1) * 100)
+
+
+def test_short_spans_do_not_overflow():
+    index = pd.date_range('2021-01-04 09:30', periods=30, freq='min')
+    eq = np.linspace(CAPITAL, 3 * CAPITAL, 30)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        out = equity_metrics(eq, capital=CAPITAL, index=index)
+        one = equity_metrics(eq[:1], capital=CAPITAL)
+        flat = equity_metrics(np.full(100, CAPITAL), capital=CAPITAL)
+        ruined = equity_metrics(np.array([CAPITAL, 0.0, 0.0]), capital=CAPITAL, periods_per_year=252)
+    assert out['annual_return_pct'] == math.inf
+    assert out['calmar'] == math.inf
+    assert math.isnan(equity_metrics(eq[:2], capital=CAPITAL, index=index[:1].repeat(2))['annual_return_pct'])
+    assert one['annual_return_pct'] == pytest.approx(0.0)
+    assert flat['max_drawdown_pct'] == flat['sharpe'] == flat['sortino'] == flat['annual_return_pct'] == 0.0
+    assert ruined['annual_return_pct'] == -100.0 and ruined['max_drawdown_pct'] == 100.0
+
+
+def test_trade_log_metrics():
+    log = np.zeros(3, dtype=TRADE_DTYPE)
+    log['entry_bar'] = [0, 10, 50]
+    log['exit_bar'] = [5, 30, 60]
+    log['pnl'] = [100.0, -40.0, 60.0]
+    out = equity_metrics(np.full(100, CAPITAL), capital=CAPITAL, trade_logs=log)
+    assert out['profit_factor'] == pytest.approx(4.0)
+    assert out['exposure_pct'] == pytest.approx(35.0)
+    assert profit_factor(10.0, 0.0) == math.inf and profit_factor(0.0, 0.0) == 0.0
+    with pytest.raises(ValueError):
+        equity_metrics(np.full((100, 2), CAPITAL), trade_logs=[log])
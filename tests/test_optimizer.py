@@ -0,0 +1,213 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from skopt import Optimizer
+
+import optimizer
+from backtester import Backtester
+from optimizer import SCORE_CAP, BayesianOptimizer, random_search, trial_score, walk_forward, walk_forward_windows
+from strategies import RSIStrategy, StrategyTemplate
+from tests.helpers import RSI_PARAMS, synthetic_ohlcv
+
+
+@pytest.fixture(scope='module')
+def data():
+    return synthetic_ohlcv(5000, seed=7, freq='h')
+
+
+def test_pruned_run_ranks_below_completed_loss(data):
+    completed = Backtester().run(data, RSIStrategy(), RSI_PARAMS)
+    pruned = Backtester(max_drawdown_pct=1).run(data, RSIStrategy(), RSI_PARAMS)
+    assert not completed['pruned'] and pruned['pruned']
+    # The pruned run stopped with the smaller loss, yet must rank last
+    assert completed['net_profit'] < pruned['net_profit'] < 0
+    assert trial_score(pruned, 'net_profit') < trial_score(completed, 'net_profit')
+    assert trial_score(pruned, 'net_profit', 10.0) == trial_score(pruned, 'net_profit') - 10.0
+    worst = {**completed, 'net_profit': float('-inf')}
+    assert trial_score(pruned, 'net_profit') < trial_score(worst, 'net_profit') == -SCORE_CAP
+
+
+def test_random_search_ranks_pruned_trials_last(data):
+    space = {
+        'RSI Period': {'type': 'int', 'default': 14, 'bounds': (5, 30)},
+        'RSI Overbought': {'type': 'int', 'default': 70, 'bounds': (60, 90)},
+        'RSI Oversold': {'type': 'int', 'default': 30, 'bounds': (10, 40)},
+    }
+    random.seed(0)
+    bt = Backtester(max_drawdown_pct=1, keep_curve=False, keep_trades=False)
+    ranked = random_search(bt, data, RSIStrategy(), space, n_trials=40, batch_size=10)
+    pruned = ranked['score'] < -SCORE_CAP
+    assert 0 < pruned.sum() < len(ranked)
+    # Completed trials come first, whatever their score
+    assert not pruned[:(~pruned).sum()].any()
+
+
+# Long while close is above its EMA, flat otherwise
+EMA_PINE = '''//@version=5
+strategy("ema_trend", overlay=true)
+len = input.int(title="Len", defval=20, minval=5, maxval=60)
+m = ta.ema(close, len)
+if (close > m)
+    strategy.entry("Long", strategy.long)
+if (close < m)
+    strategy.close("Long")
+'''
+EMA_SPACE = {'Len': {'type': 'int', 'default': 20, 'bounds': (5, 60)}}
+
+
+@pytest.mark.parametrize('anchored', [False, True])
+def test_walk_forward_windows_are_disjoint(anchored):
+    index = synthetic_ohlcv(1000, freq='h').index
+    windows = walk_forward_windows(index, 300, 200, anchored)
+    assert len(windows) == 4
+    assert windows[-1][3] == index[-1]
+    for i, (tr_lo, tr_hi, te_lo, te_hi) in enumerate(windows):
+        # Training ends on the bar before its test window starts
+        assert index.get_loc(te_lo) == index.get_loc(tr_hi) + 1
+        if anchored:
+            assert tr_lo == index[0]
+        else:
+            assert index.get_loc(tr_hi) - index.get_loc(tr_lo) + 1 == 300
+        if i:
+            assert index.get_loc(te_lo) == index.get_loc(windows[i - 1][3]) + 1
+
+
+def test_walk_forward_matches_direct_backtests(tmp_path):
+    (tmp_path / 'ema_trend.pine').write_text(EMA_PINE)
+    df = synthetic_ohlcv(1500, seed=3, freq='h')
+    folds, equity = walk_forward(
+        ['AAA'], 500, 250, str(tmp_path), workers=2, n_initial=3, n_calls=5,
+        use_cache=False, data={'AAA': df}
+    )
+    assert len(folds) == 4
+    tmpl = StrategyTemplate('ema_trend', EMA_PINE)
+    bt = Backtester()
+    curve = equity[('AAA', 'ema_trend')]
+    # One value per out-of-sample bar, with no gaps or repeats
+    assert curve.index.equals(df.index[500:])
+    level = bt.capital
+    for fold in folds.itertuples():
+        assert type(fold.best_params['Len']) is int
+        train = df.loc[fold.train_start:fold.train_end]
+        test = df.loc[fold.test_start:fold.test_end]
+        assert train.index[-1] < test.index[0]
+        assert (fold.train_bars, fold.test_bars) == (len(train), len(test))
+        direct = bt.run(test, tmpl.compile(), fold.best_params)
+        assert fold.test_net_profit == direct['net_profit']
+        assert fold.test_total_trades == direct['total_trades']
+        # Each fold's curve carries on from the previous fold's final equity
+        seg = curve.loc[fold.test_start:fold.test_end].to_numpy()
+        np.testing.assert_allclose(seg[:-1] / level, direct['equity_curve'][:len(test) - 1] / bt.capital)
+        np.testing.assert_allclose(seg[-1] / level, direct['equity_curve'][-1] / bt.capital)
+        level = seg[-1]
+
+    folds.to_csv(tmp_path / 'wf_folds.csv', index=False)
+    saved = pd.read_csv(tmp_path / 'wf_folds.csv')
+    assert all(p.startswith("{'Len': ") and 'np.' not in p for p in saved['best_params'])
+
+
+class RecordingBacktester(Backtester):
+    """Notes the bars and candidates of every run_batch call (one per rung)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rungs = []
+
+    def run_batch(self, data, strategy, param_sets):
+        self.rungs.append((len(data), list(param_sets)))
+        return super().run_batch(data, strategy, param_sets)
+
+
+def assert_halving(rungs, n_bars, eta, s):
+    """Rung i of a bracket with s + 1 rungs: n_bars / eta**(s - i) bars, 1/eta of the candidates kept."""
+    for i, (bars, candidates) in enumerate(rungs):
+        assert bars == (n_bars if i == s else int(n_bars / eta ** (s - i)))
+        if i:
+            prev = rungs[i - 1][1]
+            assert len(candidates) == max(1, len(prev) // eta)
+            assert all(c in prev for c in candidates)
+
+
+def full_score(template, df, params):
+    return trial_score(Backtester().run(df, template.compile(), params), 'net_profit')
+
+
+def test_successive_halving_budget(data):
+    df = data.iloc[:810]
+    tmpl = StrategyTemplate('ema_trend', EMA_PINE, EMA_SPACE)
+    bt = RecordingBacktester()
+    opt = BayesianOptimizer(bt, df, random_state=1)
+    best_params, best_score = opt.optimize_multifidelity(tmpl, n_candidates=27, eta=3)
+    # min_bars defaults to 810 // 3**3, so 27 candidates run on 30, 90, 270, 810 bars
+    assert [(bars, len(c)) for bars, c in bt.rungs] == [(30, 27), (90, 9), (270, 3), (810, 1)]
+    assert_halving(bt.rungs, 810, 3, 3)
+    assert opt.last_run['bar_evaluations'] == 30 * 27 + 90 * 9 + 270 * 3 + 810
+    assert opt.last_run['full_bar_evaluations'] == 27 * 810
+    assert bt.rungs[-1][1] == [best_params]
+    assert best_score == full_score(tmpl, df, best_params)
+
+
+def test_hyperband_brackets(data):
+    df = data.iloc[:810]
+    tmpl = StrategyTemplate('ema_trend', EMA_PINE, EMA_SPACE)
+    bt = RecordingBacktester()
+    opt = BayesianOptimizer(bt, df, random_state=1)
+    best_params, best_score = opt.optimize_multifidelity(tmpl, eta=3, hyperband=True)
+    # Brackets s = 3..0 start 27, 12, 6 and 4 candidates on 30, 90, 270 and 810 bars
+    brackets, rungs = [], bt.rungs
+    for s in range(3, -1, -1):
+        brackets.append(rungs[:s + 1])
+        rungs = rungs[s + 1:]
+        assert_halving(brackets[-1], 810, 3, s)
+    assert not rungs
+    assert [len(b[0][1]) for b in brackets] == [27, 12, 6, 4]
+    assert opt.last_run['n_trials'] == 27 + 12 + 6 + 4
+    assert opt.last_run['bar_evaluations'] == sum(bars * len(c) for bars, c in bt.rungs)
+    # The winner is the best full-data score over all brackets
+    finalists = [c for b in brackets for c in b[-1][1]]
+    assert best_params in finalists
+    assert best_score == max(full_score(tmpl, df, p) for p in finalists)
+    assert best_score == full_score(tmpl, df, best_params)
+
+
+class CountingOptimizer(Optimizer):
+    """skopt Optimizer that keeps the size of every batch told to it."""
+    told = []
+
+    def tell(self, x, y, fit=True):
+        CountingOptimizer.told.append(len(y))
+        return super().tell(x, y, fit)
+
+
+@pytest.mark.filterwarnings('ignore:The objective has been evaluated')
+def test_batched_is_reproducible_and_respects_n_calls(data, monkeypatch):
+    monkeypatch.setattr(optimizer, 'Optimizer', CountingOptimizer)
+    tmpl = StrategyTemplate('ema_trend', EMA_PINE, EMA_SPACE)
+    bt = Backtester(keep_curve=False, keep_trades=False)
+    runs = []
+    for _ in range(2):
+        CountingOptimizer.told = []
+        runs.append(BayesianOptimizer(bt, data.iloc[:1000], random_state=3).optimize(
+            tmpl, n_initial=5, n_calls=7, batch_size=3, workers=2
+        ))
+        # The last batch is cut short so exactly n_calls candidates are scored
+        assert CountingOptimizer.told == [3, 3, 1]
+    assert runs[0] == runs[1]
+
+
+@pytest.mark.filterwarnings('ignore:The objective has been evaluated')
+def test_batched_best_is_close_to_sequential(data):
+    df = data.iloc[:1000]
+    tmpl = StrategyTemplate('ema_trend', EMA_PINE, EMA_SPACE)
+    bt = Backtester(keep_curve=False, keep_trades=False)
+    report = BayesianOptimizer(bt, df, random_state=3).compare_modes(
+        tmpl, n_initial=5, n_calls=12, batch_size=3, workers=2
+    )
+    assert report['speedup'] == report['sequential']['wall_time'] / report['batched']['wall_time']
+    # Every Len value scored directly gives the spread of the objective
+    strat = tmpl.compile()
+    scores = [trial_score(bt.run(df, strat, {'Len': n}), 'net_profit') for n in range(5, 61)]
+    gap = abs(report['batched']['best_score'] - report['sequential']['best_score'])
+    assert gap <= 0.1 * (max(scores) - min(scores))
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from optimizer import searchable_templates
+from pine_compiler import PineCompileError, compile_pine, logical_lines, mask_strings
+from strategies import StrategyTemplate
+from template_manager import TemplateManager
+from tests.helpers import synthetic_ohlcv
+
+KEYWORD_PINE = '''//@version=5
+strategy("kw // not a comment", overlay=true)
+fast = input.int(title="Fast", defval=10, minval=2, maxval=30)
+slow = input.int(title="Slow", defval=40, minval=31, maxval=100)
+tp = input.float(title="TP", defval=2.0, minval=0.5, maxval=5.0, step=0.5)
+f = ta.ema(close, fast)
+s = ta.ema(close, slow)
+if (ta.crossover(f, s))
+    strategy.entry("Long", strategy.long)
+if (ta.crossunder(f, s))
+    strategy.close("Long")
+strategy.exit("x", from_entry="Long", profit=tp / 100 * close, loss=tp / 200 * close)
+'''
+
+POSITIONAL_PINE = '''//@version=5
+strategy("pos", overlay=true)
+fast = input.int(10, "Fast", minval=2, maxval=30)
+slow = input.int(40, "Slow")
+f = ta.ema(close, fast)
+s = ta.ema(close, slow)
+if (ta.crossover(f, s))
+    strategy.entry("Long", strategy.long)
+if (ta.crossunder(f, s))
+    strategy.close("Long")
+'''
+
+UNBOUNDED_PINE = POSITIONAL_PINE.replace(', minval=2, maxval=30', '')
+
+
+def test_keyword_inputs():
+    space = compile_pine(KEYWORD_PINE).param_space()
+    assert space == {
+        'Fast': {'type': 'int', 'default': 10, 'bounds': (2, 30), 'step': None},
+        'Slow': {'type': 'int', 'default': 40, 'bounds': (31, 100), 'step': None},
+        'TP': {'type': 'float', 'default': 2.0, 'bounds': (0.5, 5.0), 'step': 0.5},
+    }
+
+
+def test_positional_inputs():
+    space = compile_pine(POSITIONAL_PINE).param_space()
+    assert space['Fast']['default'] == 10 and space['Fast']['bounds'] == (2, 30)
+    assert space['Slow']['default'] == 40 and space['Slow']['bounds'] is None
+
+
+def test_signals_match_pandas():
+    data = synthetic_ohlcv(3000, seed=5, freq='h')
+    params = {'Fast': 8, 'Slow': 35}
+    signals = StrategyTemplate('pos', POSITIONAL_PINE).compile().generate_signals(data, params)
+
+    fast = data['Close'].ewm(span=8).mean()
+    slow = data['Close'].ewm(span=35).mean()
+    up = (fast > slow) & (fast.shift(1) <= slow.shift(1))
+    down = (fast < slow) & (fast.shift(1) >= slow.shift(1))
+    expected = np.where(down, -1, np.where(up, 1, 0))
+    np.testing.assert_array_equal(np.asarray(signals), expected)
+    assert (expected == 1).any() and (expected == -1).any()
+
+
+def test_exit_levels():
+    data = synthetic_ohlcv(500, seed=5, freq='h')
+    strategy = StrategyTemplate('kw', KEYWORD_PINE).compile()
+    assert strategy.has_exit_levels
+    signals, (profit, loss) = strategy.generate_orders(data, {'Fast': 5, 'Slow': 40, 'TP': 2.0})
+    close = data['Close'].to_numpy()
+    np.testing.assert_allclose(profit, 0.02 * close)
+    np.testing.assert_allclose(loss, 0.01 * close)
+    assert not StrategyTemplate('pos', POSITIONAL_PINE).compile().has_exit_levels
+
+
+def test_string_contents_are_not_code():
+    masked, open_string = mask_strings('x = "a // (\\" b" + \'[\'')
+    assert masked == 'x = "          " + \' \''
+    assert not open_string
+    assert mask_strings('title = "unterminated (')[1]
+    # The '//' and '(' inside the strategy() title neither cut the line nor open a bracket
+    assert logical_lines(KEYWORD_PINE)[0] == (2, 0, 'strategy("kw // not a comment", overlay=true)')
+
+
+@pytest.mark.parametrize('source,message', [
+    ('//@version=5\nstrategy("x")\nfor i = 0 to 10\n    x = i\n', 'unsupported'),
+    ('//@version=5\nstrategy("x")\nx = ta.ema(close, 10\n', 'unbalanced'),
+    ('//@version=5\nstrategy("x")\nx = close\n', 'no strategy.entry'),
+])
+def test_unsupported_scripts(source, message):
+    with pytest.raises(PineCompileError, match=message):
+        compile_pine(source)
+
+
+def test_templates_without_bounds_are_skipped(tmp_path, capsys):
+    for name, code in [('kw', KEYWORD_PINE), ('pos', POSITIONAL_PINE), ('flat', UNBOUNDED_PINE)]:
+        (tmp_path / f'{name}.pine').write_text(code)
+    manager = TemplateManager(str(tmp_path), workers=1)
+    by_name = {t.name: t for t in manager.templates}
+    assert by_name['pos'].param_space['Fast']['bounds'] == (2, 30)
+    assert by_name['flat'].param_space['Fast']['bounds'] is None
+
+    kept = searchable_templates(sorted(manager.templates, key=lambda t: t.name))
+    assert [t.name for t in kept] == ['kw', 'pos']
+    assert 'skipping template flat' in capsys.readouterr().out
+
+
+def test_repo_template_inputs():
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'strategies', 'strat1.pine')
+    with open(path, encoding='utf-8') as f:
+        space = compile_pine(f.read()).param_space()
+    assert space['Fast EMA Period']['default'] == 50
+    assert space['Take Profit %'] == {'type': 'float', 'default': 2.0, 'bounds': None, 'step': 0.1}
+    assert len(space) == 11
@@ -0,0 +1,98 @@
+import re
+
+import numpy as np
+import pytest
+
+from pine_injector import inject_pine_script, inject_pine_scripts
+from strategies import StrategyTemplate
+
+KEYWORD_PINE = '''//@version=5
+strategy("kw", overlay=true)
+fast = input.int(title="Fast (EMA)", defval=12, minval=2, maxval=50)
+slow = input.int( title='Slow', defval = 26, minval=5, maxval=200)
+mult = input.float(title="Mult", defval=2.5, minval=0.5, maxval=5.0)
+src = input.source(title="Src", defval=close)
+on = input.bool(title="On", defval=true)
+again = input.int(title="Fast (EMA)", defval=12)
+plot(ta.ema(src, fast) - ta.ema(src, slow) * mult)
+'''
+
+POSITIONAL_PINE = '''//@version=5
+strategy("pos", overlay=true)
+length = input.int(14, "RSI Period", minval=2)
+ob = input.int( 70 , 'RSI Overbought')
+os = INPUT.INT(-30, "RSI Oversold")
+mult = input.float(2.5, "Mult [x]", step=0.1)
+dup = input.float(.5, "Mult [x]")
+flag = input.bool(true, "Flag")
+'''
+
+PARAMS = [
+    {},
+    {'Fast (EMA)': 8, 'Slow': 40, 'Mult': 1.25},
+    {'Fast (EMA)': np.int64(9), 'Mult': np.float64(3.0), 'Src': 'hl2', 'On': 'false'},
+    {'Slow': -3, 'Unknown': 7},
+    {'RSI Period': 21, 'RSI Overbought': 80.6, 'RSI Oversold': -25, 'Mult [x]': 1},
+    {'RSI Period': np.int64(5), 'Mult [x]': np.float32(0.25), 'Flag': 1},
+]
+
+
+def baseline_inject(script, params):
+    """inject_pine_script as of 261dd64, verbatim."""
+    pattern = re.compile(
+        r"(input\.(?P<type>int|float)\(\s*)(?P<default>[-\d\.]+)(\s*,\s*['\"](?P<name>[^'\"]+)['\"])",
+        flags=re.IGNORECASE
+    )
+
+    def repl(match):
+        prefix = match.group(1)
+        val_type = match.group('type')
+        name = match.group('name')
+        suffix = match.group(4)
+        if name in params:
+            new_val = params[name]
+            if val_type.lower() == 'int':
+                new_default = str(int(round(new_val)))
+            else:
+                new_default = str(float(new_val))
+            return f"{prefix}{new_default}{suffix}"
+        return match.group(0)
+
+    return pattern.sub(repl, script)
+
+
+def baseline_instantiate(code, params):
+    """
+    StrategyTemplate.instantiate as of 261dd64. Its replacement was
+    rf"\\1{val}", which reads a value starting with a digit as a group
+    number (\\112); \\g<1> is what it meant.
+    """
+    for title, val in params.items():
+        pattern = (
+            rf"(input\.[^\(]*\(\s*title=['\"]{re.escape(title)}['\"][^,]*,\s*defval=)([^,\)]+)"
+        )
+        code = re.sub(pattern, rf"\g<1>{val}", code)
+    return code
+
+
+@pytest.mark.parametrize('params', PARAMS)
+@pytest.mark.parametrize('script', [KEYWORD_PINE, POSITIONAL_PINE], ids=['keyword', 'positional'])
+def test_instantiate_matches_baseline(script, params):
+    tmpl = StrategyTemplate('t', script, {})
+    assert tmpl.instantiate(params) == baseline_instantiate(script, params)
+    assert inject_pine_script(script, params) == baseline_inject(script, params)
+
+
+@pytest.mark.parametrize('script', [KEYWORD_PINE, POSITIONAL_PINE], ids=['keyword', 'positional'])
+def test_batch_forms_match_baseline(script):
+    tmpl = StrategyTemplate('t', script, {})
+    assert tmpl.instantiate_many(PARAMS) == [baseline_instantiate(script, p) for p in PARAMS]
+    assert inject_pine_scripts(script, PARAMS) == [baseline_inject(script, p) for p in PARAMS]
+
+
+def test_both_styles_are_exercised():
+    # Each reference rewrites its own style of template, so neither comparison is vacuous
+    assert baseline_instantiate(KEYWORD_PINE, PARAMS[1]) != KEYWORD_PINE
+    assert baseline_inject(POSITIONAL_PINE, PARAMS[4]) != POSITIONAL_PINE
+    assert 'defval=1.25,' in StrategyTemplate('t', KEYWORD_PINE, {}).instantiate(PARAMS[1])
+    assert 'INPUT.INT(-25, "RSI Oversold")' in inject_pine_script(POSITIONAL_PINE, PARAMS[4])
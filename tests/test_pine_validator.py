@@ -0,0 +1,56 @@
+import pytest
+
+from pine_validator import check_pine, format_issues, is_valid
+
+VALID_PINE = '''//@version=5
+strategy("Crossover \\"fast\\" // slow (", overlay=true)
+fast = input.int(title="Fast", defval=10, minval=2, maxval=30)
+slow = input.int(20, "Slow", minval=5)
+f = ta.ema(close, fast)
+s = ta.ema(close, slow)
+if (ta.crossover(f, s))
+    strategy.entry("Long", strategy.long)
+if (ta.crossunder(f, s))
+    strategy.close("Long")
+plot(f, title="EMA (fast)")
+'''
+
+
+def codes(source):
+    return [(issue.line, issue.code) for issue in check_pine(source)]
+
+
+def test_valid_script():
+    issues = check_pine(VALID_PINE)
+    assert is_valid(issues), format_issues(issues)
+    assert issues == []
+
+
+@pytest.mark.parametrize('old,new,expected', [
+    ('//@version=5\n', '', (1, 'version')),
+    ('//@version=5\n', '//@version=4\n', (1, 'version')),
+    ('strategy("Crossover', 'indicator("Crossover', (2, 'declaration')),
+    ('ta.ema(close, fast)', 'ta.emaa(close, fast)', (5, 'ta')),
+    ('ta.ema(close, slow)', 'ta.ema(close, slow', (6, 'brackets')),
+    ('title="Fast", defval=10', 'title="Fast", defval=10, maxval=1', (3, 'input')),
+    ('s = ta.ema(close, slow)', 's = ta.ema(close, slowest)', (6, 'undefined')),
+    ('plot(f, title="EMA (fast)")', 'plot(f, title="EMA (fast)', (11, 'string')),
+])
+def test_errors(old, new, expected):
+    source = VALID_PINE.replace(old, new, 1)
+    assert source != VALID_PINE
+    issues = check_pine(source)
+    assert expected in [(i.line, i.code) for i in issues], format_issues(issues)
+    assert not is_valid(issues)
+
+
+def test_escaped_quotes_keep_strings_closed():
+    source = VALID_PINE.replace('"EMA (fast)"', '"EMA \\"(\\" fast"')
+    assert codes(source) == []
+
+
+def test_missing_entry_is_a_warning():
+    source = VALID_PINE.replace('    strategy.entry("Long", strategy.long)\n', '    strategy.close("Long")\n')
+    issues = check_pine(source)
+    assert [(i.code, i.severity) for i in issues] == [('entry', 'warning')]
+    assert is_valid(issues)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from portfolio import PortfolioBacktester, align_frames
+from strategies import MACDStrategy, StrategyTemplate
+from tests.helpers import MACD_PARAMS, synthetic_ohlcv
+
+EXIT_PINE = '''//@version=5
+strategy("exit", overlay=true)
+tp = input.float(title="TP", defval=1.0, minval=0.1, maxval=5.0)
+if (close > ta.ema(close, 20))
+    strategy.entry("Long", strategy.long)
+strategy.exit("x", from_entry="Long", profit=tp / 100 * close, loss=tp / 100 * close)
+'''
+
+
+@pytest.mark.parametrize('settings', [{}, {'max_day': 1, 'max_week': 3}, {'margin': 300, 'slippage': 0.01}])
+def test_single_symbol_matches_backtester(settings):
+    data = synthetic_ohlcv(5000, seed=1, freq='h')
+    single = Backtester(**settings).run(data, MACDStrategy(), MACD_PARAMS)
+    portfolio = PortfolioBacktester(**settings).run({'AAA': data}, MACDStrategy(), MACD_PARAMS)
+    assert single['total_trades'] > 0
+    for key, value in single.items():
+        if key in ('curve_bars', 'trade_log', 'pruned', 'pruned_reason'):
+            continue
+        if isinstance(value, np.ndarray):
+            np.testing.assert_allclose(portfolio[key], value, err_msg=key)
+        else:
+            assert portfolio[key] == pytest.approx(value), key
+
+
+def test_per_symbol_results_add_up():
+    frames = {
+        'AAA': synthetic_ohlcv(4000, seed=1, freq='h'),
+        # Starts later and only has every third bar
+        'BBB': synthetic_ohlcv(3000, seed=2, freq='h', start='2000-01-20').iloc[::3],
+        'CCC': synthetic_ohlcv(4000, seed=3, freq='h'),
+    }
+    result = PortfolioBacktester().run(frames, MACDStrategy(), MACD_PARAMS)
+    per_symbol = result['per_symbol']
+    assert list(per_symbol.index) == ['AAA', 'BBB', 'CCC']
+    assert per_symbol['net_profit'].sum() == pytest.approx(result['net_profit'])
+    assert per_symbol['total_trades'].sum() == result['total_trades']
+    close, _ = align_frames(frames)
+    assert len(result['equity_curve']) >= len(close)
+    assert result['equity_curve'][-1] == pytest.approx(10000.0 + result['net_profit'])
+
+
+def test_exit_levels_are_rejected():
+    strategy = StrategyTemplate('exit', EXIT_PINE).compile()
+    with pytest.raises(ValueError, match='exit levels'):
+        PortfolioBacktester().run({'AAA': synthetic_ohlcv(500, freq='h')}, strategy, {'TP': 1.0})
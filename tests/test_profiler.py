@@ -0,0 +1,114 @@
+import json
+import math
+import os
+import pickle
+import pstats
+import time
+
+import pytest
+
+import profiler
+from profiler import ProfileReport, Profiler, profiled_task
+from worker_pool import Task
+
+
+def work(task: Task) -> dict:
+    """Task body: 'outer' holds task.params['sleep'] seconds, half of it in 'inner'."""
+    sleep = task.params['sleep']
+    with profiler.stage('outer'):
+        time.sleep(sleep / 2)
+        with profiler.stage('inner'):
+            time.sleep(sleep / 2)
+    profiler.count('bars', 100)
+    return {'symbol': task.symbol, 'sleep': sleep}
+
+
+def test_nested_stages_and_merge():
+    prof = Profiler()
+    with prof.stage('outer'):
+        time.sleep(0.02)
+        for _ in range(2):
+            with prof.stage('inner'):
+                time.sleep(0.01)
+    prof.count('trades', 3)
+    calls, wall, self_wall, cpu = prof.stages['outer']
+    inner = prof.stages['inner']
+    assert (calls, inner[0]) == (1, 2)
+    assert wall >= 0.04 and inner[1] >= 0.02
+    # Self time excludes the nested stages
+    assert self_wall == pytest.approx(wall - inner[1])
+    assert inner[1] == inner[2]
+    assert cpu < wall
+
+    total = Profiler()
+    total.merge(prof.to_dict())
+    total.merge(prof.to_dict())
+    assert total.stages['inner'] == [4, 2 * inner[1], 2 * inner[2], 2 * inner[3]]
+    assert total.counters == {'trades': 6}
+
+
+def test_profiling_is_off_by_default():
+    assert not profiler.enabled()
+    with profiler.stage('outer'):
+        profiler.count('bars')
+    with profiler.profiling() as prof:
+        assert profiler.enabled()
+        with profiler.stage('outer'):
+            profiler.count('bars')
+    assert not profiler.enabled()
+    assert prof.stages['outer'][0] == 1 and prof.counters == {'bars': 1}
+
+
+def test_profiled_task_record():
+    task = Task('AAA', None, None, 't', {'sleep': 0.02})
+    result, record = profiled_task(work, task, cprofile=True)
+    assert result == work(task)
+    assert record['pid'] == os.getpid()
+    assert record['wall'] >= 0.02
+    stages = record['profile']['stages']
+    assert set(stages) == {'outer', 'inner', 'pickle_result'}
+    assert record['wall'] >= stages['outer'][1] >= 0.02
+    assert record['profile']['counters'] == {
+        'bars': 100, 'result_bytes': len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+    }
+    assert record['pstats'] is not None
+    assert profiled_task(work, task)[1]['pstats'] is None
+
+
+def test_report_totals_and_dump(tmp_path):
+    report = ProfileReport(top=2)
+    tasks = [Task(sym, None, None, 't', {'sleep': sleep}) for sym, sleep in [('A', 0.01), ('B', 0.05), ('C', 0.03)]]
+    records = []
+    for task in tasks:
+        _, record = profiled_task(work, task, cprofile=True)
+        report.add(task, record)
+        records.append(record)
+    with report.parent.stage('write'):
+        pass
+
+    summary = report.to_dict()
+    assert summary['tasks'] == 3 and summary['workers'] == 1
+    assert summary['task_wall'] == pytest.approx(sum(r['wall'] for r in records))
+    assert summary['counters']['bars'] == 300
+    rows = {(row['where'], row['stage']): row for row in summary['stages']}
+    assert set(rows) == {
+        ('worker', 'outer'), ('worker', 'inner'), ('worker', 'pickle_result'), ('parent', 'write')
+    }
+    for i, key in enumerate(['wall', 'self_wall', 'cpu'], start=1):
+        assert rows['worker', 'outer'][key] == pytest.approx(sum(r['profile']['stages']['outer'][i] for r in records))
+    assert rows['worker', 'outer']['calls'] == 3
+    assert rows['worker', 'inner']['pct_task_wall'] == pytest.approx(
+        rows['worker', 'inner']['self_wall'] / summary['task_wall'] * 100
+    )
+    assert math.isnan(rows['parent', 'write']['pct_task_wall'])
+    # Only the top=2 slowest tasks are kept, slowest first
+    assert [label for label, _ in report.slowest()] == ['B_t', 'C_t']
+
+    paths = report.dump(str(tmp_path))
+    assert [os.path.basename(p) for p in paths] == ['summary.json', '01_B_t.prof', '02_C_t.prof']
+    with open(paths[0]) as f:
+        assert json.load(f)['slowest'] == [{'task': label, 'wall': wall} for label, wall in report.slowest()]
+    for path in paths[1:]:
+        stats = pstats.Stats(path)
+        # The profiled work function shows up in each dump
+        assert any(func[2] == 'work' for func in stats.stats)
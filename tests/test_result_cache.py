@@ -0,0 +1,96 @@
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+import result_cache
+from backtester import Backtester
+from result_cache import ResultCache, frame_fingerprint, result_key
+from strategies import MACDStrategy
+from tests.helpers import MACD_PARAMS, read_only_frame, synthetic_ohlcv
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'results.sqlite'))
+
+
+def test_key_covers_data_params_and_settings():
+    data = synthetic_ohlcv(1000, seed=1, freq='h')
+    settings = Backtester().settings()
+    key = result_key(data, 'macd', MACD_PARAMS, settings)
+    assert key == result_key(data.copy(), 'macd', dict(MACD_PARAMS), dict(settings))
+    assert frame_fingerprint(data) == frame_fingerprint(data.copy())
+    changed = data.copy()
+    changed.iloc[500, 3] += 0.01
+    for other in [
+        result_key(changed, 'macd', MACD_PARAMS, settings),
+        result_key(data.iloc[:999], 'macd', MACD_PARAMS, settings),
+        result_key(data, 'rsi', MACD_PARAMS, settings),
+        result_key(data, 'macd', {**MACD_PARAMS, 'Fast EMA Period': 13}, settings),
+        result_key(data, 'macd', MACD_PARAMS, Backtester(max_day=1).settings()),
+        result_key(data, 'macd', MACD_PARAMS, Backtester(max_drawdown_pct=5).settings()),
+    ]:
+        assert other != key
+    # numpy scalars from the optimizer give the same key as plain values
+    assert result_key(data, 'macd', {k: np.int64(v) for k, v in MACD_PARAMS.items()}, settings) == key
+
+
+def test_backtester_reuses_results(cache):
+    data = synthetic_ohlcv(3000, seed=1, freq='h')
+    bt = Backtester(result_cache=cache)
+    first = bt.run(data, MACDStrategy(), MACD_PARAMS)
+    again = bt.run(data, MACDStrategy(), MACD_PARAMS)
+    batch = bt.run_batch(data, MACDStrategy(), [MACD_PARAMS, {**MACD_PARAMS, 'Fast EMA Period': 5}])
+    assert cache.stats()['hits'] == 2 and cache.stats()['entries'] == 2
+    for result in (again, batch[0]):
+        assert result['net_profit'] == first['net_profit']
+        np.testing.assert_array_equal(result['equity_curve'], first['equity_curve'])
+
+
+def test_frames_changed_in_place_miss(cache):
+    data = synthetic_ohlcv(3000, seed=1, freq='h')
+    bt = Backtester(result_cache=cache)
+    first = bt.run(data, MACDStrategy(), MACD_PARAMS)
+    fingerprint = frame_fingerprint(data)
+    data.loc[:, 'Close'] = data['Close'].to_numpy()[::-1]
+    assert frame_fingerprint(data) != fingerprint
+    changed = bt.run(data, MACDStrategy(), MACD_PARAMS)
+    assert cache.stats()['hits'] == 0 and cache.stats()['misses'] == 2
+    assert changed['net_profit'] != first['net_profit']
+    assert changed['net_profit'] == Backtester().run(data.copy(), MACDStrategy(), MACD_PARAMS)['net_profit']
+
+
+def test_read_only_frames_are_memoized():
+    data = read_only_frame(synthetic_ohlcv(1000, seed=1, freq='h'))
+    fingerprint = frame_fingerprint(data)
+    assert result_cache._FP_MEMO[id(data)][1] == fingerprint
+    writable = synthetic_ohlcv(1000, seed=1, freq='h')
+    assert frame_fingerprint(writable) == fingerprint
+    assert id(writable) not in result_cache._FP_MEMO
+
+
+def test_eviction_and_ttl(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_bytes=20000)
+    rng = np.random.default_rng(0)
+    for i in range(10):
+        cache.put(f'k{i}', rng.normal(size=500))
+        time.sleep(0.001)
+        # Keeps k0 recently used
+        assert cache.get('k0') is not None
+    stats = cache.stats()
+    assert stats['nbytes'] <= 20000 and 1 < stats['entries'] < 10
+    assert cache.get('k1') is None and cache.get('k9') is not None
+
+    expiring = ResultCache(str(tmp_path / 'results.sqlite'), ttl=0.05)
+    assert expiring.get('k0') is not None
+    time.sleep(0.1)
+    assert expiring.get('k0') is None
+
+
+def test_pickles_by_path(cache):
+    cache.put('k', {'net_profit': 1.5})
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy._conn is None
+    assert copy.get('k') == {'net_profit': 1.5}
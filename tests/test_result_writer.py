@@ -0,0 +1,120 @@
+import importlib.util
+import os
+
+import pytest
+
+from result_writer import ResultWriter, run_id, task_id
+
+FORMATS = [
+    ('csv', 'results.csv'),
+    ('jsonl', 'results.jsonl'),
+    pytest.param('parquet', 'results.parquet', marks=pytest.mark.skipif(
+        importlib.util.find_spec('pyarrow') is None, reason='needs pyarrow'
+    )),
+]
+
+TASKS = [{'symbol': 'AAA', 'template': f't{i}', 'start': '2020-01-01'} for i in range(25)]
+IDS = [task_id(t) for t in TASKS]
+RUN = run_id(IDS)
+
+
+class Crash(Exception):
+    pass
+
+
+def row(i):
+    return {'task': IDS[i], 'n': i, 'net_profit': i * 1.5, 'best_params': {'Fast': i}}
+
+
+def crash_after(writer, n_ok):
+    """Lets n_ok more ledger entries through, then fails as if the process died."""
+    mark_done = writer._mark_done
+    calls = []
+
+    def _mark_done(ids, mark):
+        if len(calls) >= n_ok:
+            raise Crash()
+        calls.append(ids)
+        mark_done(ids, mark)
+    writer._mark_done = _mark_done
+
+
+def run_to_crash(path, fmt, n_ok):
+    writer = ResultWriter(path, run=RUN, fmt=fmt, row_group_size=4)
+    crash_after(writer, n_ok)
+    with pytest.raises(Crash):
+        for i, tid in enumerate(IDS):
+            if tid not in writer.done:
+                writer.write(tid, row(i))
+        writer.close()
+    # Whatever reached the disk stays there; the handles die with the process
+    if writer._file is not None:
+        writer._file.close()
+    writer._ledger.close()
+
+
+def finish(path, fmt):
+    with ResultWriter(path, run=RUN, fmt=fmt, row_group_size=4) as writer:
+        done = set(writer.done)
+        for i, tid in enumerate(IDS):
+            if tid not in writer.done:
+                writer.write(tid, row(i))
+    return done, writer.read()
+
+
+@pytest.mark.parametrize('fmt,name', FORMATS)
+def test_resume_after_crash(tmp_path, fmt, name):
+    path = str(tmp_path / name)
+    # The 11th row (or 3rd Parquet part) is on disk but never ledgered
+    n_ok = 2 if fmt == 'parquet' else 10
+    run_to_crash(path, fmt, n_ok)
+
+    done, df = finish(path, fmt)
+    assert len(done) == (8 if fmt == 'parquet' else 10)
+    assert sorted(df['n']) == list(range(len(IDS)))
+    assert df['task'].is_unique
+
+
+@pytest.mark.parametrize('fmt,name', FORMATS)
+def test_resume_after_repeated_crashes(tmp_path, fmt, name):
+    path = str(tmp_path / name)
+    run_to_crash(path, fmt, 1)
+    run_to_crash(path, fmt, 2)
+    _, df = finish(path, fmt)
+    assert sorted(df['n']) == list(range(len(IDS)))
+
+
+def test_half_written_lines_are_dropped(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    run_to_crash(path, 'jsonl', 5)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"task": "half')
+    with open(path + '.ledger', 'a', encoding='utf-8') as f:
+        f.write('abc,de')
+    _, df = finish(path, 'jsonl')
+    assert sorted(df['n']) == list(range(len(IDS)))
+
+
+def test_parquet_temporary_parts_are_dropped(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'results.parquet')
+    run_to_crash(path, 'parquet', 1)
+    stray = os.path.join(path, 'part-00009.parquet.tmp')
+    with open(stray, 'wb') as f:
+        f.write(b'PAR1 no footer')
+    _, df = finish(path, 'parquet')
+    assert not os.path.exists(stray)
+    assert sorted(df['n']) == list(range(len(IDS)))
+
+
+def test_other_run_starts_over(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    run_to_crash(path, 'csv', 5)
+    with ResultWriter(path, run='another run') as writer:
+        assert writer.done == set()
+        writer.write('x', {'task': 'x', 'n': -1})
+        df = writer.read()
+    assert list(df['n']) == [-1]
+    with ResultWriter(path, run='another run', resume=False) as writer:
+        assert writer.done == set()
+        assert writer.read().empty
@@ -0,0 +1,96 @@
+import concurrent.futures
+import json
+import os
+
+import pytest
+
+import template_manager
+from template_manager import INDEX_FILENAME, PARALLEL_THRESHOLD, TemplateManager
+
+
+def pine(name: str, length: int) -> str:
+    return (
+        '//@version=5\n'
+        '// @tags trend\n'
+        f'strategy("{name}", overlay=true)\n'
+        f'len = input.int(title="Len", defval={length}, minval=2, maxval={length * 4})\n'
+        'm = ta.ema(close, len)\n'
+        'if (close > m)\n'
+        '    strategy.entry("Long", strategy.long)\n'
+    )
+
+
+def write_templates(folder, n: int):
+    for i in range(n):
+        (folder / f'ema_{i:02d}.pine').write_text(pine(f'ema_{i:02d}', i + 2))
+
+
+def summary(manager: TemplateManager):
+    return {t.name: (t.param_space, t.tags) for t in manager.get_templates()}
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Names of the files parsed in this process (serial path only)."""
+    seen = []
+    parse = template_manager._parse_file
+
+    def _recording(path):
+        seen.append(os.path.basename(path))
+        return parse(path)
+
+    monkeypatch.setattr(template_manager, '_parse_file', _recording)
+    return seen
+
+
+def test_index_is_reused(tmp_path, parsed):
+    write_templates(tmp_path, 3)
+    first = summary(TemplateManager(str(tmp_path)))
+    assert parsed == ['ema_00.pine', 'ema_01.pine', 'ema_02.pine']
+    assert first['ema_01'] == ({'Len': {'type': 'int', 'default': 3, 'bounds': (2, 12), 'step': None}}, ['trend', 'ema'])
+
+    parsed.clear()
+    assert summary(TemplateManager(str(tmp_path))) == first
+    assert parsed == []
+
+
+def test_index_follows_changes_and_deletions(tmp_path, parsed):
+    write_templates(tmp_path, 3)
+    TemplateManager(str(tmp_path))
+    changed = tmp_path / 'ema_01.pine'
+    st = changed.stat()
+    changed.write_text(pine('ema_01', 5))
+    # Same size; only the mtime tells the edit apart
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    os.remove(tmp_path / 'ema_02.pine')
+
+    parsed.clear()
+    manager = TemplateManager(str(tmp_path))
+    assert parsed == ['ema_01.pine']
+    assert sorted(summary(manager)) == ['ema_00', 'ema_01']
+    assert manager.get_templates('ema_01')[0].param_space['Len']['bounds'] == (2, 20)
+    with open(tmp_path / INDEX_FILENAME) as f:
+        assert sorted(json.load(f)['files']) == ['ema_00.pine', 'ema_01.pine']
+
+
+def test_parallel_parse_matches_serial(tmp_path, monkeypatch):
+    n = PARALLEL_THRESHOLD + 8
+    write_templates(tmp_path, n)
+    (tmp_path / 'broken.pine').write_bytes(b'\xff\xfe')
+    pools = []
+
+    class RecordingPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(template_manager.concurrent.futures, 'ProcessPoolExecutor', RecordingPool)
+    parallel = TemplateManager(str(tmp_path), workers=2)
+    assert pools == [{'max_workers': 2}]
+    assert len(parallel.templates) == n and 'broken' in parallel.errors
+
+    os.remove(tmp_path / INDEX_FILENAME)
+    serial = TemplateManager(str(tmp_path), workers=1)
+    assert len(pools) == 1
+    assert summary(parallel) == summary(serial)
+    assert parallel.errors == serial.errors
@@ -0,0 +1,94 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import worker_pool
+from data_manager import load_data
+from indicator_cache import dataset_key
+from strategies import StrategyTemplate
+from tests.helpers import synthetic_ohlcv
+from worker_pool import SharedFrames, Task, get_frame, get_template, run_tasks, stream_tasks, task_frames
+
+TEMPLATE = StrategyTemplate('t', '//@version=5\nstrategy("t")\n', {})
+
+
+@pytest.fixture(scope='module')
+def frames():
+    ny = synthetic_ohlcv(3000, seed=2, freq='h')
+    ny.index = ny.index.tz_localize('UTC').tz_convert('America/New_York')
+    return {'AAA': synthetic_ohlcv(3000, seed=1, freq='h'), 'NY': ny}
+
+
+def summarize(task: Task):
+    """Pool task: what the worker sees of its slice and template."""
+    df = get_frame(task.symbol, task.start, task.end)
+    return len(df), float(df['Close'].sum()), str(df.index[0]), get_template(task.template).name
+
+
+def tasks():
+    return [
+        Task(sym, start, end, 't', {})
+        for sym in ('AAA', 'NY')
+        for start, end in [(None, None), ('2000-01-05', '2000-01-20'), ('2000-02', None), ('2000-04-01', '2000-04-02')]
+    ]
+
+
+def expected(frames, task):
+    df = frames[task.symbol].loc[task.start:task.end]
+    return len(df), float(df['Close'].sum()), str(df.index[0]), 't'
+
+
+def test_views_match_frames(frames):
+    with SharedFrames(frames) as shared:
+        worker_pool._init_worker(shared.specs, [TEMPLATE])
+        try:
+            for task in tasks():
+                got = get_frame(task.symbol, task.start, task.end)
+                pd.testing.assert_frame_equal(got, frames[task.symbol].loc[task.start:task.end], check_freq=False)
+            # Views of the shared block, not copies
+            close = get_frame('AAA')['Close'].to_numpy()
+            block = worker_pool._ATTACHED['AAA'][1]
+            assert np.shares_memory(close, block)
+            # Read-only, so the indicator cache can key them
+            assert dataset_key(get_frame('AAA')['Close'])[0] is not None
+        finally:
+            for shm, _ in worker_pool._ATTACHED.values():
+                shm.close()
+            worker_pool._init_worker({}, [])
+        names = [spec.shm_name for spec in shared.specs.values()]
+    # Blocks are unlinked once the parent is done with them
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_pool_workers_read_shared_frames(frames):
+    want = [expected(frames, t) for t in tasks()]
+    assert list(run_tasks(summarize, tasks(), frames, [TEMPLATE], workers=2)) == want
+    streamed = list(stream_tasks(summarize, iter(tasks()), frames, [TEMPLATE], workers=2, max_in_flight=3))
+    assert len(streamed) == len(want)
+    for task, result in streamed:
+        assert result == expected(frames, task)
+
+
+def test_task_frames_load_only_task_windows(frames, tmp_path):
+    for sym, df in frames.items():
+        df.to_csv(tmp_path / f'{sym}_1Y_1h.csv')
+    data = load_data(str(tmp_path))
+    tasks = [
+        Task('AAA', '2000-01-05', '2000-01-20', 't', {}),
+        Task('AAA', '2000-02', '2000-02-03', 't', {}),
+        Task('NY', '2000-04-01', '2000-04-02', 't', {}),
+    ]
+    shared = task_frames(data, tasks)
+    assert sorted(shared) == ['AAA', 'NY']
+    assert str(shared['AAA'].index[0]) == '2000-01-05 00:00:00'
+    assert str(shared['AAA'].index[-1]) == '2000-02-03 23:00:00'
+    assert len(shared['NY']) == 48
+    # Nothing was read in full, and every task's slice is intact
+    assert not data._loaded
+    for task in tasks:
+        want = data.load(task.symbol, task.start, task.end)
+        pd.testing.assert_frame_equal(shared[task.symbol].loc[task.start:task.end], want)
@@ -0,0 +1,249 @@
+import concurrent.futures
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_manager import LazyData, covering_range, row_range
+from strategies import StrategyTemplate
+
+
+class Task(NamedTuple):
+    """
+    Work item sent to a pool worker. Only names and parameters travel with
+    the task; price data and template code are shared once per worker.
+    """
+    symbol: str
+    start: Optional[str]
+    end: Optional[str]
+    template: str
+    params: Dict[str, Any]
+
+
+class SharedFrameSpec(NamedTuple):
+    """
+    Describes a DataFrame stored in a shared memory block as a
+    (1 + columns) x rows float64 matrix; row 0 holds the int64 timestamps.
+    """
+    shm_name: str
+    rows: int
+    columns: List[str]
+    index_dtype: str
+    index_name: Optional[str]
+    tz: Optional[str]
+
+
+def task_frames(data: LazyData, tasks: Iterable[Task]) -> Dict[str, pd.DataFrame]:
+    """
+    Frames to share for tasks: each symbol's rows over the range covering
+    its tasks' [start, end] windows, read through LazyData.load so only
+    those rows are loaded.
+    """
+    ranges: Dict[str, List[Tuple[Optional[str], Optional[str]]]] = {}
+    for task in tasks:
+        ranges.setdefault(task.symbol, []).append((task.start, task.end))
+    return {sym: data.load(sym, *covering_range(windows)) for sym, windows in ranges.items()}
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    try:
+        # Python 3.13+: leave unlinking to the parent that created the block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Pool workers share the parent's resource tracker, so the duplicate
+        # registration made here is released by the parent's unlink
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedFrames:
+    """
+    Copies each symbol's frame into its own shared memory block, once.
+    Used as a context manager by the parent; the blocks are unlinked on exit.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.specs: Dict[str, SharedFrameSpec] = {}
+        try:
+            for sym, df in frames.items():
+                self.specs[sym] = self._share(df)
+        except Exception:
+            self.close()
+            raise
+
+    def _share(self, df: pd.DataFrame) -> SharedFrameSpec:
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        index = df.index
+        tz = str(index.tz) if index.tz is not None else None
+        if tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        ts = index.to_numpy()
+
+        rows = len(df)
+        width = 1 + len(df.columns)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, width * rows * 8))
+        self._blocks.append(shm)
+        mat = np.ndarray((width, rows), dtype=np.float64, buffer=shm.buf)
+        mat[0].view(np.int64)[:] = ts.view(np.int64)
+        for i, col in enumerate(df.columns, start=1):
+            mat[i] = df[col].to_numpy(dtype=np.float64)
+        return SharedFrameSpec(shm.name, rows, list(df.columns), str(ts.dtype), df.index.name, tz)
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> 'SharedFrames':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Worker-side state, set once per process by _init_worker
+_SPECS: Dict[str, SharedFrameSpec] = {}
+_TEMPLATES: Dict[str, StrategyTemplate] = {}
+_ATTACHED: Dict[str, Any] = {}
+
+
+def _init_worker(specs: Dict[str, SharedFrameSpec], templates: List[StrategyTemplate]):
+    _SPECS.clear()
+    _SPECS.update(specs)
+    _TEMPLATES.clear()
+    _TEMPLATES.update({t.name: t for t in templates})
+    _ATTACHED.clear()
+
+
+def get_frame(symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+    """
+    Zero-copy, read-only view of a shared symbol's rows between start and end
+    (df.loc semantics). Attaches to the block on first use in this process.
+    """
+    spec = _SPECS[symbol]
+    if symbol not in _ATTACHED:
+        shm = _attach_block(spec.shm_name)
+        mat = np.ndarray((1 + len(spec.columns), spec.rows), dtype=np.float64, buffer=shm.buf)
+        # Workers only read the shared prices; read-only views also let the
+        # indicator cache key them by address
+        mat.flags.writeable = False
+        _ATTACHED[symbol] = (shm, mat)
+    _, mat = _ATTACHED[symbol]
+
+    ts = mat[0].view(np.int64).view(spec.index_dtype)
+    lo, hi = row_range(ts, spec.tz, start, end)
+    index = pd.DatetimeIndex(ts[lo:hi], name=spec.index_name, copy=False)
+    if spec.tz is not None:
+        index = index.tz_localize('UTC').tz_convert(spec.tz)
+    cols = {col: mat[i, lo:hi] for i, col in enumerate(spec.columns, start=1)}
+    return pd.DataFrame(cols, index=index, copy=False)
+
+
+def get_template(name: str) -> StrategyTemplate:
+    return _TEMPLATES[name]
+
+
+class SharedPool:
+    """
+    Process pool whose workers reach the given frames and templates through
+    get_frame and get_template. Use as a context manager; map can be called
+    any number of times while it is open.
+    """
+
+    def __init__(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        templates: List[StrategyTemplate],
+        workers: int = 4
+    ):
+        self.frames = frames
+        self.templates = templates
+        self.workers = workers
+        self._shared: Optional[SharedFrames] = None
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'SharedPool':
+        self._shared = SharedFrames(self.frames)
+        try:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self._shared.specs, self.templates)
+            )
+        except Exception:
+            self._shared.close()
+            raise
+        return self
+
+    def map(self, fn: Callable[[Task], Any], tasks: List[Task]) -> Iterator[Any]:
+        """Runs fn over tasks, yielding results in task order."""
+        return self._executor.map(fn, tasks)
+
+    def imap_unordered(
+        self,
+        fn: Callable[[Task], Any],
+        tasks: Iterable[Task],
+        max_in_flight: Optional[int] = None
+    ) -> Iterator[Tuple[Task, Any]]:
+        """
+        Runs fn over tasks, yielding (task, result) as each finishes. At most
+        max_in_flight (default: twice the workers) are submitted at a time,
+        so tasks may be a lazy iterable and memory stays flat.
+        """
+        limit = max_in_flight or 2 * self.workers
+        pending: Dict[concurrent.futures.Future, Task] = {}
+        it = iter(tasks)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < limit:
+                task = next(it, None)
+                if task is None:
+                    exhausted = True
+                else:
+                    pending[self._executor.submit(fn, task)] = task
+            if not pending:
+                return
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                yield pending.pop(fut), fut.result()
+
+    def __exit__(self, *exc):
+        self._executor.shutdown()
+        self._shared.close()
+
+
+def run_tasks(
+    fn: Callable[[Task], Any],
+    tasks: List[Task],
+    frames: Dict[str, pd.DataFrame],
+    templates: List[StrategyTemplate],
+    workers: int = 4
+) -> Iterator[Any]:
+    """
+    Runs fn over tasks on a process pool, yielding results in task order.
+    fn must be a module-level function; inside it, use get_frame and
+    get_template to reach the shared data.
+    """
+    with SharedPool(frames, templates, workers) as pool:
+        for res in pool.map(fn, tasks):
+            yield res
+
+
+def stream_tasks(
+    fn: Callable[[Task], Any],
+    tasks: Iterable[Task],
+    frames: Dict[str, pd.DataFrame],
+    templates: List[StrategyTemplate],
+    workers: int = 4,
+    max_in_flight: Optional[int] = None
+) -> Iterator[Tuple[Task, Any]]:
+    """
+    Like run_tasks, but yields (task, result) in completion order with a
+    bounded number of tasks in flight (see SharedPool.imap_unordered).
+    """
+    with SharedPool(frames, templates, workers) as pool:
+        for item in pool.imap_unordered(fn, tasks, max_in_flight):
+            yield item